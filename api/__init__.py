@@ -2,7 +2,7 @@ from flask import Blueprint, jsonify
 
 api = Blueprint("api", __name__)
 
-from . import auth, posts
+from . import auth, authors, posts, metrics
 
 
 @api.errorhandler(404)
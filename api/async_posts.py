@@ -0,0 +1,85 @@
+"""
+An async view of GET /api/posts, swapped in for api.posts.fetch_posts when
+ASYNC_FEED is on (see app.create_app).  It calls the same pure helpers as
+the sync view and awaits its queries on the async engine of
+db.async_database, so it reads the main database only.
+"""
+from flask import jsonify, request, g, abort
+
+import serialization
+from api.util import helpers_to_fetch_posts
+from middlewares import auth_required_async
+from repository_layer import async_database_operations
+
+
+@auth_required_async
+async def fetch_posts_async(connection):
+    """
+    Same as api.posts.fetch_posts, awaiting its queries on the connection auth_required_async looked the user up on.
+    """
+    # Validation
+    user = g.get("user")
+    if user is None:
+        return abort(401)
+
+    parameters = request.args
+    requested_author_ids: set[int] = helpers_to_fetch_posts.parse_author_ids_parameter(parameters=parameters)
+    if type(requested_author_ids) is dict:
+        return jsonify(requested_author_ids["message"]), requested_author_ids["status_code"]
+
+    # One connection for the whole request, so the feed and the author
+    # versions of its ETag come from the same snapshot.
+    existing_author_ids: set = await async_database_operations.filter_existing_user_ids(connection=connection,
+                                                                                        user_ids=requested_author_ids)
+    parsed_author_ids = helpers_to_fetch_posts.keep_existing_author_ids(requested_author_ids=requested_author_ids,
+                                                                        existing_author_ids=existing_author_ids)
+    if type(parsed_author_ids) is dict:
+        return jsonify(parsed_author_ids["message"]), parsed_author_ids["status_code"]
+    sort_by: str = parameters.get("sortBy", "id")
+    direction: str = parameters.get("direction", "asc")
+
+    limit = helpers_to_fetch_posts.parse_limit(parameters=parameters)
+    if type(limit) is dict:
+        return jsonify(limit["message"]), limit["status_code"]
+    after = helpers_to_fetch_posts.decode_cursor(parameters=parameters,
+                                                 sort_by=sort_by,
+                                                 direction=direction)
+    if type(after) is dict:
+        return jsonify(after["message"]), after["status_code"]
+    tags: set[str] = helpers_to_fetch_posts.parse_tags(parameters=parameters)
+
+    serializer = serialization.negotiate()
+    author_versions: dict = await async_database_operations.get_author_versions(connection=connection,
+                                                                                user_ids=parsed_author_ids)
+    etag: str = helpers_to_fetch_posts.make_feed_etag(parameters=parameters,
+                                                      author_versions=author_versions,
+                                                      mimetype=serializer.mimetype)
+    cached_response = helpers_to_fetch_posts.respond_from_cache(etag=etag, serializer=serializer)
+    if cached_response is not None:
+        return cached_response
+
+    # Fetch posts, one extra for a page to learn whether another follows.
+    rows: list = await async_database_operations.get_sorted_post_rows_by_user_ids(connection=connection,
+                                                                                  user_ids=parsed_author_ids,
+                                                                                  sort_by=sort_by,
+                                                                                  direction=direction,
+                                                                                  limit=None if limit is None else limit + 1,
+                                                                                  after=after,
+                                                                                  tags=tags)
+    result: list[dict] = helpers_to_fetch_posts.rows_to_feed_posts(rows=rows)
+    if limit is not None:
+        response: dict = helpers_to_fetch_posts.make_page(posts=result, sort_by=sort_by, direction=direction, limit=limit)
+    else:
+        response: dict = {"posts": result}
+
+    if parameters.get("include") == "authorIds":
+        author_ids_by_post_id: dict = await async_database_operations.get_author_ids_of_posts(
+            connection=connection, post_ids=[post["id"] for post in response["posts"]])
+        response["posts"] = helpers_to_fetch_posts.add_author_ids(posts=response["posts"],
+                                                                  author_ids_by_post_id=author_ids_by_post_id)
+
+    return helpers_to_fetch_posts.respond_with_feed(response=response,
+                                                    parameters=parameters,
+                                                    parsed_author_ids=parsed_author_ids,
+                                                    etag=etag,
+                                                    serializer=serializer)
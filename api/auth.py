@@ -7,6 +7,11 @@ import jwt
 from api import api
 from db.models.user import User
 from db.shared import db
+from hashing_pool import PoolSaturated
+
+# Returned when the password pool is full, instead of letting requests pile up behind bcrypt.
+BUSY_RESPONSE = ({"error": "Too many login and register requests right now.  Please try again shortly."},
+                 503, {"Retry-After": "1"})
 
 
 @api.route("/register", methods=["POST"])
@@ -33,6 +38,9 @@ def register():
         return jsonify({"error": "User with provided username already exists"}), 401
     except ValueError:
         return jsonify({"error": "Validation error"}), 401
+    except PoolSaturated:
+        db.session.rollback()
+        return BUSY_RESPONSE
 
     token = jwt.encode(
         {"id": user.id, "exp": datetime.now() + timedelta(days=1)},
@@ -62,8 +70,17 @@ def login():
     except NoResultFound:
         return jsonify({"error": "Wrong username and/or password"}), 401
 
-    if not user.correct_password(password):
-        return jsonify({"error": "Wrong username and/or password"}), 401
+    try:
+        if not user.correct_password(password):
+            return jsonify({"error": "Wrong username and/or password"}), 401
+
+        # Move the stored hash to the configured cost while the plain text password is at hand.
+        if user.password_needs_rehash():
+            user.password = password
+            db.session.commit()
+    except PoolSaturated:
+        db.session.rollback()
+        return BUSY_RESPONSE
 
     token = jwt.encode(
         {"id": user.id, "exp": datetime.now() + timedelta(days=1)},
@@ -0,0 +1,21 @@
+from flask import jsonify, g, abort
+
+from api import api
+from api.util import helpers_to_fetch_author_stats
+from middlewares import auth_required
+
+
+@api.route("/authors/<authorId>/stats", methods=["GET"])
+@auth_required
+def author_stats(authorId):
+    """
+    Fetch an author's post count and the total and average likes, reads and popularity of their posts.
+    """
+    user = g.get("user")
+    if user is None:
+        return abort(401)
+
+    author_id = helpers_to_fetch_author_stats.validate_author_id(author_id=authorId)
+    if type(author_id) is dict:
+        return jsonify(author_id["message"]), author_id["status_code"]
+    return jsonify(helpers_to_fetch_author_stats.display_author_stats(author_id=author_id)), 200
@@ -0,0 +1,28 @@
+from flask import jsonify, g, abort
+
+from api import api
+from caching import auth_cache, feed_cache
+from counters import get_post_counters
+import leaderboards
+from hashing_pool import password_pool
+from instrumentation import route_statistics, statement_cache_statistics
+from middlewares import auth_required
+
+
+@api.route("/metrics", methods=["GET"])
+@auth_required
+def metrics():
+    """
+    Report process-local cache and pool counters, for sizing them under real traffic.
+    """
+    user = g.get("user")
+    if user is None:
+        return abort(401)
+
+    return jsonify({"authCache": auth_cache.stats(),
+                    "feedCache": feed_cache.stats(),
+                    "passwordPool": password_pool.stats(),
+                    "postCounters": get_post_counters().stats(),
+                    "leaderboards": leaderboards.stats(),
+                    "sqlByRoute": route_statistics.stats(),
+                    "statementCache": statement_cache_statistics.stats()}), 200
@@ -1,13 +1,17 @@
-from flask import jsonify, request, g, abort
+from flask import current_app, jsonify, request, g, abort, stream_with_context
 
 from api import api
 from db.shared import db
+from db import sharding
 from db.models.user_post import UserPost
 from db.models.post import Post
 
+import leaderboards
+import serialization
 from db.utils import row_to_dict
-from api.util import helpers_to_fetch_posts, helpers_to_update_post
+from api.util import helpers_to_count_posts, helpers_to_create_posts, helpers_to_fetch_posts, helpers_to_rank_posts, helpers_to_search_posts, helpers_to_update_post
 from middlewares import auth_required
+from repository_layer import database_operations
 
 
 @api.post("/posts")
@@ -29,15 +33,47 @@ def posts():
     if tags:
         post_values["tags"] = tags
 
-    post = Post(**post_values)
-    db.session.add(post)
-    db.session.commit()
+    # Flush to get the post id, then commit the post and its author together.
+    with sharding.on_shard_of_author(user.id, writing=True):
+        post = Post(**post_values)
+        if sharding.is_sharded():
+            post.id = Post.select_next_sharded_id()
+        db.session.add(post)
+        db.session.flush()
 
-    user_post = UserPost(user_id=user.id, post_id=post.id)
-    db.session.add(user_post)
-    db.session.commit()
+        user_post = UserPost(user_id=user.id, post_id=post.id)
+        db.session.add(user_post)
+        database_operations.add_new_posts_to_author_stats(post_counts={user.id: 1})
+        database_operations.bump_author_versions(user_ids={user.id})
+        db.session.commit()
+        leaderboards.make_room_for_new_posts()
 
-    return row_to_dict(post), 200
+        return row_to_dict(post), 200
+
+
+@api.post("/posts/batch")
+@auth_required
+def create_posts_in_batch():
+    """
+    Create many blog posts in one transaction.  Return their ids in request order.
+    json body is expected to be an array of {text: required(string), tags: required(array of strings), authorIds: optional(array of numbers)}
+    """
+    # validation
+    user = g.get("user")
+    if user is None:
+        return abort(401)
+
+    data = request.get_json(force=True)
+    new_posts = helpers_to_create_posts.validate_new_posts(data=data, user_id=user.id)
+    if type(new_posts) is dict:
+        return jsonify(new_posts["message"]), new_posts["status_code"]
+
+    # Create new posts
+    post_ids: list[int] = database_operations.create_posts(new_posts=new_posts, owner_id=user.id)
+    database_operations.commit_changes()
+    leaderboards.make_room_for_new_posts()
+
+    return jsonify({"ids": post_ids}), 200
 
 
 @api.route("/posts", methods=["GET"])
@@ -53,14 +89,140 @@ def fetch_posts():
 
     parameters = request.args
     parsed_author_ids: set[int] = helpers_to_fetch_posts.create_author_ids_response(parameters=parameters)        
+    if type(parsed_author_ids) is dict:
+        return jsonify(parsed_author_ids["message"]), parsed_author_ids["status_code"]
     sort_by: str = parameters.get("sortBy", "id")
     direction: str = parameters.get("direction", "asc")
 
+    # Pagination is opt-in: without `limit` every matching post is returned.
+    limit = helpers_to_fetch_posts.parse_limit(parameters=parameters)
+    if type(limit) is dict:
+        return jsonify(limit["message"]), limit["status_code"]
+    after = helpers_to_fetch_posts.decode_cursor(parameters=parameters, 
+                                                 sort_by=sort_by, 
+                                                 direction=direction)
+    if type(after) is dict:
+        return jsonify(after["message"]), after["status_code"]
+    tags: set[str] = helpers_to_fetch_posts.parse_tags(parameters=parameters)
+
+    # The feed only changes when a post of one of its authors does, so the
+    # author versions identify it: answer revalidations and repeats without
+    # running the feed query.
+    serializer = serialization.negotiate()
+    author_versions: dict = database_operations.get_author_versions(user_ids=parsed_author_ids)
+    etag: str = helpers_to_fetch_posts.make_feed_etag(parameters=parameters, 
+                                                      author_versions=author_versions, 
+                                                      mimetype=serializer.mimetype)
+    cached_response = helpers_to_fetch_posts.respond_from_cache(etag=etag, serializer=serializer)
+    if cached_response is not None:
+        return cached_response
+
     # Fetch posts 
-    result = helpers_to_fetch_posts.display_posts(parsed_author_ids=parsed_author_ids, 
-                                                  sort_by=sort_by, 
-                                                  direction=direction)
-    return jsonify({"posts": result}), 200
+    if limit is not None:
+        response: dict = helpers_to_fetch_posts.display_page_of_posts(parsed_author_ids=parsed_author_ids, 
+                                                                      sort_by=sort_by, 
+                                                                      direction=direction, 
+                                                                      limit=limit, 
+                                                                      after=after, 
+                                                                      tags=tags)
+    else:
+        result = helpers_to_fetch_posts.display_posts(parsed_author_ids=parsed_author_ids, 
+                                                      sort_by=sort_by, 
+                                                      direction=direction, 
+                                                      after=after, 
+                                                      tags=tags)
+        response: dict = {"posts": result}
+
+    if parameters.get("include") == "authorIds":
+        response["posts"] = helpers_to_fetch_posts.include_author_ids(posts=response["posts"])
+
+    return helpers_to_fetch_posts.respond_with_feed(response=response, 
+                                                    parameters=parameters, 
+                                                    parsed_author_ids=parsed_author_ids, 
+                                                    etag=etag, 
+                                                    serializer=serializer)
+
+
+@api.route("/posts/export", methods=["GET"])
+@auth_required
+def export_posts():
+    """
+    Stream every blog post of the authors specified as newline-delimited JSON, one post per line.
+    """
+    # Validation
+    user = g.get("user")
+    if user is None:
+        return abort(401)
+
+    parameters = request.args
+    parsed_author_ids: set[int] = helpers_to_fetch_posts.create_author_ids_response(parameters=parameters)        
+    if type(parsed_author_ids) is dict:
+        return jsonify(parsed_author_ids["message"]), parsed_author_ids["status_code"]
+    sort_by: str = parameters.get("sortBy", "id")
+    direction: str = parameters.get("direction", "asc")
+
+    # Stream posts, keeping the request (and its database session) open until the last chunk is sent
+    chunks = helpers_to_fetch_posts.export_posts(parsed_author_ids=parsed_author_ids, 
+                                                 sort_by=sort_by, 
+                                                 direction=direction, 
+                                                 dumps=current_app.extensions["serializers"]["application/json"].dumps)
+    return current_app.response_class(stream_with_context(chunks), mimetype="application/x-ndjson")
+
+
+@api.route("/posts/top", methods=["GET"])
+@auth_required
+def top_posts():
+    """
+    Fetch the blog posts of any author with the most popularity, likes or reads, from leaderboards kept in memory.
+    """
+    user = g.get("user")
+    if user is None:
+        return abort(401)
+
+    top_posts = helpers_to_rank_posts.create_top_posts_response(parameters=request.args)
+    if type(top_posts) is dict:
+        return jsonify(top_posts["message"]), top_posts["status_code"]
+    return serialization.respond({"posts": top_posts})
+
+
+@api.route("/posts/search", methods=["GET"])
+@auth_required
+def search_posts():
+    """
+    Search the text of blog posts, optionally only those of the authors specified.
+    """
+    # Validation
+    user = g.get("user")
+    if user is None:
+        return abort(401)
+
+    parameters = request.args
+    search_query = helpers_to_search_posts.parse_search_query(parameters=parameters)
+    if type(search_query) is dict:
+        return jsonify(search_query["message"]), search_query["status_code"]
+    parsed_author_ids = helpers_to_search_posts.create_search_author_ids_response(parameters=parameters)
+    if type(parsed_author_ids) is dict:
+        return jsonify(parsed_author_ids["message"]), parsed_author_ids["status_code"]
+    sort_by: str = parameters.get("sortBy", "rank")
+    direction: str = parameters.get("direction", "asc")
+
+    limit = helpers_to_fetch_posts.parse_limit(parameters=parameters)
+    if type(limit) is dict:
+        return jsonify(limit["message"]), limit["status_code"]
+    after = helpers_to_fetch_posts.decode_cursor(parameters=parameters, 
+                                                 sort_by=sort_by, 
+                                                 direction=direction)
+    if type(after) is dict:
+        return jsonify(after["message"]), after["status_code"]
+
+    # Search posts 
+    response: dict = helpers_to_search_posts.display_page_of_search_results(search_query=search_query, 
+                                                                            parsed_author_ids=parsed_author_ids, 
+                                                                            sort_by=sort_by, 
+                                                                            direction=direction, 
+                                                                            limit=limit, 
+                                                                            after=after)
+    return serialization.respond(response)
 
 
 @api.route("/posts/<postId>", methods=["PATCH"])
@@ -70,11 +232,17 @@ def update_post(postId: str):
     Update blog post, if it exists in the database.  Return updated blog post.
     """
     existing_post = helpers_to_update_post.validate_post_id(post_id=postId)
+    if type(existing_post) is dict:
+        return jsonify(existing_post["message"]), existing_post["status_code"]
 
     # Validation
     user = g.get("user")    
-    helpers_to_update_post.validate_user_for_post_update(user=user, 
-                                                         post=existing_post)
+    if user is None:
+        return abort(401)
+    not_an_author = helpers_to_update_post.validate_user_for_post_update(user=user, 
+                                                                         post=existing_post)
+    if not_an_author is not None:
+        return jsonify(not_an_author["message"]), not_an_author["status_code"]
 
     # Check that request contains information about updates to make
     helpers_to_update_post.validate_data_present(raw_data=request.data)
@@ -84,4 +252,32 @@ def update_post(postId: str):
     # Update post and return specified response
     result = helpers_to_update_post.generate_updated_post_response(existing_post=existing_post, 
                                                                    parsed_json=parsed_json)
-    return jsonify({"post": result}), 200
\ No newline at end of file
+    return jsonify({"post": result}), 200
+
+
+@api.post("/posts/<postId>/read")
+@auth_required
+def read_post(postId):
+    """
+    Count a read of a blog post.  Counts are saved in batches, so they show in feeds after a short delay.
+    """
+    user = g.get("user")
+    if user is None:
+        return abort(401)
+
+    counted = helpers_to_count_posts.count_post(post_id=postId, reads=1)
+    return jsonify(counted["message"]), counted["status_code"]
+
+
+@api.post("/posts/<postId>/like")
+@auth_required
+def like_post(postId):
+    """
+    Count a like of a blog post.  Counts are saved in batches, so they show in feeds after a short delay.
+    """
+    user = g.get("user")
+    if user is None:
+        return abort(401)
+
+    counted = helpers_to_count_posts.count_post(post_id=postId, likes=1)
+    return jsonify(counted["message"]), counted["status_code"]
\ No newline at end of file
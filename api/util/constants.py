@@ -3,4 +3,20 @@ MESSAGE_TYPE_AND_STATUS_CODE = {"error": 400,
                                 "warning": 200}
 
 PARAMETERS_ACCEPTED_VALUES = {"sortBy": ["id", "reads", "likes", "popularity"],
-                              "direction": ["asc", "desc"]}
\ No newline at end of file
+                              "direction": ["asc", "desc"],
+                              "include": ["authorIds"]}
+
+SEARCH_PARAMETERS_ACCEPTED_VALUES = {"sortBy": ["rank", "id", "reads", "likes", "popularity"],
+                                     "direction": ["asc", "desc"]}
+
+TOP_PARAMETERS_ACCEPTED_VALUES = {"sortBy": ["popularity", "likes", "reads"]}
+
+MAX_PAGE_LIMIT = 1000
+
+DEFAULT_TOP_LIMIT = 10
+
+DEFAULT_SEARCH_PAGE_LIMIT = 20
+
+MAX_BATCH_SIZE = 5000
+
+EXPORT_CHUNK_SIZE = 1000
@@ -0,0 +1,32 @@
+import counters
+from api.util.constants import MESSAGE_TYPE_AND_STATUS_CODE
+from repository_layer import database_operations
+
+
+def validate_post_id_to_count(post_id: str):
+    """Check that post id from URL path is a number of an existing post.  Return the parsed id."""
+    try:
+        parsed_post_id: int = int(post_id)
+    except ValueError:
+        error_or_warning: str = "error"
+        return {"success": False, 
+                "message": {error_or_warning: "Please use a number to represent the id of the post.  A sample acceptable path: /api/posts/1/read versus a sample unacceptable path: /api/posts/one/read"},
+                "status_code": MESSAGE_TYPE_AND_STATUS_CODE[error_or_warning]}
+    if not database_operations.post_exists(post_id=parsed_post_id):
+        error_or_warning: str = "warning"
+        return {"success": False, 
+                "message": {error_or_warning: "The post you requested does not exist in the database."}, 
+                "status_code": MESSAGE_TYPE_AND_STATUS_CODE[error_or_warning]}
+    return parsed_post_id
+
+
+def count_post(post_id: str, reads: int = 0, likes: int = 0):
+    """Buffer a read or like of a post, to be written with the next flush of counters."""
+    parsed_post_id = validate_post_id_to_count(post_id=post_id)
+    if type(parsed_post_id) is dict:
+        return parsed_post_id
+    if not counters.increment(post_id=parsed_post_id, reads=reads, likes=likes):
+        return {"success": False,
+                "message": {"error": "Too many posts are waiting for their counts to be saved.  Please try again shortly."},
+                "status_code": 503}
+    return {"success": True, "message": {"postId": parsed_post_id}, "status_code": 202}
@@ -0,0 +1,57 @@
+from api.util.constants import MESSAGE_TYPE_AND_STATUS_CODE, MAX_BATCH_SIZE
+from api.util import helpers_to_update_post
+from repository_layer import database_operations
+
+
+def validate_new_post(new_post, user_id: int):
+    """Validate one post of a batch.  Return its text, tags and author ids, or give user error messaging."""
+    if type(new_post) is not dict or "text" not in new_post or "tags" not in new_post:
+        error_or_warning: str = "error"
+        return {"success": False, 
+                "message": {error_or_warning: "Please provide each new post as an object with `text` and `tags`, and optionally `authorIds`."}, 
+                "status_code": MESSAGE_TYPE_AND_STATUS_CODE[error_or_warning]}
+
+    text = helpers_to_update_post.validate_text_format(parsed_json=new_post)
+    if type(text) is dict:
+        return text
+    tags = helpers_to_update_post.validate_tags_format(parsed_json=new_post)
+    if type(tags) is dict:
+        return tags
+
+    # The user creating the posts is always one of their authors.
+    author_ids: set = {user_id}
+    if "authorIds" in new_post:
+        co_author_ids = helpers_to_update_post.validate_authorIds_format(parsed_json=new_post)
+        if type(co_author_ids) is dict:
+            return co_author_ids
+        author_ids |= co_author_ids
+
+    return {"text": text, "tags": tags, "authorIds": author_ids}
+
+
+def validate_new_posts(data, user_id: int):
+    """Validate a batch of new posts.  Return them ready for database_operations.create_posts, or give user error messaging."""
+    if type(data) is not list or not 1 <= len(data) <= MAX_BATCH_SIZE:
+        error_or_warning: str = "error"
+        return {"success": False, 
+                "message": {error_or_warning: f"Please provide an array of 1 to {MAX_BATCH_SIZE} new posts."}, 
+                "status_code": MESSAGE_TYPE_AND_STATUS_CODE[error_or_warning]}
+
+    new_posts: list[dict] = []
+    for new_post in data:
+        validated_post = validate_new_post(new_post=new_post, user_id=user_id)
+        if "success" in validated_post:
+            return validated_post
+        new_posts.append(validated_post)
+
+    # Check every co-author of the batch with one query.
+    requested_author_ids: set = set().union(*(new_post["authorIds"] for new_post in new_posts))
+    unknown_author_ids: set = requested_author_ids - database_operations.filter_existing_user_ids(user_ids=requested_author_ids)
+    if unknown_author_ids:
+        error_or_warning: str = "error"
+        return {"success": False, 
+                "message": {error_or_warning: "One or more authorIds provided is invalid.  Please check that each of your authorIds is an id of a user in the database.",
+                            "unknownAuthorIds": sorted(unknown_author_ids)}, 
+                "status_code": MESSAGE_TYPE_AND_STATUS_CODE[error_or_warning]}
+
+    return new_posts
@@ -0,0 +1,34 @@
+from api.util.constants import MESSAGE_TYPE_AND_STATUS_CODE
+from repository_layer import database_operations
+
+
+def validate_author_id(author_id: str):
+    """Check that author id from URL path is a number of an existing user.  Return the parsed id."""
+    try:
+        parsed_author_id: int = int(author_id)
+    except ValueError:
+        error_or_warning: str = "error"
+        return {"success": False, 
+                "message": {error_or_warning: "Please use a number to represent the id of the author.  A sample acceptable path: /api/authors/1/stats versus a sample unacceptable path: /api/authors/one/stats"},
+                "status_code": MESSAGE_TYPE_AND_STATUS_CODE[error_or_warning]}
+    if not database_operations.filter_existing_user_ids(user_ids={parsed_author_id}):
+        error_or_warning: str = "warning"
+        return {"success": False, 
+                "message": {error_or_warning: "The author you requested does not exist in the database."}, 
+                "status_code": MESSAGE_TYPE_AND_STATUS_CODE[error_or_warning]}
+    return parsed_author_id
+
+
+def display_author_stats(author_id: int) -> dict:
+    """Create response to user showing the stored totals of an author and the averages per post."""
+    stats = database_operations.get_author_stats(user_id=author_id)
+    post_count: int = stats.post_count if stats is not None else 0
+    totals: dict = {"likes": stats.total_likes if stats is not None else 0,
+                    "reads": stats.total_reads if stats is not None else 0,
+                    "popularity": stats.total_popularity if stats is not None else 0.0}
+
+    response: dict = {"authorId": author_id, "postCount": post_count}
+    for name, total in totals.items():
+        response[f"total{name.title()}"] = total
+        response[f"average{name.title()}"] = total / post_count if post_count else None
+    return response
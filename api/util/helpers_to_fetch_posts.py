@@ -1,26 +1,29 @@
+import base64
+import hashlib
+import json
+
+import serialization
+from caching import feed_cache, FEED_CACHE_MAX_BODY_BYTES
 from db.shared import db
-from db.models.post import Post
+from db.models.post import Post, FEED_COLUMNS
 
-from db.utils import rows_to_list
-from api.util.constants import MESSAGE_TYPE_AND_STATUS_CODE, PARAMETERS_ACCEPTED_VALUES
+from db.utils import rows_to_list, to_camel_case
+from api.util.constants import MESSAGE_TYPE_AND_STATUS_CODE, PARAMETERS_ACCEPTED_VALUES, MAX_PAGE_LIMIT, EXPORT_CHUNK_SIZE
 from repository_layer import database_operations
 
+# Response key of each column of a feed row, worked out once instead of per row.
+FEED_RESPONSE_KEYS: tuple = tuple(to_camel_case(column.name) for column in FEED_COLUMNS)
 
-def check_user_exists(user_id: int) -> bool:
-    """Check by user id whether or not a user exists."""
-    return database_operations.get_user_by_id(user_id=user_id) is not None
 
+def parse_requested_author_ids(author_ids: str) -> set[int]:
+    """Parse comma separated author ids without checking that they exist."""
+    return set(int(author_id) for author_id in author_ids.split(","))
 
-def parse_author_ids(author_ids: str):
-    """Parse author ids.  If not possible, give user error messaging."""
+
+def validate_author_ids_format(author_ids: str):
+    """Parse author ids without checking that they exist.  If not possible, give user error messaging."""
     try:
-        parsed_author_ids: set = set(int(author_id) for author_id in author_ids.split(",") if check_user_exists(int(author_id)))
-        if not parsed_author_ids: 
-            error_or_warning: str = "warning"
-            return {"success": False, 
-                    "message": {error_or_warning: "None of the author id(s) you requested exist in the database."}, 
-                    "status_code": MESSAGE_TYPE_AND_STATUS_CODE[error_or_warning]}
-        return parsed_author_ids
+        return parse_requested_author_ids(author_ids=author_ids)
     except:
         error_or_warning: str = "error"
         return {"success": False, 
@@ -28,11 +31,39 @@ def parse_author_ids(author_ids: str):
                 "status_code": MESSAGE_TYPE_AND_STATUS_CODE[error_or_warning]}
 
 
-def validate_parameters_accepted_values(parameters: dict):
+def keep_existing_author_ids(requested_author_ids: set, existing_author_ids: set):
+    """Return the requested author ids that exist.  If none do, give user warning messaging."""
+    if not existing_author_ids: 
+        error_or_warning: str = "warning"
+        return {"success": False, 
+                "message": {error_or_warning: "None of the author id(s) you requested exist in the database.",
+                            "unknownAuthorIds": sorted(requested_author_ids)}, 
+                "status_code": MESSAGE_TYPE_AND_STATUS_CODE[error_or_warning]}
+    return existing_author_ids
+
+
+def parse_author_ids(author_ids: str):
+    """Parse author ids.  If not possible, give user error messaging."""
+    requested_author_ids = validate_author_ids_format(author_ids=author_ids)
+    if type(requested_author_ids) is dict:
+        return requested_author_ids
+
+    # Validate every requested id with one set-based lookup rather than one query per id.
+    existing_author_ids: set = database_operations.filter_existing_user_ids(user_ids=requested_author_ids)
+    return keep_existing_author_ids(requested_author_ids=requested_author_ids, existing_author_ids=existing_author_ids)
+
+
+def find_unknown_author_ids(parameters: dict, parsed_author_ids: set) -> list[int]:
+    """List requested author ids that do not exist in the database."""
+    requested_author_ids: set = parse_requested_author_ids(author_ids=parameters["authorIds"])
+    return sorted(requested_author_ids - parsed_author_ids)
+
+
+def validate_parameters_accepted_values(parameters: dict, accepted_values: dict = PARAMETERS_ACCEPTED_VALUES):
     """Validate that parameters have acceptable values."""
     for parameter, value in parameters.items():
-        if parameter in PARAMETERS_ACCEPTED_VALUES:
-            acceptable: list[str] = PARAMETERS_ACCEPTED_VALUES[parameter]
+        if parameter in accepted_values:
+            acceptable: list[str] = accepted_values[parameter]
             if value not in acceptable:
                 error_or_warning: str = "error"
                 return {"success": False, 
@@ -54,24 +85,128 @@ def validate_authorIds_exist_in_request(parameters: dict):
     return author_ids    
 
 
+def parse_author_ids_parameter(parameters: dict):
+    """Validate parameters and parse the requested author ids, without checking that they exist.  If not valid, give error messaging."""
+    unacceptable_parameters = validate_parameters_accepted_values(parameters=parameters)
+    if unacceptable_parameters is not None:
+        return unacceptable_parameters
+    author_ids: str = validate_authorIds_exist_in_request(parameters=parameters)           
+    if type(author_ids) is dict:
+        return author_ids
+    return validate_author_ids_format(author_ids=author_ids)
+
+
 def create_author_ids_response(parameters: dict):
     """If parameters valid, return information containing parsed ids.  If not, give error messaging."""
-    validate_parameters_accepted_values(parameters=parameters)
-    author_ids: str = validate_authorIds_exist_in_request(parameters=parameters)           
-    return parse_author_ids(author_ids=author_ids)
+    requested_author_ids = parse_author_ids_parameter(parameters=parameters)
+    if type(requested_author_ids) is dict:
+        return requested_author_ids
+    existing_author_ids: set = database_operations.filter_existing_user_ids(user_ids=requested_author_ids)
+    return keep_existing_author_ids(requested_author_ids=requested_author_ids, existing_author_ids=existing_author_ids)
 
 
-def display_posts(parsed_author_ids, sort_by, direction) -> list[dict]:
+def parse_limit(parameters: dict):
+    """Parse the optional page size.  If not possible, give user error messaging."""
+    limit: str = parameters.get("limit", None)
+    if limit is None:
+        return None
+    try:
+        parsed_limit: int = int(limit)
+        if not 1 <= parsed_limit <= MAX_PAGE_LIMIT:
+            raise ValueError
+        return parsed_limit
+    except ValueError:
+        error_or_warning: str = "error"
+        return {"success": False, 
+                "message": {error_or_warning: f"Please provide a query parameter value for `limit` as a whole number from 1 to {MAX_PAGE_LIMIT}."}, 
+                "status_code": MESSAGE_TYPE_AND_STATUS_CODE[error_or_warning]}
+
+
+def encode_cursor(post: dict, sort_by: str, direction: str) -> str:
+    """Create an opaque cursor pointing just after the given post."""
+    keyset: list = [sort_by, direction, post[sort_by], post["id"]]
+    return base64.urlsafe_b64encode(json.dumps(keyset).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(parameters: dict, sort_by: str, direction: str):
+    """Decode the optional cursor into a (sort value, post id) keyset.  If not possible, give user error messaging."""
+    cursor: str = parameters.get("cursor", None)
+    if cursor is None:
+        return None
+    try:
+        cursor_sort_by, cursor_direction, last_value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if (cursor_sort_by, cursor_direction) != (sort_by, direction) or type(last_id) is not int:
+            raise ValueError
+        return last_value, last_id
+    except Exception:
+        error_or_warning: str = "error"
+        return {"success": False, 
+                "message": {error_or_warning: "The `cursor` query parameter is invalid.  Please pass the `nextCursor` from a previous response together with the same `sortBy` and `direction`."}, 
+                "status_code": MESSAGE_TYPE_AND_STATUS_CODE[error_or_warning]}
+
+
+def parse_tags(parameters: dict) -> set[str]:
+    """Parse the optional comma separated tags to filter posts by."""
+    tags: str = parameters.get("tags", None)
+    if tags is None:
+        return None
+    return set(tag for tag in tags.split(",") if tag)
+
+
+def make_feed_etag(parameters: dict, author_versions: dict, mimetype: str) -> str:
+    """Identify a feed by its query parameters, the versions of its authors and its media type."""
+    identity: list = [sorted(parameters.items(multi=True)), sorted(author_versions.items()), mimetype]
+    return hashlib.sha256(json.dumps(identity).encode("utf-8")).hexdigest()[:32]
+
+
+def display_posts(parsed_author_ids, sort_by, direction, limit: int = None, after: tuple = None, tags: set = None) -> list[dict]:
     """Create response to user showing posts with applicable sorting."""
-    posts_of_authors: list[Post] = Post.get_sorted_posts_by_user_ids(user_ids=parsed_author_ids,
-                                                                     sort_by=sort_by,
-                                                                     direction=direction)
+    rows_of_authors: list = Post.get_sorted_post_rows_by_user_ids(user_ids=parsed_author_ids,
+                                                                  sort_by=sort_by,
+                                                                  direction=direction,
+                                                                  limit=limit,
+                                                                  after=after,
+                                                                  tags=tags)
+    return rows_to_feed_posts(rows=rows_of_authors)
+
+
+def rows_to_feed_posts(rows: list) -> list[dict]:
+    """Convert rows of FEED_COLUMNS to the dictionaries shown to the user."""
+    # Rows already hold the columns in response key order, so each post is a
+    # single zip; only the comma separated tags need converting.
+    result: list = []
+    for row in rows:
+        post_response: dict = dict(zip(FEED_RESPONSE_KEYS, row))
+        post_response["tags"] = post_response["tags"].split(",")
+        result.append(post_response)
+
+    return result
+
+
+def export_posts(parsed_author_ids, sort_by, direction, dumps, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """Yield posts as newline-delimited JSON, chunk_size posts at a time, holding only one chunk in memory."""
+    for rows in Post.stream_sorted_post_rows_by_user_ids(user_ids=parsed_author_ids,
+                                                         sort_by=sort_by,
+                                                         direction=direction,
+                                                         chunk_size=chunk_size):
+        lines: list = []
+        for row in rows:
+            post_response: dict = dict(zip(FEED_RESPONSE_KEYS, row))
+            post_response["tags"] = post_response["tags"].split(",")
+            lines.append(dumps(post_response))
+            lines.append(b"\n")
+        yield b"".join(lines)
+
 
+def format_posts(posts: list) -> list[dict]:
+    """Convert posts to the dictionaries shown to the user."""
     result: list = []
 
-    listed_posts_of_authors: list[dict] = rows_to_list(posts_of_authors)
+    listed_posts_of_authors: list[dict] = rows_to_list(posts)
 
-    post_properties: list = [property.name for property in Post.__table__.columns]
+    # Column names are quoted_name, a str subclass that orjson rejects as a
+    # dict key, so they are converted to plain str.
+    post_properties: list = [str(property.name) for property in Post.__table__.columns]
     post_properties.sort() # Example in specification indicates that 
     # response shows post properties in alphabetical order
     
@@ -79,4 +214,66 @@ def display_posts(parsed_author_ids, sort_by, direction) -> list[dict]:
         post_response: dict = {post_property: post[post_property] for post_property in post_properties}
         result.append(post_response)
 
-    return result
\ No newline at end of file
+    return result
+
+
+def include_author_ids(posts: list[dict]) -> list[dict]:
+    """Add the author ids of every post, fetched with one batched query."""
+    author_ids_by_post_id: dict = database_operations.get_author_ids_of_posts(post_ids=[post["id"] for post in posts])
+    return add_author_ids(posts=posts, author_ids_by_post_id=author_ids_by_post_id)
+
+
+def add_author_ids(posts: list[dict], author_ids_by_post_id: dict) -> list[dict]:
+    """Add the author ids of every post from author ids fetched by post id."""
+    # authorIds sorts first among the alphabetically ordered post properties.
+    return [{"authorIds": author_ids_by_post_id[post["id"]], **post} for post in posts]
+
+
+def display_page_of_posts(parsed_author_ids, sort_by, direction, limit: int, after: tuple = None, tags: set = None) -> dict:
+    """Create response to user showing one page of posts and the cursor for the next page."""
+    # Fetch one extra post to learn whether another page follows.
+    result: list[dict] = display_posts(parsed_author_ids=parsed_author_ids,
+                                       sort_by=sort_by,
+                                       direction=direction,
+                                       limit=limit + 1,
+                                       after=after,
+                                       tags=tags)
+    return make_page(posts=result, sort_by=sort_by, direction=direction, limit=limit)
+
+
+def make_page(posts: list[dict], sort_by, direction, limit: int) -> dict:
+    """Cut posts fetched with limit + 1 down to a page, with the cursor for the next page if there is one."""
+    next_cursor = None
+    if len(posts) > limit:
+        posts = posts[:limit]
+        next_cursor = encode_cursor(post=posts[-1], sort_by=sort_by, direction=direction)
+
+    return {"posts": posts, "nextCursor": next_cursor}
+
+
+def respond_from_cache(etag: str, serializer):
+    """Answer a feed request without running the feed query: 304 on a matching If-None-Match, else the cached body.  None on a miss."""
+    matched_etag: str = serialization.etag_matches(etag)
+    if matched_etag is not None:
+        return serialization.not_modified(etag=matched_etag)
+    cached_feed = feed_cache.get(etag)
+    if cached_feed is not None:
+        cached_response = serialization.respond_with_body(cached_feed[1], serializer=serializer)
+        cached_response.set_etag(etag)
+        return cached_response
+    return None
+
+
+def respond_with_feed(response: dict, parameters: dict, parsed_author_ids: set, etag: str, serializer):
+    """Serialize a feed with its unknown author ids and ETag, and cache the body if it is small enough."""
+    unknown_author_ids: list[int] = find_unknown_author_ids(parameters=parameters, 
+                                                           parsed_author_ids=parsed_author_ids)
+    if unknown_author_ids:
+        response["unknownAuthorIds"] = unknown_author_ids
+
+    feed_response = serialization.respond(response, serializer=serializer)
+    feed_response.set_etag(etag)
+    body: bytes = feed_response.get_data()
+    if len(body) <= FEED_CACHE_MAX_BODY_BYTES:
+        feed_cache.set(etag, (frozenset(parsed_author_ids), body))
+    return feed_response
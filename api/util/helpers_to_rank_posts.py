@@ -0,0 +1,40 @@
+from api.util.constants import MESSAGE_TYPE_AND_STATUS_CODE, TOP_PARAMETERS_ACCEPTED_VALUES, DEFAULT_TOP_LIMIT
+from api.util import helpers_to_fetch_posts
+import leaderboards
+from repository_layer import database_operations
+
+
+def parse_top_limit(parameters: dict):
+    """Parse the optional number of top posts.  If not possible, give user error messaging."""
+    limit: str = parameters.get("limit", None)
+    if limit is None:
+        return DEFAULT_TOP_LIMIT
+    try:
+        parsed_limit: int = int(limit)
+        if not 1 <= parsed_limit <= leaderboards.LEADERBOARD_SIZE:
+            raise ValueError
+        return parsed_limit
+    except ValueError:
+        error_or_warning: str = "error"
+        return {"success": False, 
+                "message": {error_or_warning: f"Please provide a query parameter value for `limit` as a whole number from 1 to {leaderboards.LEADERBOARD_SIZE}."}, 
+                "status_code": MESSAGE_TYPE_AND_STATUS_CODE[error_or_warning]}
+
+
+def load_top_posts(sort_by: str, size: int) -> list[dict]:
+    """Load a leaderboard from the database."""
+    return helpers_to_fetch_posts.rows_to_feed_posts(rows=database_operations.get_top_post_rows(sort_by=sort_by, limit=size))
+
+
+def create_top_posts_response(parameters: dict):
+    """If parameters valid, return the top posts among every author's, from memory.  If not, give error messaging."""
+    unacceptable_parameters = helpers_to_fetch_posts.validate_parameters_accepted_values(
+        parameters=parameters, accepted_values=TOP_PARAMETERS_ACCEPTED_VALUES)
+    if unacceptable_parameters is not None:
+        return unacceptable_parameters
+    limit = parse_top_limit(parameters=parameters)
+    if type(limit) is dict:
+        return limit
+
+    sort_by: str = parameters.get("sortBy", "popularity")
+    return leaderboards.leaderboards[sort_by].top(limit=limit, load=load_top_posts)
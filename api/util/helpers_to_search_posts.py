@@ -0,0 +1,52 @@
+from db.models.post import Post
+
+from api.util.constants import MESSAGE_TYPE_AND_STATUS_CODE, SEARCH_PARAMETERS_ACCEPTED_VALUES, DEFAULT_SEARCH_PAGE_LIMIT
+from api.util import helpers_to_fetch_posts
+
+
+def parse_search_query(parameters: dict):
+    """Turn the `q` parameter into an FTS5 query matching every word.  If not possible, give user error messaging."""
+    words: list[str] = parameters.get("q", "").split()
+    if not words:
+        error_or_warning: str = "error"
+        return {"success": False, 
+                "message": {error_or_warning: "Please provide the words to search for using the query parameter key `q`."}, 
+                "status_code": MESSAGE_TYPE_AND_STATUS_CODE[error_or_warning]}
+
+    # Quote each word so that FTS5 operators and punctuation in user input are matched literally.
+    return " ".join('"' + word.replace('"', '""') + '"' for word in words)
+
+
+def create_search_author_ids_response(parameters: dict):
+    """If parameters valid, return parsed author ids, or None when the search is not limited to authors.  If not, give error messaging."""
+    unacceptable_parameters = helpers_to_fetch_posts.validate_parameters_accepted_values(parameters=parameters, 
+                                                                                         accepted_values=SEARCH_PARAMETERS_ACCEPTED_VALUES)
+    if unacceptable_parameters is not None:
+        return unacceptable_parameters
+    if "authorIds" not in parameters:
+        return None
+    return helpers_to_fetch_posts.parse_author_ids(author_ids=parameters["authorIds"])
+
+
+def display_page_of_search_results(search_query: str, parsed_author_ids, sort_by, direction, limit: int = None, after: tuple = None) -> dict:
+    """Create response to user showing one page of matching posts and the cursor for the next page."""
+    limit = DEFAULT_SEARCH_PAGE_LIMIT if limit is None else limit
+
+    # Fetch one extra post to learn whether another page follows.
+    matches: list = Post.search_posts(search_query=search_query,
+                                      user_ids=parsed_author_ids,
+                                      sort_by=sort_by,
+                                      direction=direction,
+                                      limit=limit + 1,
+                                      after=after)
+
+    next_cursor = None
+    if len(matches) > limit:
+        matches = matches[:limit]
+        last_post, last_rank = matches[-1]
+        sort_value = last_rank if sort_by == "rank" else getattr(last_post, sort_by)
+        keyset: dict = {"id": last_post.id, sort_by: sort_value}
+        next_cursor = helpers_to_fetch_posts.encode_cursor(post=keyset, sort_by=sort_by, direction=direction)
+
+    result: list[dict] = helpers_to_fetch_posts.format_posts(posts=[post for post, rank in matches])
+    return {"posts": result, "nextCursor": next_cursor}
@@ -1,6 +1,9 @@
 from db.shared import db
+from db import sharding
 from db.models.post import Post
+from db.models.user_post import UserPost
 
+import leaderboards
 from api.util.constants import MESSAGE_TYPE_AND_STATUS_CODE
 from repository_layer import database_operations
 
@@ -8,7 +11,9 @@ from repository_layer import database_operations
 def validate_post_id(post_id: str):
     """Check that post id from URL path is valid."""
     try:
-        post = Post.get_post_by_post_id(post_id=int(post_id))
+        parsed_post_id: int = int(post_id)
+        with sharding.on_shard_of_post(parsed_post_id):
+            post = Post.get_post_with_author_ids(post_id=parsed_post_id)
         if post is None:
             error_or_warning: str = "warning"
             return {"success": False, 
@@ -25,7 +30,9 @@ def validate_post_id(post_id: str):
 
 def validate_user_for_post_update(user, post):
     """Check whether user is an author of the post."""
-    if user.id not in [author.id for author in post.users]:
+    with sharding.on_shard_of_post(post.id):
+        is_author: bool = UserPost.is_author(user_id=user.id, post_id=post.id)
+    if not is_author:
         error_or_warning: str = "unauthorized"
         return {"success": False, 
                 "message": {error_or_warning: "Only an author of a post can update that post."},
@@ -96,10 +103,7 @@ def validate_text_format(parsed_json) -> str:
 
 def update_post(post, parsed_json):
     """Make updates to post.  Return updated post."""
-    if "authorIds" in parsed_json:
-        deduplicated_author_ids: set = validate_authorIds_format(parsed_json=parsed_json)
-        database_operations.update_author_ids_of_post(post=post, 
-                                                      deduplicated_author_ids=deduplicated_author_ids)
+    author_ids_before_update: set = set(post.author_ids)
 
     if "tags" in parsed_json:
         tags: list = validate_tags_format(parsed_json=parsed_json)
@@ -108,23 +112,39 @@ def update_post(post, parsed_json):
     if "text" in parsed_json: 
         text: str = validate_text_format(parsed_json=parsed_json)
         database_operations.update_text_of_post(post=post, text=text)
-    
-    # Commit transaction after this batch of changes to get better
-    # performance, maintain data integrity, and prevent inconsistent
-    # states in the database.
-    database_operations.commit_changes()
 
-    return Post.get_post_by_post_id(post_id=int(post.id))
+    # Send the changes to the post's shard before author changes write to
+    # other shards, but leave committing to the caller so that the
+    # response can be built from the post already in memory.
+    with sharding.on_shard_of_post(post.id, writing=True):
+        database_operations.flush_changes()
+
+    if "authorIds" in parsed_json:
+        deduplicated_author_ids: set = validate_authorIds_format(parsed_json=parsed_json)
+        database_operations.update_author_ids_of_post(post=post, 
+                                                      deduplicated_author_ids=deduplicated_author_ids)
+
+    # Feeds of every author, past or present, show this post differently now.
+    database_operations.bump_author_versions(user_ids=author_ids_before_update | post.author_ids)
+
+    return post
         
 
 def generate_updated_post_response(existing_post, parsed_json) -> dict:
     """Return information about updated post in desired format."""
     updated_post = update_post(post=existing_post, parsed_json=parsed_json)
     updated_post_response: dict = {"id": updated_post.id, 
-                                   "authorIds": [user.id for user in updated_post.users],
+                                   "authorIds": sorted(updated_post.author_ids),
                                    "likes": updated_post.likes, 
                                    "popularity": updated_post.popularity,
                                    "reads": updated_post.reads,
                                    "tags": updated_post.tags,
                                    "text": updated_post.text} 
+
+    # Commit transaction after this batch of changes to get better
+    # performance, maintain data integrity, and prevent inconsistent
+    # states in the database.
+    database_operations.commit_changes()
+    leaderboards.forget_posts(post_ids={updated_post_response["id"]})
+
     return updated_post_response  
\ No newline at end of file
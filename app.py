@@ -15,17 +15,36 @@ def create_app():
     sys.path.append(".")  # to allow sub modules to access the parent module easily
 
     from db.shared import db
+    from db import routing, sharding, sqlite_profile
     from api import api as api_blueprint
+    import instrumentation
+    import serialization
+    import counters
 
     app = Flask(__name__)
     app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get(
         "DB_PATH", "sqlite:///database.db"
     )
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    sqlite_profile.configure(app)
+    routing.configure(app)
+    sharding.configure(app)
     app.config['JSON_SORT_KEYS'] = False
+    # opt-in per-request SQL counting, timing and Server-Timing headers
+    app.config["SQL_INSTRUMENTATION"] = os.environ.get("SQL_INSTRUMENTATION", "") == "1"
+    # opt-in async view of GET /api/posts, see api.async_posts
+    app.config["ASYNC_FEED"] = os.environ.get("ASYNC_FEED", "") == "1"
     db.init_app(app)
+    instrumentation.init_app(app)
+    serialization.init_app(app)
+    counters.init_app(app)
 
     app.register_blueprint(api_blueprint, url_prefix="/api")
+    # The async view reads the main database only, so sharded posts and read replicas keep the sync one.
+    if app.config["ASYNC_FEED"] and not app.config.get("SHARD_BINDS") and not app.config.get("READ_REPLICA_BINDS"):
+        from api.async_posts import fetch_posts_async
+
+        app.view_functions["api.fetch_posts"] = fetch_posts_async
 
     @app.errorhandler(404)
     def handle_bad_request(e):
@@ -40,6 +59,43 @@ def create_app():
         # now you're handling non-HTTP exceptions only
         return {"message": repr(e), "stack": traceback.format_exc()}, 500
 
+    @app.cli.command("upgrade-db")
+    def upgrade_db():
+        """Apply new tables and indexes to an existing database, keeping its data."""
+
+        from db import migrations
+
+        migrations.upgrade(db)
+
+    @app.cli.command("shard-posts")
+    def shard_posts():
+        """Move the posts of the main database to the shards of SHARD_URIS."""
+
+        from db import migrations
+
+        if not sharding.is_sharded():
+            print("Set SHARD_URIS to the databases to spread posts over first.")
+            sys.exit(1)
+        print(f"moved {migrations.move_posts_to_shards(db)} posts to {sharding.shard_count()} shards")
+
+    @app.cli.command("verify-author-stats")
+    @click.option("--rebuild", is_flag=True, help="Recompute every author's totals from the posts.")
+    def verify_author_stats(rebuild):
+        """Check the stored author totals against the posts, and optionally rebuild them."""
+
+        from db.models.author_stats import AuthorStats
+
+        drift = AuthorStats.find_drift()
+        for author_drift in drift:
+            print(f"author {author_drift['userId']}: stored {author_drift['stored']}, actual {author_drift['actual']}")
+        print(f"{len(drift)} author(s) drifted")
+        if rebuild:
+            AuthorStats.rebuild()
+            db.session.commit()
+            print("author stats are rebuilt!")
+        elif drift:
+            sys.exit(1)
+
     @app.cli.command()
     @click.argument("test_names", nargs=-1)
     def test(test_names):
@@ -0,0 +1,115 @@
+"""
+Compare the sync and async views of GET /api/posts under concurrent requests.
+
+    python -m benchmarks.bench_async_feed --posts 100000 --concurrency 1 8 32
+
+Each view is served by a threaded development server in a process of its
+own, the async one with ASYNC_FEED=1, and clients on threads of this
+process send feed requests of the most prolific authors, each with a
+parameter of its own so that the feed cache never answers them.  Prints
+the requests per second and the median and 95th percentile latencies of
+each view at each concurrency.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import jwt
+
+
+def serve(async_feed: bool, ports):
+    """Serve the app, with the async feed view or not, and report the port it listens on."""
+    os.environ["ASYNC_FEED"] = "1" if async_feed else ""
+    from werkzeug.serving import make_server
+    from app import create_app
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    server = make_server("127.0.0.1", 0, create_app(), threaded=True)
+    ports.put(server.server_port)
+    server.serve_forever()
+
+
+def prepare_database(directory: str, arguments) -> dict:
+    """Point DB_PATH at a new database in directory, filled with synthetic posts.  Return the generated summary."""
+    os.environ["DB_PATH"] = f"sqlite:///{directory}/feed.db"
+
+    from app import create_app
+    from db.shared import db
+    from benchmarks.generate import generate
+
+    with create_app().app_context():
+        db.create_all()
+        return generate(db, user_count=arguments.users, post_count=arguments.posts)
+
+
+def get_feed(port: int, query_string: dict, token: str) -> float:
+    """Send one feed request.  Return its latency in seconds."""
+    url = f"http://127.0.0.1:{port}/api/posts?{urllib.parse.urlencode(query_string)}"
+    started: float = time.perf_counter()
+    with urllib.request.urlopen(urllib.request.Request(url, headers={"x-access-token": token})) as response:
+        assert response.status == 200, response.status
+        json.loads(response.read())
+    return time.perf_counter() - started
+
+
+def measure(port: int, concurrency: int, query_string: dict, token: str, requests: int) -> dict:
+    """Send requests feed requests, concurrency at a time.  Return the throughput and latencies."""
+    query_strings: list = [{**query_string, "nonce": f"{concurrency}-{index}"} for index in range(requests)]
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(lambda warmup: get_feed(port, warmup, token), query_strings[:concurrency]))
+        started: float = time.perf_counter()
+        latencies: list = list(executor.map(lambda query: get_feed(port, query, token), query_strings))
+        seconds: float = time.perf_counter() - started
+    latencies.sort()
+    return {"requestsPerSecond": requests / seconds,
+            "p50Ms": statistics.median(latencies) * 1000,
+            "p95Ms": latencies[int(len(latencies) * 0.95) - 1] * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--posts", type=int, default=100000)
+    parser.add_argument("--authors", type=int, default=10, help="Number of prolific authors per feed.")
+    parser.add_argument("--limit", type=int, default=None, help="Page size; every post of the authors by default.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per view and concurrency.")
+    arguments = parser.parse_args()
+    os.environ.setdefault("SESSION_SECRET", "benchmark")
+
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory:
+        summary: dict = prepare_database(directory=directory, arguments=arguments)
+        token: str = jwt.encode({"id": summary["userIds"][0]}, os.environ["SESSION_SECRET"], algorithm="HS256")
+        query_string: dict = {"authorIds": ",".join(map(str, summary["prolificAuthorIds"][:arguments.authors])),
+                              "sortBy": "likes", "direction": "desc"}
+        if arguments.limit is not None:
+            query_string["limit"] = arguments.limit
+
+        for name, async_feed in [("sync", False), ("async", True)]:
+            ports = context.Queue()
+            server = context.Process(target=serve, args=(async_feed, ports), daemon=True)
+            server.start()
+            try:
+                port: int = ports.get(timeout=60)
+                for concurrency in arguments.concurrency:
+                    result: dict = measure(port=port, concurrency=concurrency, query_string=query_string,
+                                           token=token, requests=arguments.requests)
+                    print(f"{name:>5} x{concurrency:<3} {result['requestsPerSecond']:8.1f} requests/s  "
+                          f"p50 {result['p50Ms']:8.1f} ms  p95 {result['p95Ms']:8.1f} ms")
+            finally:
+                server.terminate()
+                server.join()
+
+
+if __name__ == "__main__":
+    main()
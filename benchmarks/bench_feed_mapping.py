@@ -0,0 +1,85 @@
+"""
+Compare the ORM feed read path with the Core row path used by display_posts.
+
+    python -m benchmarks.bench_feed_mapping --posts 20000
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from app import create_app
+from db.shared import db
+from db.models.post import Post
+from db.models.user import User
+from db.models.user_post import UserPost
+from api.util import helpers_to_fetch_posts
+
+
+def orm_feed(author_ids: set) -> list[dict]:
+    """The feed as built before: Post objects, row_to_dict, then a re-sorted copy of each dict."""
+    posts: list = Post.get_sorted_posts_by_user_ids(user_ids=author_ids, sort_by="likes", direction="desc")
+    return helpers_to_fetch_posts.format_posts(posts=posts)
+
+
+def core_feed(author_ids: set) -> list[dict]:
+    """The feed as display_posts builds it now."""
+    return helpers_to_fetch_posts.display_posts(parsed_author_ids=author_ids, sort_by="likes", direction="desc")
+
+
+def measure(feed, author_ids: set, repeat: int) -> dict:
+    """Time a feed builder and trace its peak memory, on a fresh session each run."""
+    timings: list = []
+    for _ in range(repeat):
+        db.session.remove()
+        started = time.perf_counter()
+        feed(author_ids)
+        timings.append(time.perf_counter() - started)
+
+    db.session.remove()
+    tracemalloc.start()
+    feed(author_ids)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"bestSeconds": min(timings), "peakBytes": peak_bytes}
+
+
+def insert_posts(post_count: int) -> set:
+    """Insert one author with post_count posts.  Return the author ids."""
+    db.session.execute(User.__table__.insert(), [{"id": 1, "username": "author", "password": "-", "salt": "-"}])
+    db.session.execute(Post.__table__.insert(), [
+        {"id": post_id, "text": f"post {post_id} " * 20, "likes": post_id % 500,
+         "reads": post_id % 1000, "popularity": (post_id % 100) / 100, "tags": "travel,food"}
+        for post_id in range(1, post_count + 1)
+    ])
+    db.session.execute(UserPost.__table__.insert(), [
+        {"user_id": 1, "post_id": post_id} for post_id in range(1, post_count + 1)
+    ])
+    db.session.commit()
+    return {1}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DB_PATH"] = f"sqlite:///{directory}/bench.db"
+        with create_app().app_context():
+            db.create_all()
+            author_ids: set = insert_posts(post_count=arguments.posts)
+            assert orm_feed(author_ids) == core_feed(author_ids)
+
+            for name, feed in [("orm", orm_feed), ("core", core_feed)]:
+                result: dict = measure(feed=feed, author_ids=author_ids, repeat=arguments.repeat)
+                print(f"{name:>5}: {result['bestSeconds'] * 1000:8.1f} ms  "
+                      f"{result['bestSeconds'] / arguments.posts * 1e6:6.2f} us/post  "
+                      f"peak {result['peakBytes'] / 2 ** 20:6.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Measure how the throughput of post writes scales with the number of shards.
+
+    python -m benchmarks.bench_shard_writes --shards 0 1 2 4 --writers 4
+
+Each writer is a process of its own that creates posts through
+POST /api/posts/batch as a user of its own, and the writers are spread
+evenly over the home shards.  With one database file every writer waits
+for SQLite's single write lock; with more shards, writers of different
+shards commit in parallel, as far as there are cores to run them.
+0 shards runs without sharding, as a baseline.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+import jwt
+
+
+def write_posts(writer_id: int, batches: int, batch_size: int, barrier, results):
+    """Create batches of posts as user writer_id, after one warmup batch, and report when writing started and ended."""
+    from app import create_app
+
+    client = create_app().test_client()
+    headers = {"x-access-token": jwt.encode({"id": writer_id}, os.environ["SESSION_SECRET"], algorithm="HS256")}
+    data = json.dumps([{"text": f"post {index} of writer {writer_id} " * 10, "tags": ["travel", "food"]}
+                       for index in range(batch_size)])
+
+    def write_batch():
+        response = client.post("/api/posts/batch", headers=headers, data=data)
+        assert response.status_code == 200, (response.status_code, response.get_data(as_text=True)[:200])
+
+    write_batch()
+    barrier.wait()
+    started: float = time.monotonic()
+    for _ in range(batches):
+        write_batch()
+    results.put((started, time.monotonic()))
+
+
+def prepare_databases(directory: str, shard_count: int, writer_count: int):
+    """Point DB_PATH and SHARD_URIS at new files in directory, with the tables and one user per writer."""
+    os.environ["DB_PATH"] = f"sqlite:///{directory}/main.db"
+    os.environ["SHARD_URIS"] = ",".join(f"sqlite:///{directory}/shard_{shard}.db" for shard in range(shard_count))
+
+    from app import create_app
+    from db import migrations, sharding
+    from db.shared import db
+    from db.models.user import User
+
+    with create_app().app_context():
+        db.create_all()
+        if sharding.is_sharded():
+            migrations.create_tables_on_shards(db)
+        db.session.execute(User.__table__.insert(), [{"id": user_id, "username": f"writer{user_id}", "password": "-", "salt": "-"}
+                                                      for user_id in range(1, writer_count + 1)])
+        db.session.commit()
+
+
+def measure(shard_count: int, arguments) -> float:
+    """Run the writers against shard_count shards.  Return the posts written per second."""
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory:
+        prepare_databases(directory=directory, shard_count=shard_count, writer_count=arguments.writers)
+        barrier = context.Barrier(arguments.writers)
+        results = context.Queue()
+        writers: list = [context.Process(target=write_posts,
+                                         args=(writer_id, arguments.batches, arguments.batch_size, barrier, results))
+                         for writer_id in range(1, arguments.writers + 1)]
+        for writer in writers:
+            writer.start()
+        timings: list = [results.get() for _ in writers]
+        for writer in writers:
+            writer.join()
+
+    seconds: float = max(ended for _, ended in timings) - min(started for started, _ in timings)
+    return arguments.writers * arguments.batches * arguments.batch_size / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shards", type=int, nargs="+", default=[0, 1, 2, 4])
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--batches", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=20)
+    arguments = parser.parse_args()
+    os.environ.setdefault("SESSION_SECRET", "benchmark")
+
+    baseline = None
+    for shard_count in arguments.shards:
+        posts_per_second: float = measure(shard_count=shard_count, arguments=arguments)
+        baseline = baseline or posts_per_second
+        print(f"{shard_count or 'no':>3} shards: {posts_per_second:9.0f} posts/s  {posts_per_second / baseline:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Compare two result files of benchmarks.run and flag regressions.
+
+    python -m benchmarks.compare before.json after.json --threshold 1.10
+
+Exits with status 1 when any benchmark's median got slower than the threshold ratio.
+"""
+import argparse
+import json
+import sys
+
+
+def compare(before: dict, after: dict, threshold: float) -> list[str]:
+    """Print median timings side by side.  Return the names of benchmarks that regressed."""
+    regressions: list[str] = []
+    print(f"{'benchmark':<40} {'before ms':>10} {'after ms':>10} {'ratio':>7}")
+    for name, result in after["results"].items():
+        if name not in before["results"]:
+            print(f"{name:<40} {'-':>10} {result['medianMs']:10.2f}")
+            continue
+        ratio: float = result["medianMs"] / before["results"][name]["medianMs"]
+        flag: str = "  REGRESSION" if ratio > threshold else ""
+        print(f"{name:<40} {before['results'][name]['medianMs']:10.2f} {result['medianMs']:10.2f} {ratio:7.2f}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=1.10)
+    arguments = parser.parse_args()
+
+    with open(arguments.before) as before, open(arguments.after) as after:
+        regressions: list[str] = compare(json.load(before), json.load(after), threshold=arguments.threshold)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Fill a database with synthetic users and posts, fast enough for benchmarks at scale.
+
+    DB_PATH=sqlite:///bench.db python -m benchmarks.generate --users 1000 --posts 100000
+
+Everything is written with bulk statements in a few large transactions.
+Every user shares one password hash computed once, so no per-row bcrypt.
+"""
+import argparse
+import random
+
+import bcrypt
+
+from db.shared import db
+from db.models.post import Post
+from db.models.post_tag import PostTag
+from db.models.author_stats import AuthorStats
+from db.models.user import User, BCRYPT_ROUNDS
+from db.models.user_post import UserPost
+
+BENCHMARK_PASSWORD = "benchmark"
+
+WORDS = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore "
+         "et dolore magna aliqua enim ad minim veniam quis nostrud exercitation ullamco laboris nisi aliquip "
+         "ex ea commodo consequat duis aute irure in reprehenderit voluptate velit esse cillum fugiat nulla").split()
+
+TAGS = ("travel food recipes baking hotels airbnb vacation spa tech science music art books movies sports "
+        "health fitness fashion design photography gardening history politics finance parenting pets").split()
+
+# Share of posts with 1, 2, 3 and 4 authors.
+AUTHOR_COUNT_WEIGHTS = (0.70, 0.20, 0.07, 0.03)
+
+
+def zipf_weights(count: int, exponent: float = 1.1) -> list[float]:
+    """Weights of a Zipf distribution: a few items are very common, most are rare."""
+    return [1 / rank ** exponent for rank in range(1, count + 1)]
+
+
+def generate(db, user_count: int, post_count: int, seed: int = 0, chunk_size: int = 10000) -> dict:
+    """Insert user_count users and post_count posts.  Return a summary including the most prolific author ids."""
+    randomizer = random.Random(seed)
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
+    password_hash = bcrypt.hashpw(BENCHMARK_PASSWORD.encode("utf-8"), salt).decode("ascii")
+
+    first_user_id: int = (db.session.scalar(db.select(db.func.max(User.id))) or 0) + 1
+    user_ids: list[int] = list(range(first_user_id, first_user_id + user_count))
+    db.session.execute(User.__table__.insert(), [
+        {"id": user_id, "username": f"user{user_id}", "password": password_hash, "salt": salt.decode("ascii")}
+        for user_id in user_ids
+    ])
+    db.session.commit()
+
+    # Authors are picked Zipf-wise, so a few of them are prolific.
+    author_weights: list[float] = zipf_weights(user_count)
+    tag_weights: list[float] = zipf_weights(len(TAGS))
+    author_post_counts: dict = {}
+
+    first_post_id: int = (db.session.scalar(db.select(db.func.max(Post.id))) or 0) + 1
+    for chunk_start in range(0, post_count, chunk_size):
+        post_ids = range(first_post_id + chunk_start, first_post_id + min(chunk_start + chunk_size, post_count))
+        posts, user_posts, tags_by_post_id = [], [], {}
+        for post_id in post_ids:
+            reads = int(randomizer.paretovariate(1.2) * 10)
+            likes = randomizer.randint(0, reads)
+            tags = list(dict.fromkeys(randomizer.choices(TAGS, weights=tag_weights, k=randomizer.randint(1, 4))))
+            posts.append({"id": post_id,
+                          "text": " ".join(randomizer.choices(WORDS, k=randomizer.randint(20, 80))),
+                          "likes": likes,
+                          "reads": reads,
+                          "popularity": round(randomizer.random(), 2),
+                          "tags": ",".join(tags)})
+            tags_by_post_id[post_id] = tags
+
+            author_count = randomizer.choices(range(1, len(AUTHOR_COUNT_WEIGHTS) + 1), weights=AUTHOR_COUNT_WEIGHTS)[0]
+            for author_id in set(randomizer.choices(user_ids, weights=author_weights, k=author_count)):
+                user_posts.append({"user_id": author_id, "post_id": post_id})
+                author_post_counts[author_id] = author_post_counts.get(author_id, 0) + 1
+
+        db.session.execute(Post.__table__.insert(), posts)
+        db.session.execute(UserPost.__table__.insert(), user_posts)
+        PostTag.replace_tags_of_posts(connection=db.session.connection(), tags_by_post_id=tags_by_post_id)
+        db.session.commit()
+
+    AuthorStats.rebuild()
+    db.session.commit()
+
+    prolific_author_ids: list[int] = sorted(author_post_counts, key=author_post_counts.get, reverse=True)
+    return {"userIds": user_ids,
+            "postIds": [first_post_id, first_post_id + post_count - 1],
+            "prolificAuthorIds": prolific_author_ids[:100],
+            "postCountsOfProlificAuthors": [author_post_counts[author_id] for author_id in prolific_author_ids[:10]],
+            "password": BENCHMARK_PASSWORD}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--posts", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    arguments = parser.parse_args()
+
+    from app import create_app
+
+    with create_app().app_context():
+        db.create_all()
+        summary: dict = generate(db, user_count=arguments.users, post_count=arguments.posts, seed=arguments.seed)
+    print(f"generated {arguments.users} users and {arguments.posts} posts; "
+          f"most prolific authors have {summary['postCountsOfProlificAuthors']} posts")
+
+
+if __name__ == "__main__":
+    main()
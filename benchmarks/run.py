@@ -0,0 +1,299 @@
+"""
+Run repeatable benchmarks of the API endpoints and feed helpers on synthetic data.
+
+    python -m benchmarks.run --users 1000 --posts 100000 --output bench.json
+    python -m benchmarks.compare before.json after.json
+
+Each benchmark is timed through the Flask test client (or called directly
+for helpers) after a warmup, and the results are written as JSON so that
+runs on different commits can be compared.
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import jwt
+
+BENCHMARKS: dict = {}
+
+
+def benchmark(name: str):
+    """Register a benchmark.  It receives the run context and returns the callable to time."""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def expect_ok(response):
+    assert response.status_code == 200, (response.status_code, response.get_data(as_text=True)[:200])
+    return response
+
+
+def get(context: dict, path: str, query_string: dict):
+    return expect_ok(context["client"].get(path, headers=context["headers"], query_string=query_string))
+
+
+@benchmark("feed_one_prolific_author")
+def feed_one_prolific_author(context: dict):
+    query_string = {"authorIds": str(context["authorIds"][0])}
+    return lambda: get(context, "/api/posts", query_string)
+
+
+@benchmark("feed_ten_authors_by_likes_desc")
+def feed_ten_authors_by_likes_desc(context: dict):
+    query_string = {"authorIds": ",".join(map(str, context["authorIds"][:10])), "sortBy": "likes", "direction": "desc"}
+    return lambda: get(context, "/api/posts", query_string)
+
+
+@benchmark("feed_ten_authors_filtered_by_tag")
+def feed_ten_authors_filtered_by_tag(context: dict):
+    query_string = {"authorIds": ",".join(map(str, context["authorIds"][:10])), "tags": "spa,books"}
+    return lambda: get(context, "/api/posts", query_string)
+
+
+@benchmark("feed_first_page_of_50")
+def feed_first_page_of_50(context: dict):
+    query_string = {"authorIds": ",".join(map(str, context["authorIds"][:10])), "sortBy": "popularity",
+                    "direction": "desc", "limit": 50}
+    return lambda: get(context, "/api/posts", query_string)
+
+
+@benchmark("feed_deep_page_of_50")
+def feed_deep_page_of_50(context: dict):
+    query_string = {"authorIds": ",".join(map(str, context["authorIds"][:10])), "sortBy": "popularity",
+                    "direction": "desc", "limit": 50}
+    for _ in range(40):
+        next_cursor = get(context, "/api/posts", query_string).json["nextCursor"]
+        if next_cursor is None:
+            break
+        query_string["cursor"] = next_cursor
+    return lambda: get(context, "/api/posts", query_string)
+
+
+@benchmark("feed_ten_authors_not_modified")
+def feed_ten_authors_not_modified(context: dict):
+    query_string = {"authorIds": ",".join(map(str, context["authorIds"][:10])), "sortBy": "likes", "direction": "desc"}
+    etag = get(context, "/api/posts", query_string).headers["ETag"]
+    headers = {**context["headers"], "If-None-Match": etag}
+
+    def revalidate():
+        response = context["client"].get("/api/posts", headers=headers, query_string=query_string)
+        assert response.status_code == 304, response.status_code
+    return revalidate
+
+
+@benchmark("top_ten_by_popularity")
+def top_ten_by_popularity(context: dict):
+    return lambda: get(context, "/api/posts/top", {"sortBy": "popularity", "limit": 10})
+
+
+@benchmark("search_two_words")
+def search_two_words(context: dict):
+    query_string = {"q": "lorem dolor", "limit": 20}
+    return lambda: get(context, "/api/posts/search", query_string)
+
+
+@benchmark("patch_post_text")
+def patch_post_text(context: dict):
+    post_id, author_id = context["postOfProlificAuthor"]
+    headers = {**context["headersOf"](author_id), "Content-Type": "application/json"}
+    data = json.dumps({"text": "benchmark text"})
+    return lambda: expect_ok(context["client"].patch(f"/api/posts/{post_id}", headers=headers, data=data))
+
+
+@benchmark("patch_post_author_ids")
+def patch_post_author_ids(context: dict):
+    post_id, author_id = context["postOfProlificAuthor"]
+    headers = {**context["headersOf"](author_id), "Content-Type": "application/json"}
+    co_author_ids = iter(context["authorIds"][1:] * 1000)
+    return lambda: expect_ok(context["client"].patch(
+        f"/api/posts/{post_id}", headers=headers,
+        data=json.dumps({"authorIds": [author_id, next(co_author_ids)]})))
+
+
+@benchmark("create_post")
+def create_post(context: dict):
+    data = json.dumps({"text": "benchmark post", "tags": ["travel", "food"]})
+    return lambda: expect_ok(context["client"].post("/api/posts", headers=context["headers"], data=data))
+
+
+@benchmark("create_posts_batch_of_100")
+def create_posts_batch_of_100(context: dict):
+    data = json.dumps([{"text": f"benchmark post {index}", "tags": ["travel", "food"],
+                        "authorIds": context["authorIds"][:2]} for index in range(100)])
+    return lambda: expect_ok(context["client"].post("/api/posts/batch", headers=context["headers"], data=data))
+
+
+@benchmark("count_post_read")
+def count_post_read(context: dict):
+    post_id, _ = context["postOfProlificAuthor"]
+    return lambda: context["client"].post(f"/api/posts/{post_id}/read", headers=context["headers"])
+
+
+@benchmark("login")
+def login(context: dict):
+    data = json.dumps({"username": f"user{context['authorIds'][0]}", "password": context["password"]})
+    return lambda: expect_ok(context["client"].post("/api/login", data=data, content_type="application/json"))
+
+
+@benchmark("helper_display_posts")
+def helper_display_posts(context: dict):
+    from api.util import helpers_to_fetch_posts
+
+    author_ids = set(context["authorIds"][:10])
+    return lambda: helpers_to_fetch_posts.display_posts(parsed_author_ids=author_ids, sort_by="likes", direction="desc")
+
+
+@benchmark("helper_get_sorted_posts_by_user_ids")
+def helper_get_sorted_posts_by_user_ids(context: dict):
+    from db.models.post import Post
+
+    author_ids = set(context["authorIds"][:10])
+    return lambda: Post.get_sorted_posts_by_user_ids(user_ids=author_ids, sort_by="likes", direction="desc")
+
+
+@benchmark("serialize_feed_with_json")
+def serialize_feed_with_json(context: dict):
+    import serialization
+    from api.util import helpers_to_fetch_posts
+
+    feed: dict = {"posts": helpers_to_fetch_posts.display_posts(parsed_author_ids=set(context["authorIds"][:10]),
+                                                                sort_by="likes", direction="desc")}
+    return lambda: serialization.dumps_with_json(feed)
+
+
+@benchmark("serialize_feed_with_orjson")
+def serialize_feed_with_orjson(context: dict):
+    import serialization
+    from api.util import helpers_to_fetch_posts
+
+    feed: dict = {"posts": helpers_to_fetch_posts.display_posts(parsed_author_ids=set(context["authorIds"][:10]),
+                                                                sort_by="likes", direction="desc")}
+    return lambda: serialization.dumps_with_orjson(feed)
+
+
+@benchmark("helper_get_sorted_posts_small_feed")
+def helper_get_sorted_posts_small_feed(context: dict):
+    from db.models.post import Post
+
+    author_ids = {context["authorIds"][-1]}
+    return lambda: Post.get_sorted_posts_by_user_ids(user_ids=author_ids, sort_by="likes", direction="desc", limit=10)
+
+
+@benchmark("helper_get_sorted_post_rows_small_feed")
+def helper_get_sorted_post_rows_small_feed(context: dict):
+    from db.models.post import Post
+
+    author_ids = {context["authorIds"][-1]}
+    return lambda: Post.get_sorted_post_rows_by_user_ids(user_ids=author_ids, sort_by="likes", direction="desc", limit=10)
+
+
+def time_calls(call, repeat: int, warmup: int) -> dict:
+    """Call a benchmark warmup + repeat times and summarize the timed calls in milliseconds."""
+    from db.shared import db
+
+    for _ in range(warmup):
+        call()
+        db.session.remove()
+
+    timings: list[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - started) * 1000)
+        # Start every call from an empty identity map, like a new request.
+        db.session.remove()
+
+    timings.sort()
+    return {"runs": repeat,
+            "minMs": timings[0],
+            "medianMs": statistics.median(timings),
+            "p95Ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+            "meanMs": statistics.fmean(timings)}
+
+
+def describe_environment(arguments) -> dict:
+    try:
+        git_commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        git_commit = None
+    return {"gitCommit": git_commit or None,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "users": arguments.users,
+            "posts": arguments.posts,
+            "seed": arguments.seed,
+            "repeat": arguments.repeat,
+            "warmup": arguments.warmup}
+
+
+def run(arguments) -> dict:
+    os.environ.setdefault("SESSION_SECRET", "benchmark")
+
+    from app import create_app
+    from db.shared import db
+    from db.models.user_post import UserPost
+    from benchmarks.generate import generate
+    from counters import flush_counters
+
+    names: list[str] = arguments.only or list(BENCHMARKS)
+    results: dict = {}
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DB_PATH"] = f"sqlite:///{directory}/bench.db"
+        app = create_app()
+        with app.app_context():
+            db.create_all()
+            summary: dict = generate(db, user_count=arguments.users, post_count=arguments.posts, seed=arguments.seed)
+            author_id: int = summary["prolificAuthorIds"][0]
+            post_id: int = db.session.scalar(db.select(UserPost.post_id).where(UserPost.user_id == author_id))
+
+            def headers_of(user_id: int) -> dict:
+                return {"x-access-token": jwt.encode({"id": user_id}, os.environ["SESSION_SECRET"], algorithm="HS256")}
+
+            context: dict = {"client": app.test_client(),
+                             "authorIds": summary["prolificAuthorIds"],
+                             "password": summary["password"],
+                             "postOfProlificAuthor": (post_id, author_id),
+                             "headers": headers_of(author_id),
+                             "headersOf": headers_of}
+
+            for name in names:
+                call = BENCHMARKS[name](context)
+                results[name] = time_calls(call, repeat=arguments.repeat, warmup=arguments.warmup)
+                print(f"{name:<40} median {results[name]['medianMs']:9.2f} ms   p95 {results[name]['p95Ms']:9.2f} ms")
+
+            # Write buffered counts while the database still exists.
+            flush_counters()
+
+    return {"environment": describe_environment(arguments), "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--posts", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--only", nargs="*", choices=sorted(BENCHMARKS), help="run only these benchmarks")
+    parser.add_argument("--output", default="bench.json", help="where to write the JSON results")
+    arguments = parser.parse_args()
+
+    report: dict = run(arguments)
+    with open(arguments.output, "w") as output:
+        json.dump(report, output, indent=2)
+    print(f"wrote {arguments.output}")
+
+
+if __name__ == "__main__":
+    main()
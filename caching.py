@@ -0,0 +1,80 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe, process-local LRU cache whose entries also expire after a time to live."""
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached value, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl_seconds: float = None):
+        """Cache a value, evicting the least recently used entry when full."""
+        ttl_seconds = self.ttl_seconds if ttl_seconds is None else min(ttl_seconds, self.ttl_seconds)
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete_where(self, predicate) -> int:
+        """Delete every entry whose value matches the predicate.  Return how many were deleted."""
+        with self._lock:
+            keys = [key for key, (value, _) in self._entries.items() if predicate(value)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def clear(self):
+        """Delete every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Report size and hit/miss counters so that the cache can be sized."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"size": len(self._entries),
+                    "maxSize": self.max_size,
+                    "ttlSeconds": self.ttl_seconds,
+                    "hits": self.hits,
+                    "misses": self.misses,
+                    "evictions": self.evictions,
+                    "hitRate": self.hits / lookups if lookups else None}
+
+
+# verified token -> authenticated user principal, used by middlewares.auth_required
+auth_cache = TTLCache(max_size=int(os.environ.get("AUTH_CACHE_MAX_SIZE", 10000)),
+                      ttl_seconds=float(os.environ.get("AUTH_CACHE_TTL_SECONDS", 300)))
+
+# feed ETag -> (author ids, rendered body), used by api.posts.fetch_posts
+feed_cache = TTLCache(max_size=int(os.environ.get("FEED_CACHE_MAX_SIZE", 1024)),
+                      ttl_seconds=float(os.environ.get("FEED_CACHE_TTL_SECONDS", 300)))
+
+# Larger feeds are still served with an ETag but are not kept in memory.
+FEED_CACHE_MAX_BODY_BYTES = int(os.environ.get("FEED_CACHE_MAX_BODY_BYTES", 1024 * 1024))
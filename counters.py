@@ -0,0 +1,194 @@
+import atexit
+import logging
+import os
+import threading
+import time
+
+from flask import current_app
+
+logger = logging.getLogger("counters")
+
+
+class CounterBuffer:
+    """Thread-safe, process-local buffer of read and like increments per post, to write behind in batches.
+
+    Increments of the same post coalesce into one pending entry.  Posts are
+    spread over shards with a lock each, so concurrent increments rarely
+    wait on each other.  When a shard holds max_pending_posts / shard_count
+    posts, increments of further posts are dropped and counted instead of
+    growing the buffer without bound.
+    """
+
+    def __init__(self, shard_count: int, max_pending_posts: int):
+        self.shard_count = shard_count
+        self.max_pending_posts_per_shard = max(1, max_pending_posts // shard_count)
+        self._shards = [{} for _ in range(shard_count)]
+        self._shard_locks = [threading.Lock() for _ in range(shard_count)]
+        self._lock = threading.Lock()
+        self.oldest_pending_at = None
+        self.dropped_increments = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.flushed_increments = 0
+        self.last_flush_lag_seconds = None
+        self.max_flush_lag_seconds = 0.0
+        self.last_flush_seconds = None
+
+    def increment(self, post_id: int, reads: int = 0, likes: int = 0) -> bool:
+        """Buffer increments of a post.  Return False if they were dropped because the buffer is full."""
+        shard_index: int = post_id % self.shard_count
+        with self._shard_locks[shard_index]:
+            shard: dict = self._shards[shard_index]
+            counts = shard.get(post_id)
+            if counts is None and len(shard) < self.max_pending_posts_per_shard:
+                counts = shard[post_id] = [0, 0]
+            if counts is not None:
+                counts[0] += reads
+                counts[1] += likes
+        with self._lock:
+            if counts is None:
+                self.dropped_increments += reads + likes
+                return False
+            if self.oldest_pending_at is None:
+                self.oldest_pending_at = time.monotonic()
+            return True
+
+    def drain(self) -> tuple:
+        """Take every pending increment out of the buffer, as ({post_id: [reads, likes]}, time of the oldest)."""
+        with self._lock:
+            oldest_pending_at, self.oldest_pending_at = self.oldest_pending_at, None
+        drained: dict = {}
+        for shard_index, shard_lock in enumerate(self._shard_locks):
+            with shard_lock:
+                drained.update(self._shards[shard_index])
+                self._shards[shard_index] = {}
+        return drained, oldest_pending_at
+
+    def restore(self, drained: dict, oldest_pending_at: float):
+        """Put back increments whose flush failed, so they are retried with the next one."""
+        for post_id, (reads, likes) in drained.items():
+            shard_index: int = post_id % self.shard_count
+            with self._shard_locks[shard_index]:
+                counts = self._shards[shard_index].setdefault(post_id, [0, 0])
+                counts[0] += reads
+                counts[1] += likes
+        with self._lock:
+            self.failed_flushes += 1
+            if oldest_pending_at is not None:
+                self.oldest_pending_at = min(self.oldest_pending_at or oldest_pending_at, oldest_pending_at)
+
+    def record_flush(self, increments: int, oldest_pending_at: float, started_at: float):
+        with self._lock:
+            self.flushes += 1
+            self.flushed_increments += increments
+            self.last_flush_lag_seconds = started_at - oldest_pending_at
+            self.max_flush_lag_seconds = max(self.max_flush_lag_seconds, self.last_flush_lag_seconds)
+            self.last_flush_seconds = time.monotonic() - started_at
+
+    def stats(self) -> dict:
+        """Report pending and dropped increments, and how long increments waited to be written."""
+        pending_posts: int = 0
+        pending_increments: int = 0
+        for shard_index, shard_lock in enumerate(self._shard_locks):
+            with shard_lock:
+                pending_posts += len(self._shards[shard_index])
+                pending_increments += sum(reads + likes for reads, likes in self._shards[shard_index].values())
+        with self._lock:
+            return {"shards": self.shard_count,
+                    "pendingPosts": pending_posts,
+                    "pendingIncrements": pending_increments,
+                    "oldestPendingSeconds": (time.monotonic() - self.oldest_pending_at
+                                             if self.oldest_pending_at is not None else None),
+                    "droppedIncrements": self.dropped_increments,
+                    "flushes": self.flushes,
+                    "failedFlushes": self.failed_flushes,
+                    "flushedIncrements": self.flushed_increments,
+                    "lastFlushLagSeconds": self.last_flush_lag_seconds,
+                    "maxFlushLagSeconds": self.max_flush_lag_seconds,
+                    "lastFlushSeconds": self.last_flush_seconds}
+
+
+def get_post_counters() -> CounterBuffer:
+    """The buffer of reads and likes of posts of the current app, for api.posts."""
+    return current_app.extensions["post_counters"]
+
+
+def flush_counters() -> int:
+    """Write the buffered increments of the current app to the database in one transaction.  Return how many posts were updated.
+
+    Must run in an app context.  On failure the increments go back into the
+    buffer and the error is raised.
+    """
+    import leaderboards
+    from api.util import helpers_to_fetch_posts
+    from repository_layer import database_operations
+
+    post_counters: CounterBuffer = get_post_counters()
+    started_at: float = time.monotonic()
+    drained, oldest_pending_at = post_counters.drain()
+    if not drained:
+        return 0
+    try:
+        post_rows: list = database_operations.add_counts_of_posts(counts=[{"post_id": post_id, "reads": reads, "likes": likes}
+                                                                          for post_id, (reads, likes) in drained.items()])
+        database_operations.commit_changes()
+    except Exception:
+        database_operations.rollback_changes()
+        post_counters.restore(drained, oldest_pending_at)
+        raise
+    post_counters.record_flush(increments=sum(reads + likes for reads, likes in drained.values()),
+                               oldest_pending_at=oldest_pending_at,
+                               started_at=started_at)
+    leaderboards.offer_posts(posts=helpers_to_fetch_posts.rows_to_feed_posts(rows=post_rows))
+    return len(drained)
+
+
+def flush_counters_of_app(app):
+    with app.app_context():
+        try:
+            flush_counters()
+        except Exception:
+            logger.exception("Flushing post counters failed; will retry")
+
+
+def start_flusher(app):
+    """Flush the app's buffer every COUNTER_FLUSH_INTERVAL_SECONDS on a background thread, and once more at exit."""
+    stopping = threading.Event()
+
+    def flush_periodically():
+        while not stopping.wait(app.config["COUNTER_FLUSH_INTERVAL_SECONDS"]):
+            flush_counters_of_app(app)
+
+    def flush_at_exit():
+        stopping.set()
+        flush_counters_of_app(app)
+
+    flusher = threading.Thread(target=flush_periodically, name="counter-flusher", daemon=True)
+    flusher.start()
+    atexit.register(flush_at_exit)
+    return flusher
+
+
+_flusher_lock = threading.Lock()
+
+
+def increment(post_id: int, reads: int = 0, likes: int = 0) -> bool:
+    """Buffer increments of a post in the current app, starting its flusher on first use.  Return False if they were dropped."""
+    app = current_app._get_current_object()
+    if app.config["COUNTER_FLUSH_INTERVAL_SECONDS"] > 0 and "counter_flusher" not in app.extensions:
+        with _flusher_lock:
+            if "counter_flusher" not in app.extensions:
+                app.extensions["counter_flusher"] = start_flusher(app)
+    return get_post_counters().increment(post_id, reads=reads, likes=likes)
+
+
+def init_app(app):
+    """Give the app its counter buffer, which only its own flusher drains.
+
+    Reads COUNTER_FLUSH_INTERVAL_SECONDS; 0 leaves flushing to whoever calls
+    flush_counters.
+    """
+    app.config.setdefault("COUNTER_FLUSH_INTERVAL_SECONDS",
+                          float(os.environ.get("COUNTER_FLUSH_INTERVAL_SECONDS", 1.0)))
+    app.extensions["post_counters"] = CounterBuffer(shard_count=int(os.environ.get("COUNTER_SHARDS", 16)),
+                                                    max_pending_posts=int(os.environ.get("COUNTER_MAX_PENDING_POSTS", 100000)))
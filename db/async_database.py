@@ -0,0 +1,66 @@
+"""
+An asyncio engine on the main database, for async views such as
+api.async_posts.fetch_posts_async.
+
+It needs aiosqlite, which is optional and only loaded when the engine
+first connects.  Flask runs each async view in an event loop of its own,
+and a connection cannot move between event loops, so connections are not
+pooled: connect() opens one and applies the per-connection pragmas of the
+sync engine (see db.sqlite_profile), leaving journal_mode to the sync
+engine, which sets it in the database file.  A view should do all of its
+queries on one connection, as auth_required_async and the view it wraps
+do.  Neither read replicas nor shards are used; the async path always
+reads the main database.
+"""
+import threading
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from db import sqlite_profile
+
+# Async driver of each backend that has one.
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite"}
+
+
+def async_url(database_uri: str):
+    """The URL of a database for its async driver."""
+    url = make_url(database_uri)
+    backend_name: str = url.get_backend_name()
+    if backend_name not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver for {backend_name} databases.")
+    return url.set(drivername=ASYNC_DRIVERS[backend_name])
+
+
+def create_engine(database_uri: str):
+    """Create an async engine that opens a new connection per connect(), with the per-connection pragmas of the sync profile."""
+    options: dict = sqlite_profile.engine_options(database_uri)
+    engine = create_async_engine(async_url(database_uri),
+                                 poolclass=NullPool,
+                                 connect_args={"timeout": options["connect_args"]["timeout"]} if options else {})
+    pragmas: dict = {pragma: value for pragma, value in options.get("sqlite_pragmas", {}).items()
+                     if pragma not in sqlite_profile.PERSISTENT_PRAGMAS}
+    if pragmas:
+        event.listen(engine.sync_engine, "connect",
+                     lambda dbapi_connection, connection_record: sqlite_profile.apply_pragmas(dbapi_connection, pragmas))
+    return engine
+
+
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    app = current_app._get_current_object()
+    if "async_engine" not in app.extensions:
+        with _engine_lock:
+            if "async_engine" not in app.extensions:
+                app.extensions["async_engine"] = create_engine(app.config["SQLALCHEMY_DATABASE_URI"])
+    return app.extensions["async_engine"]
+
+
+def connect():
+    """An AsyncConnection to the main database, to use as `async with connect() as connection`."""
+    return get_engine().connect()
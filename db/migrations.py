@@ -0,0 +1,152 @@
+from sqlalchemy import inspect
+
+from db import sharding
+from db.shared import SHARDED_TABLES
+from db.models.post import Post, POST_FTS_DDL
+from db.models.user_post import UserPost
+from db.models.post_tag import PostTag
+from db.models.author_stats import AuthorStats
+from db.models.author_version import AuthorVersion
+
+
+def create_missing_indexes(db) -> list[str]:
+    """Create indexes declared on the models that an existing database lacks.  Return their names."""
+    inspector = inspect(db.engine)
+    existing_table_names: set = set(inspector.get_table_names())
+
+    created_index_names: list = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_table_names:
+            continue
+        existing_index_names: set = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_index_names:
+                index.create(bind=db.engine)
+                created_index_names.append(index.name)
+
+    return created_index_names
+
+
+def backfill_post_tags(db, batch_size: int = 1000) -> int:
+    """Fill post_tag from the comma separated tags of posts that have none yet.  Return how many posts were filled."""
+    untagged_posts = (db.select(Post.id, Post._tags)
+                      .where(Post._tags != "")
+                      .where(Post.id.not_in(db.select(PostTag.post_id)))
+                      .order_by(Post.id))
+
+    backfilled_post_count: int = 0
+    last_post_id: int = 0
+    while True:
+        with db.engine.begin() as connection:
+            rows = connection.execute(untagged_posts.where(Post.id > last_post_id).limit(batch_size)).all()
+            if not rows:
+                return backfilled_post_count
+            PostTag.replace_tags_of_posts(connection=connection,
+                                          tags_by_post_id={post_id: tags.split(",") for post_id, tags in rows})
+        backfilled_post_count += len(rows)
+        last_post_id = rows[-1][0]
+
+
+def create_post_search_index(db) -> bool:
+    """Create the full-text index of post text and its triggers if missing.  Return whether it was created."""
+    if inspect(db.engine).has_table("post_fts"):
+        return False
+
+    with db.engine.begin() as connection:
+        for statement in POST_FTS_DDL:
+            connection.exec_driver_sql(statement)
+        # Index the text of every existing post in one pass.
+        connection.exec_driver_sql("INSERT INTO post_fts(post_fts) VALUES ('rebuild')")
+    return True
+
+
+def backfill_author_stats(db) -> int:
+    """Compute the totals of every author if none are stored yet.  Return how many authors got totals."""
+    if db.session.scalar(db.select(db.exists().where(AuthorStats.user_id.isnot(None)))):
+        return 0
+    AuthorStats.rebuild()
+    db.session.commit()
+    return db.session.scalar(db.select(db.func.count()).select_from(AuthorStats))
+
+
+def create_tables_on_shards(db) -> None:
+    """Create the sharded tables, with the full-text index of posts, on every shard that lacks them."""
+    tables: list = [table for table in db.metadata.sorted_tables if table.name in SHARDED_TABLES]
+    for shard in sharding.all_shards():
+        db.metadata.create_all(bind=sharding.get_engine(shard), tables=tables)
+
+
+def move_posts_to_shards(db, batch_size: int = 1000) -> int:
+    """Move the posts of the main database, with their authors, tags and feed versions, to the shards.  Return how many moved.
+
+    Posts keep their ids, so each goes to the shard its id belongs to rather
+    than to the home shard of an author; author_shard tells feeds where to
+    find them.  Author totals are rebuilt on the shards afterwards.  Run it
+    once, while nothing else writes.
+    """
+    create_tables_on_shards(db)
+    for shard in sharding.all_shards():
+        with sharding.get_engine(shard).connect() as connection:
+            if connection.scalar(db.select(db.exists().where(Post.id.isnot(None)))):
+                raise RuntimeError(f"Shard {shard} already holds posts.")
+
+    moved_post_count: int = 0
+    last_post_id: int = 0
+    author_ids_by_shard: dict = {}
+    with db.engine.connect() as primary:
+        while True:
+            post_rows: list = primary.execute(db.select(Post.__table__).where(Post.id > last_post_id)
+                                              .order_by(Post.id).limit(batch_size)).all()
+            if not post_rows:
+                break
+            last_post_id = post_rows[-1].id
+            user_post_rows: list = primary.execute(db.select(UserPost.__table__).where(
+                UserPost.post_id.in_([post_row.id for post_row in post_rows]))).all()
+
+            for shard, post_ids in sharding.group_by_shard([post_row.id for post_row in post_rows], sharding.shard_of_post).items():
+                post_ids_of_shard: set = set(post_ids)
+                with sharding.get_engine(shard).begin() as connection:
+                    connection.execute(Post.__table__.insert(), [dict(post_row._mapping) for post_row in post_rows
+                                                                 if post_row.id in post_ids_of_shard])
+                    user_posts: list = [dict(user_post_row._mapping) for user_post_row in user_post_rows
+                                        if user_post_row.post_id in post_ids_of_shard]
+                    if user_posts:
+                        connection.execute(UserPost.__table__.insert(), user_posts)
+                    PostTag.replace_tags_of_posts(connection=connection,
+                                                  tags_by_post_id={post_row.id: post_row.tags.split(",") for post_row in post_rows
+                                                                   if post_row.id in post_ids_of_shard})
+                author_ids_by_shard.setdefault(shard, set()).update(user_post["user_id"] for user_post in user_posts)
+            moved_post_count += len(post_rows)
+
+        version_rows: list = primary.execute(db.select(AuthorVersion.__table__)).all()
+
+    for shard, author_ids in author_ids_by_shard.items():
+        sharding.note_author_shards(user_ids=author_ids, shard=shard)
+    versions_by_user_id: dict = {row.user_id: dict(row._mapping) for row in version_rows}
+    for home_shard, user_ids in sharding.group_by_shard(versions_by_user_id, sharding.shard_of_author).items():
+        with sharding.get_engine(home_shard).begin() as connection:
+            connection.execute(AuthorVersion.__table__.insert(), [versions_by_user_id[user_id] for user_id in user_ids])
+    AuthorStats.rebuild()
+    db.session.commit()
+
+    with db.engine.begin() as primary:
+        for table in (PostTag.__table__, UserPost.__table__, Post.__table__, AuthorVersion.__table__, AuthorStats.__table__):
+            primary.execute(table.delete())
+    return moved_post_count
+
+
+def upgrade(db) -> None:
+    """Bring an existing database up to date with the models without dropping any data."""
+    # create_all only adds missing tables; indexes on existing tables need their own step.
+    db.create_all()
+    for index_name in create_missing_indexes(db):
+        print(f"created index {index_name}")
+    print(f"backfilled tags of {backfill_post_tags(db)} posts")
+    if create_post_search_index(db):
+        print("created full-text index of posts")
+    print(f"backfilled stats of {backfill_author_stats(db)} authors")
+
+    # Refresh planner statistics so that SQLite picks up the new indexes.
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql("ANALYZE")
+    print("db is upgraded!")
@@ -0,0 +1,11 @@
+from ..shared import db
+
+
+class AuthorShard(db.Model):
+    __tablename__ = "author_shard"
+    # Only used when posts are sharded (see db.sharding): the shards other
+    # than their home shard that hold posts of each author, such as a post
+    # they co-author with a user of another shard.  Rows live on the home
+    # shard of their author.
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
+    shard = db.Column(db.Integer, primary_key=True)
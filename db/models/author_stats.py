@@ -0,0 +1,91 @@
+from sqlalchemy.dialects.sqlite import insert
+
+from ..shared import db
+from .. import sharding
+from db.models.post import Post
+from db.models.user_post import UserPost
+
+STATS_COLUMNS = ("post_count", "total_likes", "total_reads", "total_popularity")
+
+
+class AuthorStats(db.Model):
+    __tablename__ = "author_stats"
+    # Totals over the posts of each author, kept current by every write
+    # path that changes them, so reading them never scans the posts.
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
+    post_count = db.Column(db.Integer, nullable=False, default=0)
+    total_likes = db.Column(db.Integer, nullable=False, default=0)
+    total_reads = db.Column(db.Integer, nullable=False, default=0)
+    total_popularity = db.Column(db.Float, nullable=False, default=0.0)
+
+    @staticmethod
+    def add(deltas: dict) -> None:
+        """Add {user_id: {"post_count", "total_likes", "total_reads", "total_popularity"}} to the totals of authors in one executemany.  Does not commit."""
+        if not deltas:
+            return
+        statement = insert(AuthorStats.__table__)
+        statement = statement.on_conflict_do_update(
+            index_elements=[AuthorStats.user_id],
+            set_={name: getattr(AuthorStats, name) + getattr(statement.excluded, name) for name in STATS_COLUMNS})
+        db.session.execute(statement, [{"user_id": user_id, **delta} for user_id, delta in deltas.items()])
+
+    @staticmethod
+    def get_stats_of_user(user_id: int):
+        return db.session.get(AuthorStats, user_id)
+
+    @staticmethod
+    def select_actual_stats():
+        """Build a query of the totals of each author computed from the posts themselves."""
+        return (db.select(UserPost.user_id,
+                          db.func.count().label("post_count"),
+                          db.func.coalesce(db.func.sum(Post.likes), 0).label("total_likes"),
+                          db.func.coalesce(db.func.sum(Post.reads), 0).label("total_reads"),
+                          db.func.coalesce(db.func.sum(Post.popularity), 0.0).label("total_popularity"))
+                .join(Post, Post.id == UserPost.post_id)
+                .group_by(UserPost.user_id))
+
+    @staticmethod
+    def sum_over_shards(query) -> dict:
+        """Run a query of per-author totals on every shard, or the main database, and add them up per author."""
+        totals: dict = {}
+        for shard in sharding.all_shards():
+            with sharding.on_shard(shard):
+                for row in db.session.execute(query):
+                    author_totals: list = totals.setdefault(row.user_id, [0, 0, 0, 0.0])
+                    for index, name in enumerate(STATS_COLUMNS):
+                        author_totals[index] += getattr(row, name)
+        return {user_id: tuple(author_totals) for user_id, author_totals in totals.items()}
+
+    @staticmethod
+    def find_drift(tolerance: float = 1e-6) -> list[dict]:
+        """Compare the stored totals with totals computed from the posts.  Return the authors that differ."""
+        stored: dict = AuthorStats.sum_over_shards(db.select(AuthorStats.__table__))
+        actual: dict = AuthorStats.sum_over_shards(AuthorStats.select_actual_stats())
+        drift: list[dict] = []
+        for user_id in sorted(stored.keys() | actual.keys()):
+            stored_totals: tuple = stored.get(user_id, (0, 0, 0, 0.0))
+            actual_totals: tuple = actual.get(user_id, (0, 0, 0, 0.0))
+            if any(abs(stored_total - actual_total) > tolerance
+                   for stored_total, actual_total in zip(stored_totals, actual_totals)):
+                drift.append({"userId": user_id,
+                              "stored": dict(zip(STATS_COLUMNS, stored_totals)),
+                              "actual": dict(zip(STATS_COLUMNS, actual_totals))})
+        return drift
+
+    @staticmethod
+    def rebuild() -> None:
+        """Replace every stored total with totals computed from the posts.  Does not commit."""
+        if not sharding.is_sharded():
+            db.session.execute(AuthorStats.__table__.delete())
+            db.session.execute(AuthorStats.__table__.insert().from_select(["user_id", *STATS_COLUMNS],
+                                                                           AuthorStats.select_actual_stats()))
+            return
+
+        # Posts of an author can be on several shards, but their totals live on the home shard.
+        actual: dict = AuthorStats.sum_over_shards(AuthorStats.select_actual_stats())
+        for shard in sharding.all_shards():
+            with sharding.on_shard(shard, writing=True):
+                db.session.execute(AuthorStats.__table__.delete())
+        for home_shard, user_ids in sharding.group_by_shard(actual, sharding.shard_of_author).items():
+            with sharding.on_shard(home_shard, writing=True):
+                AuthorStats.add(deltas={user_id: dict(zip(STATS_COLUMNS, actual[user_id])) for user_id in user_ids})
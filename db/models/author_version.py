@@ -0,0 +1,30 @@
+from sqlalchemy.dialects.sqlite import insert
+
+from ..shared import db
+from ..routing import read_bind_arguments
+
+
+class AuthorVersion(db.Model):
+    __tablename__ = "author_version"
+    # Bumped whenever a post of the author is created or changed, so that
+    # feeds of the author can be validated (ETag) without querying posts.
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    @staticmethod
+    def bump(user_ids: set) -> None:
+        """Increment the versions of the given authors in one executemany.  Does not commit."""
+        statement = insert(AuthorVersion.__table__).values(version=1)
+        statement = statement.on_conflict_do_update(index_elements=[AuthorVersion.user_id],
+                                                    set_={"version": AuthorVersion.version + 1})
+        db.session.execute(statement, [{"user_id": user_id} for user_id in user_ids])
+
+    @staticmethod
+    def get_versions(user_ids: set) -> dict:
+        """Get the version of each of the given authors; authors never bumped are at version 0."""
+        versions: dict = dict.fromkeys(user_ids, 0)
+        # Read from the same database as the feed these versions identify.
+        versions.update(db.session.execute(db.select(AuthorVersion.user_id, AuthorVersion.version)
+                                           .where(AuthorVersion.user_id.in_(user_ids)),
+                                           bind_arguments=read_bind_arguments()).all())
+        return versions
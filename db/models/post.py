@@ -1,19 +1,57 @@
+import heapq
+from functools import lru_cache
+from itertools import islice
+
 from sqlalchemy.orm import validates
-from sqlalchemy import desc
+from sqlalchemy import desc, and_, or_, event, inspect, table, column, DDL
 from ..shared import db
+from ..routing import read_bind_arguments
+from .. import sharding
 from db.models.user import User
+from db.models.user_post import UserPost
+from db.models.post_tag import PostTag
+
+# External-content FTS5 index over post.text.  It is not part of the models'
+# metadata: SQLite triggers on post keep it current, so every write path,
+# ORM or bulk, updates it in the same transaction as the post row.
+post_fts = table("post_fts", column("rowid"), column("post_fts"), column("rank"))
+
+POST_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS post_fts USING fts5(text, content='post', content_rowid='id')",
+    """CREATE TRIGGER IF NOT EXISTS post_fts_after_insert AFTER INSERT ON post BEGIN
+        INSERT INTO post_fts(rowid, text) VALUES (new.id, new.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS post_fts_after_delete AFTER DELETE ON post BEGIN
+        INSERT INTO post_fts(post_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS post_fts_after_update AFTER UPDATE OF text ON post BEGIN
+        INSERT INTO post_fts(post_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO post_fts(rowid, text) VALUES (new.id, new.text);
+    END""",
+]
 
 
 class Post(db.Model):
     __tablename__ = "post"
+    # (sort key, id) indexes let the feed read posts in the requested order,
+    # tiebreaker included, instead of sorting the joined rows in a temp B-tree.
+    __table_args__ = (
+        db.Index("ix_post_reads_id", "reads", "id"),
+        db.Index("ix_post_likes_id", "likes", "id"),
+        db.Index("ix_post_popularity_id", "popularity", "id"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     text = db.Column(db.String, nullable=False)
     likes = db.Column(db.Integer, default=0, nullable=False)
     reads = db.Column(db.Integer, default=0, nullable=False)
     popularity = db.Column(db.Float, default=0.0, nullable=False)
     users = db.relationship("User", secondary="user_post", viewonly=True)
+    # not a column: ids of the post's authors, set by get_post_with_author_ids
+    author_ids = None
 
-    # note: comma separated string since sqlite does not support arrays
+    # note: comma separated string since sqlite does not support arrays.
+    # It keeps the tags in order for display; post_tag holds the same tags
+    # normalized and indexed for lookups by tag, and is kept in sync on flush.
     _tags = db.Column("tags", db.String, nullable=False)
 
     # getter and setter for tags column.
@@ -38,22 +76,280 @@ class Post(db.Model):
         return Post.query.with_parent(user).all()
 
     @staticmethod
-    def get_sorted_posts_by_user_ids(user_ids: set, sort_by: str, direction: str) -> list:
-        query = Post.query.join(Post.users).filter(User.id.in_(user_ids)).distinct()
+    def get_sort_column(sort_by: str):
+        """Map a sortBy query parameter value to the column it sorts on."""
+        return SORT_COLUMNS.get(sort_by, Post.id)
+
+    @staticmethod
+    def get_sort_key(sort_by: str):
+        """Key of a post or row in the order of order_by_keyset, to merge posts sorted on different shards."""
+        name: str = Post.get_sort_column(sort_by).name
+        return lambda post: (getattr(post, name), post.id)
+
+    @staticmethod
+    def select_next_sharded_id():
+        """Build a subquery of the next free post id of the current shard, see db.sharding.
+
+        Used as the id of an insert, it is worked out under SQLite's write
+        lock, so concurrent writers of the shard cannot take the same id.
+        """
+        shard_count: int = sharding.shard_count()
+        first_post_id: int = sharding.current_shard.get() + 1
+        return (db.select(db.func.coalesce(db.func.max(Post.id), first_post_id - shard_count) + shard_count)
+                .scalar_subquery())
+
+    @staticmethod
+    def get_sorted_posts_by_user_ids(user_ids: set, sort_by: str, direction: str,
+                                     limit: int = None, after: tuple = None, tags: set = None) -> list:
+        """Get posts of the given authors, ordered by sort key and then by id.
+
+        `after` resumes after the last post of the previous page, see
+        order_by_keyset.  `tags` keeps only posts that have at least one of
+        the given tags.  When posts are sharded, the shards are read one
+        after another: Post objects belong to the request's session, which
+        only the request's thread may use.  Feeds use the rows variant,
+        which reads the shards concurrently.
+        """
+        statement = build_sorted_posts_statement(rows=False, sort_by=sort_by, direction=direction,
+                                                 paged=after is not None, tagged=bool(tags))
+        parameters: dict = sorted_posts_parameters(user_ids, limit, after, tags)
+        if not sharding.is_sharded():
+            return db.session.scalars(statement, parameters, bind_arguments=read_bind_arguments()).all()
+
+        posts_of_shards: list = []
+        for shard in sharding.shards_of_authors(user_ids=user_ids):
+            with sharding.on_shard(shard):
+                posts_of_shards.append(db.session.scalars(statement, parameters).all())
+        return sharding.merge_sorted(posts_of_shards, key=Post.get_sort_key(sort_by),
+                                     reverse=direction == "desc", limit=limit)
+
+    @staticmethod
+    def get_sorted_post_rows_by_user_ids(user_ids: set, sort_by: str, direction: str,
+                                         limit: int = None, after: tuple = None, tags: set = None) -> list:
+        """Same as get_sorted_posts_by_user_ids, but read-only rows of FEED_COLUMNS instead of Post objects.
+
+        Skips building ORM instances.  When posts are sharded, the shards
+        of the authors are read concurrently.
+        """
+        statement = build_sorted_posts_statement(rows=True, sort_by=sort_by, direction=direction,
+                                                 paged=after is not None, tagged=bool(tags))
+        parameters: dict = sorted_posts_parameters(user_ids, limit, after, tags)
+        if not sharding.is_sharded():
+            return db.session.execute(statement, parameters, bind_arguments=read_bind_arguments()).all()
+
+        rows_of_shards: list = sharding.fan_out(statement, parameters, shards=sharding.shards_of_authors(user_ids=user_ids))
+        return sharding.merge_sorted(rows_of_shards, key=Post.get_sort_key(sort_by),
+                                     reverse=direction == "desc", limit=limit)
+
+    @staticmethod
+    def stream_sorted_post_rows_by_user_ids(user_ids: set, sort_by: str, direction: str, chunk_size: int):
+        """Same as get_sorted_post_rows_by_user_ids, but yield the rows in lists of chunk_size, fetched as they are consumed."""
+        statement = build_sorted_posts_statement(rows=True, sort_by=sort_by, direction=direction,
+                                                 paged=False, tagged=False)
+        if not sharding.is_sharded():
+            yield from db.session.execute(statement.execution_options(yield_per=chunk_size),
+                                          sorted_posts_parameters(user_ids),
+                                          bind_arguments=read_bind_arguments()).partitions()
+            return
+
+        rows = heapq.merge(*[sharding.stream_rows(shard, statement, sorted_posts_parameters(user_ids), chunk_size)
+                             for shard in sharding.shards_of_authors(user_ids=user_ids)],
+                           key=Post.get_sort_key(sort_by), reverse=direction == "desc")
+        while chunk := list(islice(rows, chunk_size)):
+            yield chunk
+
+    @staticmethod
+    def get_top_post_rows(sort_by: str, limit: int) -> list:
+        """Get rows of FEED_COLUMNS of the `limit` posts of any author that sort highest."""
+        query = Post.order_by_keyset(query=db.select(*FEED_COLUMNS),
+                                     sort_column=Post.get_sort_column(sort_by),
+                                     direction="desc")
+        if not sharding.is_sharded():
+            return db.session.execute(query.limit(limit)).all()
+        return sharding.merge_sorted(sharding.fan_out(query.limit(limit), {}, shards=sharding.all_shards()),
+                                     key=Post.get_sort_key(sort_by), reverse=True, limit=limit)
+
+    @staticmethod
+    def get_popularity_of_posts(post_ids: list) -> dict:
+        return dict(db.session.execute(db.select(Post.id, Post.popularity).where(Post.id.in_(post_ids))).all())
+
+    @staticmethod
+    def get_post_rows(post_ids: list) -> list:
+        """Get rows of FEED_COLUMNS of the given posts."""
+        return db.session.execute(db.select(*FEED_COLUMNS).where(Post.id.in_(post_ids))).all()
+
+    @staticmethod
+    def search_posts(search_query: str, user_ids: set, sort_by: str, direction: str,
+                     limit: int, after: tuple = None) -> list:
+        """Get posts whose text matches a full-text query, as (post, rank) pairs.
+
+        Sorting by "rank" orders by bm25 relevance, best match first when
+        ascending.  `user_ids`, when given, keeps only posts of those authors.
+        When posts are sharded, each shard ranks its own matches, so ranks
+        from different shards compare only roughly.
+        """
+        query = (db.session.query(Post, post_fts.c.rank)
+                 .join(post_fts, post_fts.c.rowid == Post.id)
+                 .filter(post_fts.c.post_fts.op("MATCH")(search_query)))
+
+        if user_ids:
+            query = query.filter(Post.id.in_(db.select(UserPost.post_id).where(UserPost.user_id.in_(user_ids))))
+
+        sort_column = post_fts.c.rank if sort_by == "rank" else Post.get_sort_column(sort_by)
+        query = Post.order_by_keyset(query=query,
+                                     sort_column=sort_column,
+                                     direction=direction,
+                                     after=after).limit(limit)
+        if not sharding.is_sharded():
+            return query.all()
+
+        shards: list = sharding.shards_of_authors(user_ids=user_ids) if user_ids else sharding.all_shards()
+        matches_of_shards: list = []
+        for shard in shards:
+            with sharding.on_shard(shard):
+                matches_of_shards.append(query.all())
+        sort_key = Post.get_sort_key(sort_by)
+        return sharding.merge_sorted(matches_of_shards,
+                                     key=(lambda match: (match[1], match[0].id)) if sort_by == "rank" else (lambda match: sort_key(match[0])),
+                                     reverse=direction == "desc", limit=limit)
+
+    @staticmethod
+    def order_by_keyset(query, sort_column, direction: str, after: tuple = None):
+        """Order a query of posts by a sort column and then by id, resuming after a keyset.
 
+        `after` is a (sort value, post id) keyset taken from the last post of
+        the previous page; only posts that sort strictly after it are kept.
+        """
         is_descending = direction == "desc"
 
-        if sort_by == "reads":
-            query = query.order_by(desc(Post.reads) if is_descending else Post.reads)
-        elif sort_by == "likes":
-            query = query.order_by(desc(Post.likes) if is_descending else Post.likes)
-        elif sort_by == "popularity":
-            query = query.order_by(desc(Post.popularity) if is_descending else Post.popularity)
+        if after is not None:
+            last_value, last_id = after
+            if sort_column is Post.id:
+                query = query.filter(Post.id < last_id if is_descending else Post.id > last_id)
+            elif is_descending:
+                query = query.filter(or_(sort_column < last_value,
+                                         and_(sort_column == last_value, Post.id < last_id)))
+            else:
+                query = query.filter(or_(sort_column > last_value,
+                                         and_(sort_column == last_value, Post.id > last_id)))
+
+        # Post.id breaks ties so that every post has a stable position to page from.
+        if sort_column is Post.id:
+            return query.order_by(desc(Post.id) if is_descending else Post.id)
+        elif is_descending:
+            return query.order_by(desc(sort_column), desc(Post.id))
         else:
-            query = query.order_by(desc(Post.id) if is_descending else Post.id)
+            return query.order_by(sort_column, Post.id)
+
+    @staticmethod
+    def exists(post_id: int) -> bool:
+        return db.session.scalar(db.select(db.exists().where(Post.id == post_id)))
+
+    @staticmethod
+    def add_counts(counts: list[dict]) -> None:
+        """Add {"post_id", "reads", "likes"} increments in one executemany, recomputing popularity.  Does not commit.
+
+        Popularity is the share of reads that led to a like, kept within the
+        0 to 1 range that validate_popularity enforces.
+        """
+        new_reads = Post.reads + db.bindparam("read_increment")
+        new_likes = Post.likes + db.bindparam("like_increment")
+        statement = (Post.__table__.update()
+                     .where(Post.id == db.bindparam("post_id"))
+                     .values(reads=new_reads,
+                             likes=new_likes,
+                             popularity=db.case((new_reads > 0,
+                                                 db.func.round(db.func.min(1.0, new_likes * 1.0 / new_reads), 2)),
+                                                else_=0.0)))
+        db.session.execute(statement, [{"post_id": count["post_id"],
+                                        "read_increment": count["reads"],
+                                        "like_increment": count["likes"]} for count in counts])
 
-        return query.all()
-    
     @staticmethod
     def get_post_by_post_id(post_id: int):
-        return Post.query.get(post_id)
\ No newline at end of file
+        return Post.query.get(post_id)
+
+    @staticmethod
+    def get_post_with_author_ids(post_id: int):
+        """Get a post with its author_ids filled in, in one statement and without loading User objects."""
+        concatenated_author_ids = (db.select(db.func.group_concat(UserPost.user_id))
+                                   .where(UserPost.post_id == Post.id)
+                                   .scalar_subquery())
+        row = db.session.query(Post, concatenated_author_ids).filter(Post.id == post_id).one_or_none()
+        if row is None:
+            return None
+
+        post, author_ids = row
+        post.author_ids = set(int(author_id) for author_id in author_ids.split(",")) if author_ids else set()
+        return post
+
+
+# Columns of a post in the alphabetical order of the response keys.
+FEED_COLUMNS = tuple(sorted(Post.__table__.columns, key=lambda column: column.name))
+
+SORT_COLUMNS = {"id": Post.id,
+                "reads": Post.reads,
+                "likes": Post.likes,
+                "popularity": Post.popularity}
+
+
+@lru_cache(maxsize=None)
+def build_sorted_posts_statement(rows: bool, sort_by: str, direction: str, paged: bool, tagged: bool):
+    """Build, once per variant, the statement of get_sorted_posts_by_user_ids (rows=False) or its rows variant.
+
+    Every value is a bound parameter, see sorted_posts_parameters, so each
+    variant is one statement object and SQLAlchemy compiles it only once.
+    """
+    # Posts are selected through an IN subquery of user_post instead of a
+    # join that needs DISTINCT, and that would need the user table, which
+    # shards do not have.
+    user_ids = db.bindparam("user_ids", expanding=True)
+    query = db.select(*FEED_COLUMNS) if rows else db.select(Post)
+    query = query.where(Post.id.in_(db.select(UserPost.post_id).where(UserPost.user_id.in_(user_ids))))
+
+    if tagged:
+        query = query.where(Post.id.in_(PostTag.select_post_ids_by_tag_names(
+            tag_names=db.bindparam("tag_names", expanding=True))))
+
+    after: tuple = (db.bindparam("last_value"), db.bindparam("last_id")) if paged else None
+    query = Post.order_by_keyset(query=query,
+                                 sort_column=Post.get_sort_column(sort_by),
+                                 direction=direction,
+                                 after=after)
+    # SQLite reads LIMIT -1 as no limit.
+    return query.limit(db.bindparam("limit"))
+
+
+def sorted_posts_parameters(user_ids: set, limit: int = None, after: tuple = None, tags: set = None) -> dict:
+    """Parameters of a statement from build_sorted_posts_statement."""
+    parameters: dict = {"user_ids": list(user_ids), "limit": -1 if limit is None else limit}
+    if after is not None:
+        parameters["last_value"], parameters["last_id"] = after
+    if tags:
+        parameters["tag_names"] = list(tags)
+    return parameters
+
+
+@event.listens_for(db.session, "after_flush")
+def sync_post_tags(session, flush_context):
+    """Mirror tags of inserted posts, and of posts whose tags changed, into post_tag."""
+    tags_by_post_id: dict = {}
+    for post in [*session.new, *session.dirty]:
+        if isinstance(post, Post) and inspect(post).attrs._tags.history.has_changes():
+            tags_by_post_id[post.id] = post.tags
+    if tags_by_post_id:
+        PostTag.replace_tags_of_posts(connection=session.connection(bind_arguments={"mapper": PostTag.__mapper__}),
+                                      tags_by_post_id=tags_by_post_id)
+
+
+@event.listens_for(Post, "expire")
+def forget_author_ids(post, attribute_names):
+    # author_ids is not a column, so expiring on commit or rollback does not reload it.
+    if attribute_names is None:
+        post.author_ids = None
+
+
+for statement in POST_FTS_DDL:
+    event.listen(Post.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+# Dropping post drops its triggers; the index has to be dropped on its own.
+event.listen(Post.__table__, "before_drop", DDL("DROP TABLE IF EXISTS post_fts").execute_if(dialect="sqlite"))
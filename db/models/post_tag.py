@@ -0,0 +1,48 @@
+from ..shared import db
+from db.models.tag import Tag
+
+
+class PostTag(db.Model):
+    __tablename__ = "post_tag"
+    # The primary key serves post -> tags lookups; this reverse index serves
+    # the tag filter of the feed, which looks posts up by tag.
+    __table_args__ = (
+        db.Index("ix_post_tag_tag_id_post_id", "tag_id", "post_id"),
+    )
+    post_id = db.Column(db.Integer, db.ForeignKey("post.id"), primary_key=True)
+    tag_id = db.Column(db.Integer, db.ForeignKey("tag.id"), primary_key=True)
+    # position of the tag in Post.tags, so that the stored order can be rebuilt
+    position = db.Column(db.Integer, nullable=False)
+
+    @staticmethod
+    def replace_tags_of_posts(connection, tags_by_post_id: dict) -> None:
+        """Replace the post_tag rows of the given posts, creating missing tags, in a few batched statements."""
+        if not tags_by_post_id:
+            return
+
+        tag_names: set = {name for tags in tags_by_post_id.values() for name in tags if name}
+        if tag_names:
+            connection.execute(Tag.__table__.insert().prefix_with("OR IGNORE"),
+                               [{"name": name} for name in tag_names])
+            tag_ids_by_name: dict = dict(connection.execute(
+                db.select(Tag.name, Tag.id).where(Tag.name.in_(tag_names))).all())
+
+        connection.execute(PostTag.__table__.delete().where(PostTag.post_id.in_(tags_by_post_id)))
+
+        post_tags: list = []
+        for post_id, tags in tags_by_post_id.items():
+            seen_tag_ids: set = set()
+            for position, name in enumerate(tags):
+                if not name or tag_ids_by_name[name] in seen_tag_ids:
+                    continue
+                seen_tag_ids.add(tag_ids_by_name[name])
+                post_tags.append({"post_id": post_id, "tag_id": tag_ids_by_name[name], "position": position})
+        if post_tags:
+            connection.execute(PostTag.__table__.insert(), post_tags)
+
+    @staticmethod
+    def select_post_ids_by_tag_names(tag_names: set):
+        """Build a subquery of ids of posts that have at least one of the tags."""
+        return (db.select(PostTag.post_id)
+                .join(Tag, Tag.id == PostTag.tag_id)
+                .where(Tag.name.in_(tag_names)))
@@ -1,9 +1,16 @@
+import os
 from sqlalchemy.orm import validates
-from sqlalchemy import event
+from sqlalchemy import event, inspect
 from ..shared import db
 
 import bcrypt
 
+from hashing_pool import password_pool
+
+# bcrypt cost factor for new hashes.  Stored hashes made with another cost
+# are rehashed the next time their user logs in.
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+
 
 class User(db.Model):
     __tablename__ = "user"
@@ -20,15 +27,23 @@ class User(db.Model):
         return password
 
     def correct_password(self, password):
-        return bcrypt.checkpw(password.encode("utf-8"), self.password.encode("utf-8"))
+        return password_pool.run(bcrypt.checkpw, password.encode("utf-8"), self.password.encode("utf-8"))
+
+    def password_needs_rehash(self) -> bool:
+        return get_cost_factor(self.password) != BCRYPT_ROUNDS
 
 
 def create_salt():
-    return bcrypt.gensalt()
+    return bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
+
+
+def get_cost_factor(password_hash):
+    # bcrypt hashes look like $2b$<cost>$<salt and hash>
+    return int(password_hash.split("$")[2])
 
 
 def create_password(password, salt):
-    return bcrypt.hashpw(password.encode("utf-8"), salt)
+    return password_pool.run(bcrypt.hashpw, password.encode("utf-8"), salt)
 
 
 @event.listens_for(User, "before_insert")
@@ -40,6 +55,10 @@ def set_salt_and_password(mapper, connect, user):
 
 @event.listens_for(User, "before_update")
 def update_salt_and_password(mapper, connect, user):
+    # Only a newly assigned plain text password needs hashing; updates of
+    # other columns keep the stored hash as it is.
+    if not inspect(user).attrs.password.history.has_changes():
+        return
     _salt = create_salt()
     user.salt = _salt.decode("ascii")
     user.password = create_password(user.password, _salt).decode("ascii")
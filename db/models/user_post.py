@@ -3,5 +3,16 @@ from ..shared import db
 
 class UserPost(db.Model):
     __tablename__ = "user_post"
+    # The primary key serves author -> posts lookups in the feed; this reverse
+    # index serves post -> authors lookups such as Post.users.
+    __table_args__ = (
+        db.Index("ix_user_post_post_id_user_id", "post_id", "user_id"),
+    )
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
     post_id = db.Column(db.Integer, db.ForeignKey("post.id"), primary_key=True)
+
+    @staticmethod
+    def is_author(user_id: int, post_id: int) -> bool:
+        """Check whether a user is an author of a post with an EXISTS on the primary key."""
+        return db.session.query(db.exists().where(UserPost.user_id == user_id)
+                                           .where(UserPost.post_id == post_id)).scalar()
@@ -0,0 +1,75 @@
+"""
+Route read-only queries to read replicas.
+
+Replicas are Flask-SQLAlchemy binds named in READ_REPLICA_BINDS, set up
+from the comma separated READ_REPLICA_URIS.  Append `?read_only=1` to a
+SQLite replica URI (a WAL snapshot or copy of the primary) to open it
+with query_only.  Read helpers pass read_bind_arguments() to their
+session call; it picks a replica only when a stale read is safe:
+
+- only in GET/HEAD requests, since any other request may write based on
+  what it reads,
+- not after the request itself wrote (read-your-writes), and
+- not for REPLICA_STICKY_SECONDS after a request of the same user wrote,
+  so that a client sees its own changes once the replica lags behind.
+
+One replica is picked per request, so reads that must agree (a feed and
+the author versions of its ETag) come from the same snapshot.
+
+The async feed view (api.async_posts) reads the primary only, so when
+replicas are set up GET /api/posts keeps the sync view even with
+ASYNC_FEED on, and its reads keep going to the replicas.
+"""
+import os
+import random
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from caching import TTLCache
+from db.shared import db
+
+READ_METHODS = {"GET", "HEAD"}
+
+# ids of users who wrote recently -> True, process-local
+sticky_users = TTLCache(max_size=int(os.environ.get("REPLICA_STICKY_MAX_USERS", 10000)),
+                        ttl_seconds=float(os.environ.get("REPLICA_STICKY_SECONDS", 5)))
+
+
+def read_bind_arguments() -> dict:
+    """Bind arguments for a read-only query: a replica engine when a stale read is safe, else {} for the primary."""
+    if not has_request_context() or g.get("wrote_to_primary"):
+        return {}
+    if "read_bind_arguments" not in g:
+        g.read_bind_arguments = {}
+        replica_bind_keys: list = current_app.config.get("READ_REPLICA_BINDS", [])
+        user = g.get("user")
+        if (replica_bind_keys and request.method in READ_METHODS
+                and (user is None or sticky_users.get(user.id) is None)):
+            g.read_bind_arguments = {"bind": db.get_engine(bind=random.choice(replica_bind_keys))}
+    return g.read_bind_arguments
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def note_write(connection, cursor, statement, parameters, context, executemany):
+    if context is not None and (context.isinsert or context.isupdate or context.isdelete) and has_request_context():
+        g.wrote_to_primary = True
+
+
+def configure(app):
+    """Add a bind per READ_REPLICA_URIS entry and keep users on the primary for a while after they write."""
+    replica_uris: list = [uri for uri in os.environ.get("READ_REPLICA_URIS", "").split(",") if uri]
+    if replica_uris:
+        binds: dict = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+        for index, replica_uri in enumerate(replica_uris):
+            binds[f"replica_{index}"] = replica_uri
+        app.config["SQLALCHEMY_BINDS"] = binds
+        app.config.setdefault("READ_REPLICA_BINDS", [f"replica_{index}" for index in range(len(replica_uris))])
+
+    @app.after_request
+    def stick_to_primary_after_write(response):
+        user = g.get("user")
+        if g.get("wrote_to_primary") and user is not None:
+            sticky_users.set(user.id, True)
+        return response
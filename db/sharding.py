@@ -0,0 +1,222 @@
+"""
+Spread posts over several SQLite files, "shards", by author.
+
+Sharded mode is on when SHARD_URIS lists the database URIs of the shards,
+comma separated; the main database keeps the users.  The number of shards
+must not change once posts are written to them.
+
+- A post lives on one shard together with its user_post, post_tag and
+  full-text rows: the home shard of the user who created it, user id
+  modulo the number of shards.  Rows about an author (author_stats,
+  author_version, author_shard) live on the author's home shard.
+- Post ids stay unique across shards: of N shards, shard i hands out the
+  ids i + 1, i + 1 + N, i + 1 + 2N and so on, so a post id tells its shard.
+- A feed reads the home shards of its authors, plus the shards that
+  author_shard lists for them, concurrently, and merges the sorted rows.
+
+Session statements on sharded tables go to the shard picked with
+on_shard; without one they raise instead of reading the main database.
+Writes pick theirs with on_shard(shard, writing=True), which first
+commits what the session wrote to any other shard.  So a session holds
+the SQLite write lock of one shard at a time.  If it kept the lock of
+one shard while it waited for another, two writers taking shards in
+opposite orders would wait on each other until the busy timeout.  That
+happens, for example, when a counter flush and a post with a co-author
+of another home shard run at the same time.  Sorting shards would not
+prevent it, since a request writes its post's shard before the home
+shards of the authors.  A write that spans shards is therefore a series
+of commits, one per shard, and is not atomic across them:
+
+- author_shard rows are committed before the post they point to and are
+  never deleted, so a feed never misses a post of its authors; at worst
+  it reads a shard that holds none of them.
+- A write failing part way leaves the earlier shards committed: author
+  totals can be off, which `flask verify-author-stats --rebuild`
+  repairs, and feed versions of authors on other shards unbumped until
+  their next change.
+- A counter flush failing part way puts all of its increments back into
+  the buffer, so those already committed to earlier shards count twice.
+- Pending ORM changes are flushed by the commit that leaves a shard,
+  on that shard, so flush changes to the objects of a shard before
+  writing another one.
+"""
+import contextvars
+import heapq
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from itertools import islice
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert
+
+from db.shared import db, current_shard
+from db.models.author_shard import AuthorShard
+
+
+def is_sharded() -> bool:
+    return bool(current_app.config.get("SHARD_BINDS"))
+
+
+def shard_count() -> int:
+    return len(current_app.config.get("SHARD_BINDS") or ())
+
+
+def shard_of_author(user_id: int) -> int:
+    """The home shard of a user: where posts they create, and rows about them, live."""
+    return user_id % shard_count()
+
+
+def shard_of_post(post_id: int) -> int:
+    return (post_id - 1) % shard_count()
+
+
+def all_shards() -> list:
+    """Every shard, or [None] for the main database when posts are not sharded."""
+    return list(range(shard_count())) or [None]
+
+
+def group_by_shard(ids, shard_of) -> dict:
+    """Group ids by the shard they live on, using shard_of_author or shard_of_post.  Without shards, all go under None."""
+    if not is_sharded():
+        return {None: list(ids)}
+    ids_by_shard: dict = {}
+    for key in ids:
+        ids_by_shard.setdefault(shard_of(key), []).append(key)
+    return ids_by_shard
+
+
+@contextmanager
+def on_shard(shard: int, writing: bool = False):
+    """Send session statements on sharded tables to a shard.  None leaves them on the main database.
+
+    With writing, first commit what the session wrote to another shard.
+    """
+    if writing and is_sharded():
+        commit_written_shard(next_shard=shard)
+        db.session.info["written_shard"] = shard
+    token = current_shard.set(shard)
+    try:
+        yield
+    finally:
+        current_shard.reset(token)
+
+
+def on_shard_of_author(user_id: int, writing: bool = False):
+    return on_shard(shard_of_author(user_id), writing=writing) if is_sharded() else nullcontext()
+
+
+def on_shard_of_post(post_id: int, writing: bool = False):
+    return on_shard(shard_of_post(post_id), writing=writing) if is_sharded() else nullcontext()
+
+
+def commit_written_shard(next_shard: int = None):
+    """Commit what the session wrote to a shard other than next_shard, releasing that shard's write lock."""
+    written_shard = db.session.info.get("written_shard")
+    if written_shard is None or written_shard == next_shard:
+        return
+    session = db.session()
+    with on_shard(written_shard):
+        # The operation goes on after this commit, and the objects in
+        # memory still match what was written, so keep them loaded.
+        expire_on_commit, session.expire_on_commit = session.expire_on_commit, False
+        try:
+            session.commit()
+        finally:
+            session.expire_on_commit = expire_on_commit
+
+
+@event.listens_for(db.session, "after_transaction_end")
+def forget_written_shard(session, transaction):
+    if transaction.parent is None:
+        session.info.pop("written_shard", None)
+
+
+def get_engine(shard: int):
+    return db.get_engine(bind=current_app.config["SHARD_BINDS"][shard])
+
+
+def note_author_shards(user_ids: set, shard: int):
+    """Record in author_shard that posts of the users live on a shard, for those whose home shard it is not.
+
+    Commits right away on connections of its own, before the caller writes
+    the posts, after committing what the session already wrote.
+    """
+    if not is_sharded():
+        return
+    commit_written_shard()
+    away_user_ids: list = [user_id for user_id in user_ids if shard_of_author(user_id) != shard]
+    for home_shard, home_user_ids in group_by_shard(away_user_ids, shard_of_author).items():
+        with get_engine(home_shard).begin() as connection:
+            connection.execute(insert(AuthorShard.__table__).on_conflict_do_nothing(),
+                               [{"user_id": user_id, "shard": shard} for user_id in home_user_ids])
+
+
+def shards_of_authors(user_ids: set) -> list:
+    """List the shards holding posts of any of the users: their home shards and those author_shard adds."""
+    shards: set = set()
+    for home_shard, home_user_ids in group_by_shard(user_ids, shard_of_author).items():
+        shards.add(home_shard)
+        with on_shard(home_shard):
+            shards.update(db.session.scalars(db.select(AuthorShard.shard)
+                                             .where(AuthorShard.user_id.in_(home_user_ids))))
+    return sorted(shards)
+
+
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    app = current_app._get_current_object()
+    if "shard_executor" not in app.extensions:
+        with _executor_lock:
+            if "shard_executor" not in app.extensions:
+                app.extensions["shard_executor"] = ThreadPoolExecutor(max_workers=app.config["SHARD_FAN_OUT_WORKERS"],
+                                                                      thread_name_prefix="shard-fan-out")
+    return app.extensions["shard_executor"]
+
+
+def read_rows(engine, statement, parameters: dict) -> list:
+    with engine.connect() as connection:
+        return connection.execute(statement, parameters).all()
+
+
+def fan_out(statement, parameters: dict, shards: list) -> list[list]:
+    """Run a read-only statement on the shards concurrently, each on a connection of its own.  Return the rows of each shard.
+
+    Each read runs in a copy of the caller's context, so the query
+    recorders of the request (see instrumentation) count it.
+    """
+    engines: list = [get_engine(shard) for shard in shards]
+    if len(engines) == 1:
+        return [read_rows(engines[0], statement, parameters)]
+    context = contextvars.copy_context()
+    # A context can only be entered by one thread at a time, so each read gets a copy.
+    return list(get_executor().map(lambda engine: context.copy().run(read_rows, engine, statement, parameters), engines))
+
+
+def stream_rows(shard: int, statement, parameters: dict, chunk_size: int):
+    """Yield the rows of a statement on a shard, fetched chunk_size at a time on a connection of its own."""
+    with get_engine(shard).connect() as connection:
+        yield from connection.execution_options(yield_per=chunk_size).execute(statement, parameters)
+
+
+def merge_sorted(results: list, key, reverse: bool = False, limit: int = None) -> list:
+    """Merge results that are each sorted by key, such as rows of every shard, into the first `limit` of one sorted list."""
+    if len(results) == 1:
+        return results[0][:limit]
+    return list(islice(heapq.merge(*results, key=key, reverse=reverse), limit))
+
+
+def configure(app):
+    """Add a bind per SHARD_URIS entry, which turns sharded mode on."""
+    shard_uris: list = [uri for uri in os.environ.get("SHARD_URIS", "").split(",") if uri]
+    if shard_uris:
+        binds: dict = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+        for index, shard_uri in enumerate(shard_uris):
+            binds[f"shard_{index}"] = shard_uri
+        app.config["SQLALCHEMY_BINDS"] = binds
+        app.config.setdefault("SHARD_BINDS", [f"shard_{index}" for index in range(len(shard_uris))])
+    app.config.setdefault("SHARD_FAN_OUT_WORKERS", int(os.environ.get("SHARD_FAN_OUT_WORKERS", 8)))
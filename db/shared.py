@@ -1,3 +1,62 @@
-from flask_sqlalchemy import SQLAlchemy
+from contextvars import ContextVar
+
+import flask_sqlalchemy
+from sqlalchemy import event, orm
+from sqlalchemy.sql.util import find_tables
+
+from .sqlite_profile import apply_pragmas
+
+# Tables whose rows are spread over the shards of SHARD_BINDS, and the shard
+# the session reads and writes them on right now (see db.sharding).
+SHARDED_TABLES = frozenset({"post", "user_post", "post_tag", "tag", "post_fts",
+                            "author_stats", "author_version", "author_shard"})
+current_shard: ContextVar = ContextVar("current_shard", default=None)
+
+
+def uses_sharded_tables(mapper, clause) -> bool:
+    if mapper is not None:
+        return mapper.persist_selectable.name in SHARDED_TABLES
+    if clause is not None:
+        return any(getattr(table, "name", None) in SHARDED_TABLES for table in find_tables(clause, include_crud=True))
+    return False
+
+
+class SignallingSession(flask_sqlalchemy.SignallingSession):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        """Also send sharded tables to the current shard (see db.sharding), and accept an explicit bind, as passed in bind_arguments by the read helpers (see db.routing)."""
+        shard_bind_keys: list = self.app.config.get("SHARD_BINDS")
+        if shard_bind_keys and uses_sharded_tables(mapper, clause):
+            shard: int = current_shard.get()
+            if shard is None:
+                raise RuntimeError("Posts are sharded: pick the shard to use with db.sharding.on_shard first.")
+            return flask_sqlalchemy.get_state(self.app).db.get_engine(self.app, bind=shard_bind_keys[shard])
+        if bind is not None:
+            return bind
+        return super().get_bind(mapper=mapper, clause=clause)
+
+
+class SQLAlchemy(flask_sqlalchemy.SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=SignallingSession, db=self, **options)
+
+    def create_engine(self, sa_url, engine_opts):
+        """Also accept a `sqlite_pragmas` engine option, applied to every new connection (see db.sqlite_profile).
+
+        A `read_only=1` query parameter on a SQLite URL opens the database
+        with query_only, for read replicas (see db.routing).
+        """
+        pragmas: dict = engine_opts.pop("sqlite_pragmas", None)
+        if sa_url.query.get("read_only") == "1":
+            sa_url = sa_url.difference_update_query(["read_only"])
+            # Leave the journal of the replica as it is; it is not ours to change.
+            pragmas = {**{pragma: value for pragma, value in (pragmas or {}).items()
+                          if pragma not in ("journal_mode", "synchronous")},
+                       "query_only": "ON"}
+        engine = super().create_engine(sa_url, engine_opts)
+        if pragmas:
+            event.listen(engine, "connect",
+                         lambda dbapi_connection, connection_record: apply_pragmas(dbapi_connection, pragmas))
+        return engine
+
 
 db = SQLAlchemy()
@@ -0,0 +1,84 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PoolSaturated(Exception):
+    """Raised instead of queueing when every worker is busy and the queue is full."""
+
+
+class BoundedWorkerPool:
+    """Thread pool with a bounded queue, for CPU heavy work such as bcrypt.
+
+    Callers block until their task is done, but at most max_workers tasks
+    run at once and at most max_queue_depth wait, so bursts of the work
+    cannot take every request thread or CPU from the rest of the app.
+    """
+
+    def __init__(self, max_workers: int, max_queue_depth: int, name: str):
+        self.max_workers = max_workers
+        self.max_queue_depth = max_queue_depth
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue_depth)
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.total_queue_wait_seconds = 0.0
+        self.max_queue_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+        self.max_run_seconds = 0.0
+
+    def run(self, func, *args):
+        """Run func(*args) on the pool and return its result.  Raise PoolSaturated if the pool is full."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PoolSaturated(f"All {self.max_workers} workers are busy and {self.max_queue_depth} tasks are queued")
+
+        submitted_at = time.perf_counter()
+        with self._lock:
+            self.in_flight += 1
+
+        def timed_task():
+            started_at = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                self._record(queue_wait_seconds=started_at - submitted_at,
+                             run_seconds=time.perf_counter() - started_at)
+
+        try:
+            return self._executor.submit(timed_task).result()
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+
+    def _record(self, queue_wait_seconds: float, run_seconds: float):
+        with self._lock:
+            self.completed += 1
+            self.total_queue_wait_seconds += queue_wait_seconds
+            self.max_queue_wait_seconds = max(self.max_queue_wait_seconds, queue_wait_seconds)
+            self.total_run_seconds += run_seconds
+            self.max_run_seconds = max(self.max_run_seconds, run_seconds)
+
+    def stats(self) -> dict:
+        """Report pool size, load and queue-wait/run times."""
+        with self._lock:
+            return {"maxWorkers": self.max_workers,
+                    "maxQueueDepth": self.max_queue_depth,
+                    "inFlight": self.in_flight,
+                    "completed": self.completed,
+                    "rejected": self.rejected,
+                    "averageQueueWaitSeconds": self.total_queue_wait_seconds / self.completed if self.completed else None,
+                    "maxQueueWaitSeconds": self.max_queue_wait_seconds,
+                    "averageRunSeconds": self.total_run_seconds / self.completed if self.completed else None,
+                    "maxRunSeconds": self.max_run_seconds}
+
+
+# bcrypt hashing and verification for db.models.user
+password_pool = BoundedWorkerPool(max_workers=int(os.environ.get("PASSWORD_POOL_WORKERS", os.cpu_count() or 1)),
+                                  max_queue_depth=int(os.environ.get("PASSWORD_POOL_QUEUE_DEPTH", 32)),
+                                  name="password")
@@ -0,0 +1,174 @@
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.default import CACHE_HIT, CACHE_MISS
+
+logger = logging.getLogger("instrumentation")
+
+# Recorders collecting the statements run by the current request or test.
+_active_recorders: ContextVar = ContextVar("active_recorders", default=())
+
+_IN_LIST = re.compile(r"\((?:\?|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|:\w+))*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """Reduce a statement to its shape, so that IN lists of any length count as the same statement."""
+    return _WHITESPACE.sub(" ", _IN_LIST.sub("(?)", statement)).strip()
+
+
+class QueryRecorder:
+    """Counts the SQL statements run while it is active, with their time, fingerprints and statement cache use."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.seconds = 0.0
+        self.fingerprints = Counter()
+        self.cache_hits = Counter()
+
+    def record(self, statement: str, seconds: float, cache_hit=None):
+        # Shard reads of one request record from several threads (see db.sharding.fan_out).
+        with self._lock:
+            self.count += 1
+            self.seconds += seconds
+            self.fingerprints[fingerprint(statement)] += 1
+            self.cache_hits[cache_hit] += 1
+
+    def repeated_statements(self) -> dict:
+        """Statements run more than once: the usual sign of a query per row (N+1)."""
+        return {statement: count for statement, count in self.fingerprints.items() if count > 1}
+
+
+@contextmanager
+def record_queries():
+    """Record every statement run in this context, on any engine."""
+    recorder = QueryRecorder()
+    token = _active_recorders.set((*_active_recorders.get(), recorder))
+    try:
+        yield recorder
+    finally:
+        _active_recorders.reset(token)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def start_timing(connection, cursor, statement, parameters, context, executemany):
+    if _active_recorders.get():
+        connection.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def stop_timing(connection, cursor, statement, parameters, context, executemany):
+    recorders = _active_recorders.get()
+    if recorders and connection.info.get("query_started_at"):
+        seconds = time.perf_counter() - connection.info["query_started_at"].pop()
+        for recorder in recorders:
+            recorder.record(statement, seconds, cache_hit=getattr(context, "cache_hit", None))
+
+
+class StatementCacheStatistics:
+    """Counts how often SQLAlchemy found an executed statement already compiled, across recorded requests."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.uncached = 0
+
+    def add(self, recorder: QueryRecorder):
+        with self._lock:
+            for cache_hit, count in recorder.cache_hits.items():
+                if cache_hit is CACHE_HIT:
+                    self.hits += count
+                elif cache_hit is CACHE_MISS:
+                    self.misses += count
+                else:
+                    self.uncached += count
+
+    def stats(self) -> dict:
+        with self._lock:
+            cached: int = self.hits + self.misses
+            return {"hits": self.hits,
+                    "misses": self.misses,
+                    "uncached": self.uncached,
+                    "hitRate": self.hits / cached if cached else None}
+
+
+statement_cache_statistics = StatementCacheStatistics()
+
+
+class RouteStatistics:
+    """Per-route totals of requests, queries and SQL time, across requests."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def add(self, route: str, recorder: QueryRecorder):
+        with self._lock:
+            route_statistics = self._routes.setdefault(route, {"requests": 0, "queries": 0, "sqlSeconds": 0.0,
+                                                               "maxQueries": 0, "requestsWithRepeats": 0})
+            route_statistics["requests"] += 1
+            route_statistics["queries"] += recorder.count
+            route_statistics["sqlSeconds"] += recorder.seconds
+            route_statistics["maxQueries"] = max(route_statistics["maxQueries"], recorder.count)
+            route_statistics["requestsWithRepeats"] += bool(recorder.repeated_statements())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {route: {**route_statistics,
+                            "averageQueries": route_statistics["queries"] / route_statistics["requests"]}
+                    for route, route_statistics in self._routes.items()}
+
+
+route_statistics = RouteStatistics()
+
+
+def init_app(app):
+    """Record SQL per request while SQL_INSTRUMENTATION is enabled: Server-Timing header, log line, route and statement cache totals."""
+    if not logger.handlers:
+        logger.addHandler(logging.StreamHandler())
+        logger.setLevel(logging.INFO)
+
+    @app.before_request
+    def start_recording():
+        if not app.config.get("SQL_INSTRUMENTATION"):
+            return
+        g.query_recording = record_queries()
+        g.query_recorder = g.query_recording.__enter__()
+        g.request_started_at = time.perf_counter()
+
+    @app.after_request
+    def report_recording(response):
+        recorder = g.get("query_recorder")
+        if recorder is None:
+            return response
+        request_seconds = time.perf_counter() - g.request_started_at
+        route = f"{request.method} {request.url_rule.rule if request.url_rule else request.path}"
+        route_statistics.add(route, recorder)
+        statement_cache_statistics.add(recorder)
+
+        response.headers.add("Server-Timing", f'db;dur={recorder.seconds * 1000:.2f};desc="{recorder.count} queries"')
+        response.headers.add("Server-Timing", f"app;dur={request_seconds * 1000:.2f}")
+        logger.info(json.dumps({"route": route,
+                                "status": response.status_code,
+                                "queries": recorder.count,
+                                "sqlMs": round(recorder.seconds * 1000, 3),
+                                "requestMs": round(request_seconds * 1000, 3),
+                                "repeatedStatements": recorder.repeated_statements()}))
+        return response
+
+    @app.teardown_request
+    def stop_recording(exception):
+        recording = g.pop("query_recording", None)
+        if recording is not None:
+            recording.__exit__(None, None, None)
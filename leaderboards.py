@@ -0,0 +1,129 @@
+import bisect
+import os
+import threading
+import time
+
+
+class Leaderboard:
+    """Thread-safe, process-local list of the top posts by one sort key, best first, kept current as posts change.
+
+    Holds the `size` posts with the highest (sort value, id), so any top
+    `limit <= size` is a slice.  When a change cannot be applied exactly,
+    such as a listed post falling below the last one (the post that should
+    take its place is unknown), the board is reloaded on its next read.
+    It is also reloaded after max_age_seconds, to pick up writes of other
+    processes.
+    """
+
+    def __init__(self, sort_by: str, size: int, max_age_seconds: float):
+        self.sort_by = sort_by
+        self.size = size
+        self.max_age_seconds = max_age_seconds
+        self._posts: list = []
+        self._keys: list = []  # (-sort value, -id) of each post, ascending
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self.reloads = 0
+        self.offered_posts = 0
+
+    def _key(self, post: dict) -> tuple:
+        return -post[self.sort_by], -post["id"]
+
+    def top(self, limit: int, load) -> list[dict]:
+        """Return the best `limit` posts, reloading them with load(sort_by, size) first if needed."""
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > self.max_age_seconds:
+                self._posts = load(self.sort_by, self.size)
+                self._keys = [self._key(post) for post in self._posts]
+                self._loaded_at = time.monotonic()
+                self.reloads += 1
+            return self._posts[:limit]
+
+    def offer(self, posts: list[dict]):
+        """Apply new values of posts: list, move or drop them as their sort values now rank them."""
+        with self._lock:
+            self.offered_posts += len(posts)
+            if self._loaded_at is None:
+                return
+            for post in posts:
+                was_full: bool = len(self._posts) == self.size
+                position = next((index for index, listed in enumerate(self._posts) if listed["id"] == post["id"]), None)
+                if position is not None:
+                    del self._posts[position]
+                    del self._keys[position]
+
+                key: tuple = self._key(post)
+                if not was_full or not self._keys or key < self._keys[-1]:
+                    position = bisect.bisect(self._keys, key)
+                    self._keys.insert(position, key)
+                    self._posts.insert(position, post)
+                    if len(self._posts) > self.size:
+                        self._posts.pop()
+                        self._keys.pop()
+                elif position is not None:
+                    # A listed post fell below the last one; which post follows it is unknown.
+                    self._loaded_at = None
+                    return
+
+    def forget(self, post_ids: set):
+        """Reload on the next read if any of the posts is listed, e.g. because its text or tags changed."""
+        with self._lock:
+            if any(post["id"] in post_ids for post in self._posts):
+                self._loaded_at = None
+
+    def make_room(self, value=0):
+        """Reload on the next read if new posts, whose sort value is `value`, belong on the board.
+
+        They do when the board is not full, and when its last post does not
+        rank above them: ties are ordered by id descending, so a new post
+        ranks above every listed post of the same value.
+        """
+        with self._lock:
+            if len(self._posts) < self.size or self._posts[-1][self.sort_by] <= value:
+                self._loaded_at = None
+
+    def invalidate(self):
+        """Reload on the next read."""
+        with self._lock:
+            self._loaded_at = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": self.size,
+                    "listed": len(self._posts),
+                    "reloads": self.reloads,
+                    "offeredPosts": self.offered_posts}
+
+
+LEADERBOARD_SIZE = int(os.environ.get("LEADERBOARD_SIZE", 100))
+
+# top posts by each sort key for api.posts
+leaderboards: dict = {sort_by: Leaderboard(sort_by=sort_by,
+                                           size=LEADERBOARD_SIZE,
+                                           max_age_seconds=float(os.environ.get("LEADERBOARD_MAX_AGE_SECONDS", 60)))
+                      for sort_by in ("popularity", "likes", "reads")}
+
+
+def offer_posts(posts: list[dict]):
+    for leaderboard in leaderboards.values():
+        leaderboard.offer(posts)
+
+
+def forget_posts(post_ids: set):
+    for leaderboard in leaderboards.values():
+        leaderboard.forget(post_ids)
+
+
+def make_room_for_new_posts():
+    for leaderboard in leaderboards.values():
+        leaderboard.make_room()
+
+
+def clear():
+    """Reload every board on its next read, e.g. after the database was replaced."""
+    for leaderboard in leaderboards.values():
+        leaderboard.invalidate()
+
+
+def stats() -> dict:
+    return {sort_by: leaderboard.stats() for sort_by, leaderboard in leaderboards.items()}
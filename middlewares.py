@@ -1,10 +1,59 @@
 import os
+import time
+from collections import namedtuple
 from functools import wraps
 from flask import request, jsonify, g
 import jwt
+from sqlalchemy import event
 from sqlalchemy.exc import NoResultFound
 
+from caching import auth_cache
+from db import async_database
 from db.models.user import User
+from repository_layer import async_database_operations
+
+# Lightweight stand-in for the User row, safe to share between requests.
+AuthenticatedUser = namedtuple("AuthenticatedUser", ["id", "username"])
+
+
+def load_authenticated_user(token: str, secret: str):
+    """Return the principal for a token, from the cache when the token was verified before."""
+    principal = auth_cache.get(token)
+    if principal is not None:
+        return principal
+
+    payload = jwt.decode(token, secret, algorithms=["HS256"])
+    user_id = payload["id"]
+    if not user_id:
+        return None
+
+    user = User.query.filter(User.id == user_id).one()
+    return remember_principal(token=token, payload=payload, user=user)
+
+
+async def load_authenticated_user_async(token: str, secret: str, connection):
+    """Same as load_authenticated_user, awaiting the user lookup on an async connection."""
+    principal = auth_cache.get(token)
+    if principal is not None:
+        return principal
+
+    payload = jwt.decode(token, secret, algorithms=["HS256"])
+    user_id = payload["id"]
+    if not user_id:
+        return None
+
+    user = await async_database_operations.get_user_by_id(connection=connection, user_id=user_id)
+    return remember_principal(token=token, payload=payload, user=user)
+
+
+def remember_principal(token: str, payload: dict, user):
+    """Cache the principal of a verified token."""
+    principal = AuthenticatedUser(id=user.id, username=user.username)
+
+    # Never keep a token in the cache past its own expiry.
+    ttl_seconds = payload["exp"] - time.time() if "exp" in payload else None
+    auth_cache.set(token, principal, ttl_seconds=ttl_seconds)
+    return principal
 
 
 def auth_required(func):
@@ -14,10 +63,9 @@ def auth_required(func):
         secret = os.environ.get("SESSION_SECRET")
         if token:
             try:
-                payload = jwt.decode(token, secret, algorithms=["HS256"])
-                user_id = payload["id"]
-                if user_id:
-                    g.user = User.query.filter(User.id == user_id).one()
+                principal = load_authenticated_user(token=token, secret=secret)
+                if principal:
+                    g.user = principal
                     return func(*args, **kwargs)
 
             except NoResultFound:
@@ -27,3 +75,33 @@ def auth_required(func):
         return func(*args, **kwargs)
 
     return wrapper
+
+
+def auth_required_async(func):
+    """
+    auth_required for async views, looking users up without blocking the event loop.  The user is looked up on
+    the connection the view gets as its `connection` argument, so a request opens a single connection.
+    """
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        token = request.headers.get("x-access-token", None)
+        secret = os.environ.get("SESSION_SECRET")
+        async with async_database.connect() as connection:
+            if token:
+                try:
+                    principal = await load_authenticated_user_async(token=token, secret=secret, connection=connection)
+                    if principal:
+                        g.user = principal
+                except NoResultFound:
+                    return jsonify({"error": "No user found with provided token"}), 403
+                except Exception as e:
+                    pass
+            return await func(*args, connection=connection, **kwargs)
+
+    return wrapper
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def invalidate_cached_user(mapper, connect, user):
+    auth_cache.delete_where(lambda principal: principal.id == user.id)
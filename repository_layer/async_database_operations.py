@@ -0,0 +1,51 @@
+"""
+Awaitable counterparts of the database_operations that async views need,
+on an AsyncConnection from db.async_database.  They read the main
+database only.
+"""
+from db.shared import db
+from db.models.user import User
+from db.models.user_post import UserPost
+from db.models.author_version import AuthorVersion
+from db.models.post import build_sorted_posts_statement, sorted_posts_parameters
+
+
+async def get_user_by_id(connection, user_id: int):
+    """Get the id and username of a user.  Raises NoResultFound if there is none."""
+    result = await connection.execute(db.select(User.id, User.username).where(User.id == user_id))
+    return result.one()
+
+
+async def filter_existing_user_ids(connection, user_ids: set) -> set[int]:
+    """Filter user ids down to the ones that exist, in one query."""
+    result = await connection.execute(db.select(User.id).where(User.id.in_(user_ids)))
+    return set(result.scalars())
+
+
+async def get_author_versions(connection, user_ids: set) -> dict:
+    """Get the feed version of each of the given authors; authors never bumped are at version 0."""
+    versions: dict = dict.fromkeys(user_ids, 0)
+    result = await connection.execute(db.select(AuthorVersion.user_id, AuthorVersion.version)
+                                      .where(AuthorVersion.user_id.in_(user_ids)))
+    versions.update(result.all())
+    return versions
+
+
+async def get_sorted_post_rows_by_user_ids(connection, user_ids: set, sort_by: str, direction: str,
+                                           limit: int = None, after: tuple = None, tags: set = None) -> list:
+    """Same as Post.get_sorted_post_rows_by_user_ids, with the same cached statement."""
+    statement = build_sorted_posts_statement(rows=True, sort_by=sort_by, direction=direction,
+                                             paged=after is not None, tagged=bool(tags))
+    result = await connection.execute(statement, sorted_posts_parameters(user_ids, limit, after, tags))
+    return result.all()
+
+
+async def get_author_ids_of_posts(connection, post_ids: list) -> dict:
+    """Get ids of the authors of each of the posts, in one query."""
+    author_ids_by_post_id: dict = {post_id: [] for post_id in post_ids}
+    result = await connection.execute(db.select(UserPost.post_id, UserPost.user_id)
+                                      .where(UserPost.post_id.in_(post_ids))
+                                      .order_by(UserPost.post_id, UserPost.user_id))
+    for post_id, user_id in result:
+        author_ids_by_post_id[post_id].append(user_id)
+    return author_ids_by_post_id
@@ -1,44 +1,129 @@
 from db.shared import db
+from db import sharding
 from db.models.user import User
 from db.models.user_post import UserPost
+from db.models.post import Post
+from db.models.post_tag import PostTag
+from db.models.author_version import AuthorVersion
+from db.models.author_stats import AuthorStats
+from db.routing import read_bind_arguments
+from caching import feed_cache
 
 from api.util.constants import MESSAGE_TYPE_AND_STATUS_CODE
 
 
 def get_user_by_id(user_id: int):
     """Get user by user id."""
-    return User.query.get(user_id)
+    return db.session.execute(db.select(User).where(User.id == user_id),
+                              bind_arguments=read_bind_arguments()).scalar()
 
 
 def filter_users_by_id(user_ids: set):
     """Filter users by user id."""
-    return User.query.filter(User.id.in_(user_ids)).all()
-
-
-def delete_user_post_by_post_id(post_id: int):
-    """Delete user post by post id."""
-    UserPost.query.filter_by(post_id=post_id).delete()
-    db.session.commit()
-
-
-def create_user_post(user_id: int, post_id: int):
-    """Create an instance of a UserPost object."""
-    user_post = UserPost(user_id=user_id, post_id=post_id)
-    return user_post
+    return db.session.scalars(db.select(User).where(User.id.in_(user_ids)),
+                              bind_arguments=read_bind_arguments()).all()
+
+
+def filter_existing_user_ids(user_ids: set) -> set[int]:
+    """Filter user ids down to the ones that exist, in one query and without loading users."""
+    return set(db.session.scalars(db.select(User.id).where(User.id.in_(user_ids)),
+                                  bind_arguments=read_bind_arguments()))
+
+
+def get_author_ids_of_post(post_id: int) -> set[int]:
+    """Get ids of the authors of a post."""
+    with sharding.on_shard_of_post(post_id):
+        return set(db.session.scalars(db.select(UserPost.user_id).where(UserPost.post_id == post_id)))
+
+
+def delete_user_posts(post_id: int, user_ids: set):
+    """Delete the user posts linking a post to the given users, in one statement.  Does not commit."""
+    with sharding.on_shard_of_post(post_id, writing=True):
+        db.session.execute(UserPost.__table__.delete()
+                           .where(UserPost.post_id == post_id)
+                           .where(UserPost.user_id.in_(user_ids)))
+
+
+def create_user_posts(post_id: int, user_ids: set):
+    """Create user posts linking a post to the given users, in one executemany.  Does not commit."""
+    with sharding.on_shard_of_post(post_id, writing=True):
+        db.session.execute(UserPost.__table__.insert(),
+                           [{"user_id": user_id, "post_id": post_id} for user_id in user_ids])
+
+
+def create_posts(new_posts: list[dict], owner_id: int) -> list[int]:
+    """Create posts with their authors and tags using bulk statements.  Return the new post ids.  Does not commit.
+
+    When posts are sharded, they go to the home shard of owner_id, the user
+    creating them, and writes to the home shards of other authors commit
+    the shards written before them (see db.sharding).
+    """
+    post_rows: list[dict] = [{"text": new_post["text"], "tags": ",".join(new_post["tags"]),
+                              "likes": 0, "reads": 0, "popularity": 0.0}
+                             for new_post in new_posts]
+    author_ids: set = set().union(*(new_post["authorIds"] for new_post in new_posts))
+
+    with sharding.on_shard_of_author(owner_id, writing=True):
+        insert_first_post = Post.__table__.insert()
+        id_stride: int = 1
+        if sharding.is_sharded():
+            sharding.note_author_shards(user_ids=author_ids, shard=sharding.shard_of_author(owner_id))
+            insert_first_post = insert_first_post.values(id=Post.select_next_sharded_id())
+            id_stride = sharding.shard_count()
+
+        # Inserting the first post takes SQLite's write lock, so no other writer
+        # can claim ids until commit and the rest can take the ids that follow.
+        first_post_id: int = db.session.execute(insert_first_post, post_rows[0]).inserted_primary_key[0]
+        post_ids: list[int] = list(range(first_post_id, first_post_id + len(post_rows) * id_stride, id_stride))
+        if len(post_rows) > 1:
+            for post_id, post_row in zip(post_ids[1:], post_rows[1:]):
+                post_row["id"] = post_id
+            db.session.execute(Post.__table__.insert(), post_rows[1:])
+
+        db.session.execute(UserPost.__table__.insert(),
+                           [{"user_id": author_id, "post_id": post_id}
+                            for post_id, new_post in zip(post_ids, new_posts)
+                            for author_id in new_post["authorIds"]])
+        PostTag.replace_tags_of_posts(connection=db.session.connection(bind_arguments={"mapper": PostTag.__mapper__}),
+                                      tags_by_post_id={post_id: new_post["tags"]
+                                                       for post_id, new_post in zip(post_ids, new_posts)})
+    post_counts: dict = {}
+    for new_post in new_posts:
+        for author_id in new_post["authorIds"]:
+            post_counts[author_id] = post_counts.get(author_id, 0) + 1
+    add_new_posts_to_author_stats(post_counts=post_counts)
+    bump_author_versions(user_ids=set(post_counts))
+    return post_ids
 
 
 def update_author_ids_of_post(post, deduplicated_author_ids) -> dict:
     """Update authors of post.  Handle applicable errors."""
-    if len(deduplicated_author_ids) != len(filter_users_by_id(user_ids=deduplicated_author_ids)):
+    if len(deduplicated_author_ids) != len(filter_existing_user_ids(user_ids=deduplicated_author_ids)):
         error_or_warning: str = "error"
         return {"success": False, 
                 "message": {error_or_warning: "One or more authorIds provided is invalid.  Please check that each of your authorIds is an id of a user in the database."},
                 "status_code": MESSAGE_TYPE_AND_STATUS_CODE[error_or_warning]}
 
-    delete_user_post_by_post_id(post_id=post.id)
-    for author_id in deduplicated_author_ids:
-        user_post = create_user_post(user_id=author_id, post_id=post.id)
-        db.session.add(user_post)
+    # Only write the difference from the current authors.  The caller
+    # commits it together with the rest of the post update.
+    current_author_ids: set = post.author_ids if post.author_ids is not None else get_author_ids_of_post(post_id=post.id)
+    removed_author_ids: set = current_author_ids - deduplicated_author_ids
+    added_author_ids: set = deduplicated_author_ids - current_author_ids
+
+    if added_author_ids and sharding.is_sharded():
+        sharding.note_author_shards(user_ids=added_author_ids, shard=sharding.shard_of_post(post.id))
+    if removed_author_ids:
+        delete_user_posts(post_id=post.id, user_ids=removed_author_ids)
+    if added_author_ids:
+        create_user_posts(post_id=post.id, user_ids=added_author_ids)
+    post.author_ids = set(deduplicated_author_ids)
+
+    # The post's counts leave the totals of removed authors and join those of added ones.
+    post_totals: dict = {"post_count": 1, "total_likes": post.likes, "total_reads": post.reads,
+                         "total_popularity": post.popularity}
+    add_to_author_stats(deltas={**{author_id: {name: -total for name, total in post_totals.items()}
+                                   for author_id in removed_author_ids},
+                                **{author_id: post_totals for author_id in added_author_ids}})
 
 
 def update_tags_of_post(post, tags) -> dict:
@@ -51,6 +136,112 @@ def update_text_of_post(post, text) -> dict:
     post.text: str = text   
 
 
+def bump_author_versions(user_ids: set):
+    """Mark the feeds of the given authors as changed: bump their versions and drop their cached feeds.  Does not commit."""
+    if not user_ids:
+        return
+    for shard, user_ids_of_shard in sharding.group_by_shard(user_ids, sharding.shard_of_author).items():
+        with sharding.on_shard(shard, writing=True):
+            AuthorVersion.bump(user_ids=user_ids_of_shard)
+    feed_cache.delete_where(lambda cached_feed: not cached_feed[0].isdisjoint(user_ids))
+
+
+def get_author_versions(user_ids: set) -> dict:
+    """Get the feed version of each of the given authors."""
+    versions: dict = {}
+    for shard, user_ids_of_shard in sharding.group_by_shard(user_ids, sharding.shard_of_author).items():
+        with sharding.on_shard(shard):
+            versions.update(AuthorVersion.get_versions(user_ids=user_ids_of_shard))
+    return versions
+
+
+def get_author_ids_of_posts(post_ids: list) -> dict:
+    """Get ids of the authors of each of the posts, in one query."""
+    author_ids_by_post_id: dict = {post_id: [] for post_id in post_ids}
+    for shard, post_ids_of_shard in sharding.group_by_shard(post_ids, sharding.shard_of_post).items():
+        with sharding.on_shard(shard):
+            rows = db.session.execute(db.select(UserPost.post_id, UserPost.user_id)
+                                      .where(UserPost.post_id.in_(post_ids_of_shard))
+                                      .order_by(UserPost.post_id, UserPost.user_id))
+            for post_id, user_id in rows:
+                author_ids_by_post_id[post_id].append(user_id)
+    return author_ids_by_post_id
+
+
+def post_exists(post_id: int) -> bool:
+    with sharding.on_shard_of_post(post_id):
+        return Post.exists(post_id=post_id)
+
+
+def add_counts_of_posts(counts: list[dict]) -> list:
+    """Add buffered read and like increments to posts, and to the totals of their authors.  Return the updated post rows.  Does not commit."""
+    counts_by_post_id: dict = {count["post_id"]: count for count in counts}
+    popularity_before: dict = {}
+    post_rows: list = []
+    for shard, post_ids_of_shard in sharding.group_by_shard(counts_by_post_id, sharding.shard_of_post).items():
+        with sharding.on_shard(shard, writing=True):
+            popularity_before.update(Post.get_popularity_of_posts(post_ids=post_ids_of_shard))
+            Post.add_counts(counts=[counts_by_post_id[post_id] for post_id in post_ids_of_shard])
+            post_rows.extend(Post.get_post_rows(post_ids=post_ids_of_shard))
+
+    # Deltas of each post, summed up per author.
+    author_ids_by_post_id: dict = get_author_ids_of_posts(post_ids=list(counts_by_post_id))
+    deltas: dict = {}
+    for post_row in post_rows:
+        count: dict = counts_by_post_id[post_row.id]
+        for author_id in author_ids_by_post_id[post_row.id]:
+            delta: dict = deltas.setdefault(author_id, {"post_count": 0, "total_likes": 0, "total_reads": 0,
+                                                        "total_popularity": 0.0})
+            delta["total_likes"] += count["likes"]
+            delta["total_reads"] += count["reads"]
+            delta["total_popularity"] += post_row.popularity - popularity_before[post_row.id]
+    add_to_author_stats(deltas=deltas)
+
+    bump_author_versions(user_ids=set(deltas))
+    return post_rows
+
+
+def add_new_posts_to_author_stats(post_counts: dict):
+    """Count new posts, which have no likes, reads or popularity yet, in the totals of their authors.  Does not commit."""
+    add_to_author_stats(deltas={author_id: {"post_count": post_count, "total_likes": 0, "total_reads": 0,
+                                        "total_popularity": 0.0}
+                            for author_id, post_count in post_counts.items()})
+
+
+def add_to_author_stats(deltas: dict):
+    """Add deltas to the totals of authors, see AuthorStats.add, on the home shard of each author.  Does not commit."""
+    for shard, user_ids in sharding.group_by_shard(deltas, sharding.shard_of_author).items():
+        with sharding.on_shard(shard, writing=True):
+            AuthorStats.add(deltas={user_id: deltas[user_id] for user_id in user_ids})
+
+
+def get_author_stats(user_id: int):
+    with sharding.on_shard_of_author(user_id):
+        return AuthorStats.get_stats_of_user(user_id=user_id)
+
+
+def get_top_post_rows(sort_by: str, limit: int) -> list:
+    return Post.get_top_post_rows(sort_by=sort_by, limit=limit)
+
+
+def get_post_rows(post_ids: list) -> list:
+    post_rows: list = []
+    for shard, post_ids_of_shard in sharding.group_by_shard(post_ids, sharding.shard_of_post).items():
+        with sharding.on_shard(shard):
+            post_rows.extend(Post.get_post_rows(post_ids=post_ids_of_shard))
+    return post_rows
+
+
+def flush_changes():
+    """Send pending changes to the database without committing."""
+    db.session.flush()
+
+
 def commit_changes():
     """Commit transaction."""        
-    db.session.commit()
\ No newline at end of file
+    db.session.commit()
+
+
+def rollback_changes():
+    """Roll back transaction."""
+    db.session.rollback()
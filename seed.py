@@ -2,9 +2,14 @@ import os
 from flask import Flask
 
 from db.shared import db
+from db import sqlite_profile
 from db.models.user_post import UserPost
 from db.models.post import Post
 from db.models.user import User
+from db.models.tag import Tag
+from db.models.post_tag import PostTag
+from db.models.author_version import AuthorVersion
+from db.models.author_stats import AuthorStats
 
 SEED_PASSWORD = "123456"
 
@@ -15,12 +20,17 @@ def create_app():
         "DB_PATH", "sqlite:///database.db"
     )
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    sqlite_profile.configure(app)
     db.init_app(app)
     return app
 
 
 def reset(db):
     try:
+        AuthorStats.__table__.drop(db.engine, checkfirst=True)
+        AuthorVersion.__table__.drop(db.engine, checkfirst=True)
+        PostTag.__table__.drop(db.engine, checkfirst=True)
+        Tag.__table__.drop(db.engine, checkfirst=True)
         UserPost.__table__.drop(db.engine)
         User.__table__.drop(db.engine)
         Post.__table__.drop(db.engine)
@@ -109,6 +119,10 @@ def seed(db):
     db.session.add(cheng)
     db.session.commit()
 
+    # Posts above were added directly, so compute the author totals once.
+    AuthorStats.rebuild()
+    db.session.commit()
+
     print("seeded users and posts")
 
 
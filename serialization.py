@@ -0,0 +1,132 @@
+import gzip
+import json
+import os
+
+from flask import current_app, request
+
+try:
+    import orjson
+except ImportError:  # stdlib json is used instead
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # responses are JSON only
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # gzip is used instead
+    zstandard = None
+
+# Responses smaller than this are not worth compressing.
+COMPRESSION_MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", 1024))
+
+
+class Serializer:
+    """Turns response data into bytes of one media type."""
+
+    def __init__(self, mimetype: str, dumps):
+        self.mimetype = mimetype
+        self.dumps = dumps
+
+
+def dumps_with_orjson(data) -> bytes:
+    option: int = orjson.OPT_SORT_KEYS if current_app.config["JSON_SORT_KEYS"] else 0
+    return orjson.dumps(data, option=option)
+
+
+def dumps_with_json(data) -> bytes:
+    return json.dumps(data, sort_keys=current_app.config["JSON_SORT_KEYS"], separators=(",", ":"),
+                      ensure_ascii=False).encode("utf-8")
+
+
+def dumps_with_msgpack(data) -> bytes:
+    # Dicts keep insertion order, the same key order as the JSON responses.
+    return msgpack.packb(data)
+
+
+JSON_SERIALIZERS: dict = {"json": Serializer("application/json", dumps_with_json)}
+if orjson is not None:
+    JSON_SERIALIZERS["orjson"] = Serializer("application/json", dumps_with_orjson)
+
+
+def register_serializer(app, serializer: Serializer):
+    """Offer another media type to clients that ask for it in Accept.  The first registered one is the default."""
+    app.extensions.setdefault("serializers", {})[serializer.mimetype] = serializer
+
+
+def negotiate() -> Serializer:
+    """Pick the serializer of the current request from its Accept header."""
+    serializers: dict = current_app.extensions["serializers"]
+    mimetype: str = request.accept_mimetypes.best_match(serializers, default=next(iter(serializers)))
+    return serializers[mimetype]
+
+
+def respond(data, status: int = 200, serializer: Serializer = None):
+    """Create a response in the negotiated format, like jsonify but faster for large bodies."""
+    serializer = serializer or negotiate()
+    return respond_with_body(serializer.dumps(data), status=status, serializer=serializer)
+
+
+def respond_with_body(body: bytes, status: int = 200, serializer: Serializer = None):
+    """Create a response from a body already encoded by the serializer, such as a cached one."""
+    serializer = serializer or negotiate()
+    response = current_app.response_class(body, status=status, mimetype=serializer.mimetype)
+    response.vary.add("Accept")
+    return response
+
+
+def not_modified(etag: str):
+    """Create a 304 response confirming the client's copy with the given ETag."""
+    response = current_app.response_class(status=304)
+    response.vary.add("Accept")
+    response.set_etag(etag)
+    return response
+
+
+def content_coding_of(response) -> str:
+    """Pick how to compress a response, or None to send it as is."""
+    if (response.direct_passthrough or response.is_streamed or "Content-Encoding" in response.headers
+            or not 200 <= response.status_code < 300 or (response.content_length or 0) < COMPRESSION_MIN_BYTES):
+        return None
+    if zstandard is not None and request.accept_encodings["zstd"]:
+        return "zstd"
+    if request.accept_encodings["gzip"]:
+        return "gzip"
+    return None
+
+
+def etag_matches(etag: str):
+    """Return the variant of the ETag matched by If-None-Match, compressed or not, or None."""
+    for variant in (etag, f"{etag}-gzip", f"{etag}-zstd"):
+        if request.if_none_match.contains(variant):
+            return variant
+    return None
+
+
+def init_app(app):
+    """Pick the JSON serializer (JSON_SERIALIZER config), offer MessagePack if installed and compress large responses."""
+    app.config.setdefault("JSON_SERIALIZER", os.environ.get("JSON_SERIALIZER", "orjson" if orjson else "json"))
+    register_serializer(app, JSON_SERIALIZERS.get(app.config["JSON_SERIALIZER"], JSON_SERIALIZERS["json"]))
+    if msgpack is not None:
+        register_serializer(app, Serializer("application/msgpack", dumps_with_msgpack))
+
+    @app.after_request
+    def compress(response):
+        response.vary.add("Accept-Encoding")
+        content_coding: str = content_coding_of(response)
+        if content_coding is None:
+            return response
+
+        body: bytes = response.get_data()
+        if content_coding == "zstd":
+            response.set_data(zstandard.ZstdCompressor(level=3).compress(body))
+        else:
+            response.set_data(gzip.compress(body, compresslevel=5))
+        response.headers["Content-Encoding"] = content_coding
+        # A compressed body is a different representation, so it gets its own strong ETag.
+        etag, weak = response.get_etag()
+        if etag is not None and not weak:
+            response.set_etag(f"{etag}-{content_coding}")
+        return response
@@ -1,8 +1,12 @@
 import pytest
 
 from db.shared import db
+from db import sqlite_profile
 from app import create_app
 import seed
+from caching import auth_cache, feed_cache
+import leaderboards
+from db.routing import sticky_users
 
 
 @pytest.fixture
@@ -10,10 +14,15 @@ def client():
     app = create_app()
     app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///database.db"
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = sqlite_profile.engine_options(app.config["SQLALCHEMY_DATABASE_URI"])
     app.config["TESTING"] = True
     with app.test_client() as client:
         with app.app_context():
             db.init_app(app)
             seed.reset(db)
             seed.seed(db)
+            auth_cache.clear()
+            feed_cache.clear()
+            leaderboards.clear()
+            sticky_users.clear()
         yield client
@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from app import create_app
+from caching import auth_cache, feed_cache
+from db import sqlite_profile
+from tests.utils import make_token
+
+pytest.importorskip("aiosqlite")
+pytest.importorskip("asgiref")
+
+FEED_QUERIES = [
+    {"authorIds": "1,2,3"},
+    {"authorIds": "2", "sortBy": "likes", "direction": "desc", "include": "authorIds"},
+    {"authorIds": "1,3", "sortBy": "popularity", "direction": "desc", "limit": 1},
+    {"authorIds": "2,3,99", "tags": "travel"},
+    {"authorIds": "98,99"},
+    {"authorIds": "1,a"},
+    {"authorIds": "1", "limit": 0},
+    {"authorIds": "1", "direction": "sideways"},
+    {"sortBy": "likes"},
+]
+
+
+@pytest.fixture
+def async_client(client, monkeypatch):
+    """A client of an app that serves GET /api/posts with the async view, on the database `client` seeded."""
+    monkeypatch.setenv("ASYNC_FEED", "1")
+    app = create_app()
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///database.db"
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = sqlite_profile.engine_options(app.config["SQLALCHEMY_DATABASE_URI"])
+    app.config["TESTING"] = True
+    assert asyncio.iscoroutinefunction(app.view_functions["api.fetch_posts"])
+    return app.test_client()
+
+
+def get_feed(client, query_string, user_id=1, headers=None):
+    # Make every request run the feed query rather than answer from the cache.
+    feed_cache.clear()
+    return client.get("/api/posts", headers={"x-access-token": make_token(user_id), **(headers or {})},
+                      query_string=query_string)
+
+
+def test_async_feed_matches_sync_feed(client, async_client):
+    """should answer every feed query, valid or not, with the same status, body and ETag as the sync view."""
+
+    for query_string in FEED_QUERIES:
+        expected = get_feed(client, query_string)
+        response = get_feed(async_client, query_string)
+        assert (response.status_code, response.json, response.headers.get("ETag")) == \
+               (expected.status_code, expected.json, expected.headers.get("ETag")), query_string
+
+    second_page_query = {**FEED_QUERIES[2], "cursor": get_feed(client, FEED_QUERIES[2]).json["nextCursor"]}
+    assert get_feed(async_client, second_page_query).json == get_feed(client, second_page_query).json
+
+
+def test_async_feed_revalidates_and_caches(async_client):
+    """should answer a matching If-None-Match with 304 and repeats from the feed cache."""
+
+    response = get_feed(async_client, FEED_QUERIES[0])
+    revalidated = async_client.get("/api/posts", query_string=FEED_QUERIES[0],
+                                   headers={"x-access-token": make_token(1), "If-None-Match": response.headers["ETag"]})
+    assert revalidated.status_code == 304
+
+    stats_before = feed_cache.stats()
+    repeated = async_client.get("/api/posts", headers={"x-access-token": make_token(1)}, query_string=FEED_QUERIES[0])
+    assert repeated.get_data() == response.get_data()
+    assert feed_cache.stats()["hits"] - stats_before["hits"] == 1
+
+
+def test_async_feed_authentication(async_client):
+    """should reject requests without a token, and tokens of unknown users, like the sync view."""
+
+    assert async_client.get("/api/posts", query_string=FEED_QUERIES[0]).status_code == 401
+    response = get_feed(async_client, FEED_QUERIES[0], user_id=99)
+    assert response.status_code == 403
+    assert response.json == {"error": "No user found with provided token"}
+
+    auth_cache.clear()
+    assert get_feed(async_client, FEED_QUERIES[0], user_id=2).status_code == 200
+    assert auth_cache.stats()["size"] == 1
+
+
+def test_async_feed_opens_one_connection(async_client, monkeypatch):
+    """should look the user up and read the feed on one connection, applying only per-connection pragmas to it."""
+
+    applied_pragmas = []
+    monkeypatch.setattr(sqlite_profile, "apply_pragmas",
+                        lambda dbapi_connection, pragmas: applied_pragmas.append(set(pragmas)))
+
+    auth_cache.clear()
+    assert get_feed(async_client, FEED_QUERIES[1], user_id=2).status_code == 200
+    assert applied_pragmas == [set(sqlite_profile.SQLITE_PRAGMAS) - sqlite_profile.PERSISTENT_PRAGMAS]
+
+
+def test_async_feed_keeps_sync_view_with_replicas(monkeypatch, tmp_path):
+    """should keep the sync view when read replicas are set up, since the async view reads the primary only."""
+
+    monkeypatch.setenv("ASYNC_FEED", "1")
+    monkeypatch.setenv("READ_REPLICA_URIS", f"sqlite:///{tmp_path}/replica.db")
+    app = create_app()
+    assert app.config["READ_REPLICA_BINDS"]
+    assert not asyncio.iscoroutinefunction(app.view_functions["api.fetch_posts"])
@@ -1,4 +1,11 @@
 import json
+import threading
+
+import hashing_pool
+
+from db.models import user as user_model
+from db.models.user import User
+from db.shared import db
 
 
 def test_login(client):
@@ -12,3 +19,52 @@ def test_login(client):
     assert values.get("username") == "thomas"
     assert values.get("id") == 1
     assert response.status_code == 200
+
+
+def test_update_without_password_keeps_hash(client):
+    """should not rehash the password when another column of the user changes."""
+    with client.application.app_context():
+        user = User.query.get(1)
+        password_hash = user.password
+        user.username = "tom"
+        db.session.commit()
+
+        assert User.query.get(1).password == password_hash
+        assert User.query.get(1).correct_password("123456")
+
+
+def test_login_rehashes_password_with_new_cost(client, monkeypatch):
+    """should rehash the password on login when the configured bcrypt cost changes."""
+    monkeypatch.setattr(user_model, "BCRYPT_ROUNDS", 4)
+    for _ in range(2):
+        response = client.post(
+            "/api/login",
+            data=json.dumps(dict(username="thomas", password="123456")),
+            content_type="application/json",
+        )
+        assert response.status_code == 200
+
+    with client.application.app_context():
+        assert user_model.get_cost_factor(User.query.get(1).password) == 4
+
+
+def test_login_fails_fast_when_password_pool_is_full(client, monkeypatch):
+    """should answer 503 instead of queueing when the password pool is saturated."""
+    pool = hashing_pool.BoundedWorkerPool(max_workers=1, max_queue_depth=0, name="test")
+    monkeypatch.setattr(user_model, "password_pool", pool)
+    release = threading.Event()
+    worker = threading.Thread(target=pool.run, args=(release.wait,))
+    worker.start()
+    while pool.stats()["inFlight"] == 0:
+        pass
+
+    response = client.post(
+        "/api/login",
+        data=json.dumps(dict(username="thomas", password="123456")),
+        content_type="application/json",
+    )
+    release.set()
+    worker.join()
+
+    assert response.status_code == 503
+    assert pool.stats()["rejected"] == 1
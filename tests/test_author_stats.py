@@ -0,0 +1,84 @@
+import json
+
+from db.shared import db
+from db.models.author_stats import AuthorStats
+import counters
+from tests.utils import make_token
+
+
+def get_stats(client, author_id):
+    return client.get(f"/api/authors/{author_id}/stats", headers={"x-access-token": make_token(1)})
+
+
+def test_author_stats(client):
+    """should show the totals and averages of an author's posts."""
+
+    posts = client.get(
+        "/api/posts", headers={"x-access-token": make_token(1)}, query_string={"authorIds": "2"}
+    ).json["posts"]
+    response = get_stats(client, 2)
+
+    assert response.status_code == 200
+    assert response.json["postCount"] == len(posts)
+    assert response.json["totalLikes"] == sum(post["likes"] for post in posts)
+    assert response.json["totalReads"] == sum(post["reads"] for post in posts)
+    assert response.json["averagePopularity"] == sum(post["popularity"] for post in posts) / len(posts)
+
+
+def test_author_stats_of_author_without_posts(client):
+    """should show zero posts and no averages."""
+
+    response = get_stats(client, 4)
+    assert response.json["postCount"] == 0
+    assert response.json["averageLikes"] is None
+
+
+def test_author_stats_unknown_author(client):
+    """should warn about authors that do not exist and reject ids that are not numbers."""
+
+    assert "warning" in get_stats(client, 99).json
+    assert get_stats(client, "one").status_code == 400
+
+
+def test_author_stats_follow_every_write(client):
+    """should keep the stored totals equal to the posts through creation, author changes and counts."""
+
+    client.application.config["COUNTER_FLUSH_INTERVAL_SECONDS"] = 0
+    token = make_token(4)
+    client.post("/api/posts", headers={"x-access-token": token}, data=json.dumps({"text": "one", "tags": ["food"]}))
+    client.post(
+        "/api/posts/batch",
+        headers={"x-access-token": token},
+        data=json.dumps([{"text": "two", "tags": [], "authorIds": [5]}, {"text": "three", "tags": []}]),
+    )
+    client.patch(
+        "/api/posts/1",
+        headers={"x-access-token": make_token(1), "Content-Type": "application/json"},
+        data=json.dumps({"authorIds": [1, 4]}),
+    )
+    for action in ["read", "read", "like"]:
+        client.post(f"/api/posts/1/{action}", headers={"x-access-token": token})
+    with client.application.app_context():
+        counters.flush_counters()
+
+    assert get_stats(client, 4).json["postCount"] == 4
+    assert get_stats(client, 5).json["postCount"] == 1
+    with client.application.app_context():
+        assert AuthorStats.find_drift() == []
+
+
+def test_verify_author_stats_command(client):
+    """should report drifted totals and fix them with --rebuild."""
+
+    runner = client.application.test_cli_runner()
+    assert runner.invoke(args=["verify-author-stats"]).exit_code == 0
+
+    with client.application.app_context():
+        db.session.execute(AuthorStats.__table__.update().values(total_likes=AuthorStats.total_likes + 1))
+        db.session.commit()
+    result = runner.invoke(args=["verify-author-stats"])
+    assert result.exit_code == 1
+    assert "3 author(s) drifted" in result.output
+
+    assert runner.invoke(args=["verify-author-stats", "--rebuild"]).exit_code == 0
+    assert runner.invoke(args=["verify-author-stats"]).exit_code == 0
@@ -0,0 +1,77 @@
+from db.shared import db
+from db.models.post import Post
+import counters
+from app import create_app
+from counters import CounterBuffer
+from tests.utils import make_token
+
+
+def count(client, post_id, action, times):
+    token = make_token(1)
+    for _ in range(times):
+        response = client.post(f"/api/posts/{post_id}/{action}", headers={"x-access-token": token})
+        assert response.status_code == 202
+
+
+def test_counts_are_written_behind(client):
+    """should buffer reads and likes and write them with one flush, recomputing popularity."""
+
+    client.application.config["COUNTER_FLUSH_INTERVAL_SECONDS"] = 0
+    with client.application.app_context():
+        counters.flush_counters()
+        reads, likes = db.session.execute(db.select(Post.reads, Post.likes).where(Post.id == 1)).one()
+
+    count(client, 1, "read", 3)
+    count(client, 1, "like", 2)
+    count(client, 2, "read", 1)
+    assert client.application.extensions["post_counters"].stats()["pendingPosts"] == 2
+
+    with client.application.app_context():
+        assert db.session.get(Post, 1).reads == reads
+        assert counters.flush_counters() == 2
+        post = db.session.get(Post, 1)
+        assert (post.reads, post.likes) == (reads + 3, likes + 2)
+        assert post.popularity == round(min(1.0, (likes + 2) / (reads + 3)), 2)
+    assert client.application.extensions["post_counters"].stats()["pendingPosts"] == 0
+
+
+def test_count_unknown_post(client):
+    """should not buffer counts of posts that do not exist."""
+
+    token = make_token(1)
+    response = client.post("/api/posts/99/like", headers={"x-access-token": token})
+    assert "warning" in response.json
+    assert client.post("/api/posts/one/like", headers={"x-access-token": token}).status_code == 400
+    assert client.application.extensions["post_counters"].stats()["pendingPosts"] == 0
+
+
+def test_buffer_coalesces_and_drops_when_full():
+    """should keep one entry per post and drop increments of new posts past its size."""
+
+    buffer = CounterBuffer(shard_count=2, max_pending_posts=2)
+    assert buffer.increment(1, reads=1)
+    assert buffer.increment(1, likes=1)
+    assert buffer.increment(2, reads=1)
+    assert not buffer.increment(3, reads=1)
+    assert buffer.increment(1, reads=1)
+
+    drained, oldest_pending_at = buffer.drain()
+    assert drained == {1: [2, 1], 2: [1, 0]}
+    assert buffer.stats()["droppedIncrements"] == 1
+    assert buffer.stats()["pendingPosts"] == 0
+
+    buffer.restore(drained, oldest_pending_at)
+    assert buffer.stats()["pendingIncrements"] == 4
+    assert buffer.stats()["failedFlushes"] == 1
+
+
+def test_each_app_flushes_its_own_buffer(client):
+    """should leave increments of one app to its own flusher, not to a flush of another app."""
+
+    client.application.config["COUNTER_FLUSH_INTERVAL_SECONDS"] = 0
+    count(client, 1, "read", 1)
+    other_app = create_app()
+    other_app.config["COUNTER_FLUSH_INTERVAL_SECONDS"] = 0
+    with other_app.app_context():
+        assert counters.flush_counters() == 0
+    assert client.application.extensions["post_counters"].stats()["pendingPosts"] == 1
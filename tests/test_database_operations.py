@@ -0,0 +1,19 @@
+from db.models.post import Post
+from db.shared import db
+from repository_layer import database_operations
+
+
+def test_update_author_ids_of_post_waits_for_commit(client):
+    """should change only the differing authors, inside the caller's transaction."""
+
+    with client.application.app_context():
+        post = Post.get_post_by_post_id(post_id=3)
+        database_operations.update_author_ids_of_post(post=post, deduplicated_author_ids={2, 4})
+        assert database_operations.get_author_ids_of_post(post_id=3) == {2, 4}
+
+        db.session.rollback()
+        assert database_operations.get_author_ids_of_post(post_id=3) == {2, 3}
+
+        database_operations.update_author_ids_of_post(post=post, deduplicated_author_ids={2, 4})
+        database_operations.commit_changes()
+        assert database_operations.get_author_ids_of_post(post_id=3) == {2, 4}
@@ -0,0 +1,94 @@
+import json
+
+from instrumentation import statement_cache_statistics
+from tests.utils import make_token, assert_max_queries
+
+
+def test_query_budget_of_fetch_posts(client):
+    """should fetch a feed with a fixed number of queries, whatever the number of authors."""
+
+    token = make_token(2)
+    with assert_max_queries(4):
+        client.get(
+            "/api/posts", headers={"x-access-token": token}, query_string={"authorIds": "1,2,3,4,5"}
+        )
+
+
+def test_query_budget_of_fetch_posts_with_author_ids(client):
+    """should add the authors of every post with one extra query."""
+
+    token = make_token(2)
+    with assert_max_queries(5):
+        response = client.get(
+            "/api/posts",
+            headers={"x-access-token": token},
+            query_string={"authorIds": "2,3", "include": "authorIds"},
+        )
+
+    assert [post["authorIds"] for post in response.json["posts"]] == [[1, 2], [2], [2, 3], [3]]
+
+
+def test_query_budget_of_cached_fetch_posts(client):
+    """should serve a repeated feed from the cache without running the feed query."""
+
+    token = make_token(2)
+    query_string = {"authorIds": "2,3", "include": "authorIds"}
+    expected = client.get("/api/posts", headers={"x-access-token": token}, query_string=query_string).json
+    with assert_max_queries(2):
+        response = client.get("/api/posts", headers={"x-access-token": token}, query_string=query_string)
+
+    assert response.json == expected
+
+
+def test_feed_statements_stay_compiled(client):
+    """should reuse compiled statements for feeds of any number of authors and pages."""
+
+    client.application.config["SQL_INSTRUMENTATION"] = True
+    token = make_token(2)
+    client.get("/api/posts", headers={"x-access-token": token}, query_string={"authorIds": "2", "sortBy": "likes"})
+    hits, misses = statement_cache_statistics.stats()["hits"], statement_cache_statistics.stats()["misses"]
+    for author_ids in ["1,2", "2,3,4", "1,2,3,4,5"]:
+        client.get(
+            "/api/posts", headers={"x-access-token": token}, query_string={"authorIds": author_ids, "sortBy": "likes"}
+        )
+
+    assert statement_cache_statistics.stats()["misses"] == misses
+    assert statement_cache_statistics.stats()["hits"] > hits
+
+
+def test_query_budget_of_update_post(client):
+    """should update a post's text, tags and authors with a fixed number of queries."""
+
+    token = make_token(1)
+    data = {"tags": ["travel", "vacation"], "text": "my text", "authorIds": [1, 5]}
+    with assert_max_queries(13):
+        client.patch(
+            "/api/posts/1",
+            headers={"x-access-token": token, "Content-Type": "application/json"},
+            data=json.dumps(data),
+        )
+
+
+def test_query_budget_of_create_post(client):
+    """should create a post with a fixed number of queries."""
+
+    token = make_token(1)
+    with assert_max_queries(10):
+        client.post(
+            "/api/posts",
+            headers={"x-access-token": token},
+            data=json.dumps({"text": "new post", "tags": ["travel"]}),
+        )
+
+
+def test_server_timing_header(client):
+    """should report SQL count and time in Server-Timing when instrumentation is enabled."""
+
+    client.application.config["SQL_INSTRUMENTATION"] = True
+    token = make_token(2)
+    response = client.get(
+        "/api/posts", headers={"x-access-token": token}, query_string={"authorIds": "2"}
+    )
+
+    assert 'db;dur=' in response.headers["Server-Timing"]
+    assert '4 queries' in response.headers["Server-Timing"]
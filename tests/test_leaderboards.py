@@ -0,0 +1,98 @@
+from db.shared import db
+import counters
+from leaderboards import Leaderboard
+from tests.utils import make_token, assert_max_queries
+
+
+def get_top(client, **query_string):
+    return client.get("/api/posts/top", headers={"x-access-token": make_token(1)}, query_string=query_string)
+
+
+def test_top_posts(client):
+    """should list the top posts of every author, like a feed of all authors sorted descending."""
+
+    feed = client.get(
+        "/api/posts",
+        headers={"x-access-token": make_token(1)},
+        query_string={"authorIds": "1,2,3,4,5", "sortBy": "likes", "direction": "desc"},
+    )
+    response = get_top(client, sortBy="likes", limit=3)
+
+    assert response.status_code == 200
+    assert response.json["posts"] == feed.json["posts"][:3]
+    with assert_max_queries(0):
+        assert get_top(client, sortBy="likes", limit=2).json["posts"] == feed.json["posts"][:2]
+
+
+def test_top_posts_follow_counter_flushes(client):
+    """should move a post up its leaderboard when flushed counts rank it higher."""
+
+    client.application.config["COUNTER_FLUSH_INTERVAL_SECONDS"] = 0
+    with client.application.app_context():
+        counters.flush_counters()
+    last_post_id = get_top(client, sortBy="reads", limit=100).json["posts"][-1]["id"]
+
+    with client.application.app_context():
+        for _ in range(10000):
+            counters.increment(last_post_id, reads=1)
+        counters.flush_counters()
+
+    with assert_max_queries(0):
+        response = get_top(client, sortBy="reads", limit=1)
+    assert response.json["posts"][0]["id"] == last_post_id
+
+
+def test_top_posts_unacceptable_parameters(client):
+    """should reject unknown sort keys and limits beyond the leaderboard."""
+
+    assert get_top(client, sortBy="id").status_code == 400
+    assert get_top(client, limit=0).status_code == 400
+    assert get_top(client, limit=1000).status_code == 400
+
+
+def test_leaderboard_reloads_when_a_listed_post_falls_off():
+    """should apply changes it can place exactly and reload when it cannot."""
+
+    posts = {post_id: {"id": post_id, "likes": likes} for post_id, likes in [(1, 5), (2, 3), (3, 1), (4, 0)]}
+    loads = []
+
+    def load(sort_by, size):
+        loads.append(sort_by)
+        return sorted(posts.values(), key=lambda post: (post["likes"], post["id"]), reverse=True)[:size]
+
+    leaderboard = Leaderboard(sort_by="likes", size=2, max_age_seconds=60)
+    assert [post["id"] for post in leaderboard.top(2, load)] == [1, 2]
+
+    posts[3] = {"id": 3, "likes": 4}
+    leaderboard.offer([posts[3]])
+    assert [post["id"] for post in leaderboard.top(2, load)] == [1, 3]
+    assert len(loads) == 1
+
+    posts[1] = {"id": 1, "likes": 0}
+    leaderboard.offer([posts[1]])
+    assert [post["id"] for post in leaderboard.top(2, load)] == [3, 2]
+    assert len(loads) == 2
+
+
+def test_leaderboard_makes_room_for_new_posts_on_ties():
+    """should reload for new posts when the board is full but its last post ties with their value of 0."""
+
+    posts = {post_id: {"id": post_id, "likes": likes} for post_id, likes in [(1, 5), (2, 0), (3, 0)]}
+
+    def load(sort_by, size):
+        return sorted(posts.values(), key=lambda post: (post["likes"], post["id"]), reverse=True)[:size]
+
+    leaderboard = Leaderboard(sort_by="likes", size=2, max_age_seconds=60)
+    assert [post["id"] for post in leaderboard.top(2, load)] == [1, 3]
+
+    posts[4] = {"id": 4, "likes": 0}
+    leaderboard.make_room()
+    assert [post["id"] for post in leaderboard.top(2, load)] == [1, 4]
+
+    # When the last listed post ranks above 0, new posts do not belong on the board.
+    posts[2] = {"id": 2, "likes": 2}
+    leaderboard = Leaderboard(sort_by="likes", size=2, max_age_seconds=60)
+    leaderboard.top(2, load)
+    leaderboard.make_room()
+    assert [post["id"] for post in leaderboard.top(2, load)] == [1, 2]
+    assert leaderboard.stats()["reloads"] == 1
@@ -0,0 +1,38 @@
+from caching import auth_cache
+from db.models.user import User
+from db.shared import db
+from tests.utils import make_token
+
+
+def test_auth_cache_skips_user_lookup_on_repeat_token(client):
+    """should serve the second request with the same token from the auth cache."""
+
+    token = make_token(2)
+    query_params = {"authorIds": "2"}
+    stats_before = auth_cache.stats()
+    for _ in range(2):
+        response = client.get(
+            "/api/posts", headers={"x-access-token": token}, query_string=query_params
+        )
+        assert response.status_code == 200
+
+    stats = auth_cache.stats()
+    assert stats["misses"] - stats_before["misses"] == 1
+    assert stats["hits"] - stats_before["hits"] == 1
+
+
+def test_auth_cache_invalidated_when_user_changes(client):
+    """should drop cached principals of a user whose row is updated."""
+
+    token = make_token(2)
+    client.get("/api/metrics", headers={"x-access-token": token})
+    assert auth_cache.stats()["size"] == 1
+
+    with client.application.app_context():
+        user = User.query.get(2)
+        user.username = "santiago2"
+        db.session.commit()
+
+    assert auth_cache.stats()["size"] == 0
+    response = client.get("/api/metrics", headers={"x-access-token": token})
+    assert response.status_code == 200
@@ -0,0 +1,41 @@
+from db import migrations
+from db.models.post_tag import PostTag
+from db.shared import db
+
+
+def test_create_missing_indexes(client):
+    """should recreate a declared index that an existing database lacks."""
+
+    with client.application.app_context():
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql("DROP INDEX ix_user_post_post_id_user_id")
+
+        assert migrations.create_missing_indexes(db) == ["ix_user_post_post_id_user_id"]
+        assert migrations.create_missing_indexes(db) == []
+
+
+def test_backfill_post_tags(client):
+    """should rebuild post_tag rows from the comma separated tags column."""
+
+    with client.application.app_context():
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql("DELETE FROM post_tag")
+
+        assert migrations.backfill_post_tags(db, batch_size=3) == 4
+        assert migrations.backfill_post_tags(db) == 0
+        post_ids = db.session.scalars(PostTag.select_post_ids_by_tag_names(tag_names={"vacation"})).all()
+        assert sorted(post_ids) == [3, 4]
+
+
+def test_create_post_search_index(client):
+    """should create and fill the full-text index of an existing database."""
+
+    with client.application.app_context():
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql("DROP TABLE post_fts")
+
+        assert migrations.create_post_search_index(db) is True
+        assert migrations.create_post_search_index(db) is False
+        with db.engine.connect() as connection:
+            matches = connection.exec_driver_sql("SELECT rowid FROM post_fts WHERE post_fts MATCH 'post'").all()
+        assert matches == [(4,)]
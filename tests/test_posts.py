@@ -58,6 +58,288 @@ def test_update_text_property(client):
     )
 
 
+def test_get_posts_paginated(client):
+    """should page through posts with ties in the sort key using nextCursor."""
+
+    token = make_token(2)
+    query_params = {"authorIds": "2", "sortBy": "popularity", "direction": "desc", "limit": 1}
+    post_ids = []
+    while True:
+        response = client.get(
+            "/api/posts", headers={"x-access-token": token}, query_string=query_params
+        )
+        assert response.status_code == 200
+        post_ids.extend(post["id"] for post in response.json["posts"])
+        if response.json["nextCursor"] is None:
+            break
+        query_params["cursor"] = response.json["nextCursor"]
+
+    assert post_ids == [3, 2, 1]
+
+
+def test_get_posts_rejects_cursor_for_other_sort(client):
+    """should reject a cursor that was issued for a different sortBy."""
+
+    token = make_token(2)
+    query_params = {"authorIds": "2", "sortBy": "likes", "limit": 1}
+    response = client.get(
+        "/api/posts", headers={"x-access-token": token}, query_string=query_params
+    )
+    query_params.update(sortBy="reads", cursor=response.json["nextCursor"])
+    response = client.get(
+        "/api/posts", headers={"x-access-token": token}, query_string=query_params
+    )
+
+    assert response.status_code == 400
+
+
+def test_get_posts_reports_unknown_author_ids(client):
+    """should return posts of known authors and list the unknown author ids."""
+
+    token = make_token(2)
+    query_params = {"authorIds": "2,98,99"}
+    response = client.get(
+        "/api/posts", headers={"x-access-token": token}, query_string=query_params
+    )
+
+    assert response.json["posts"] == posts_of_user_2["posts"]
+    assert response.json["unknownAuthorIds"] == [98, 99]
+
+
+def test_get_posts_filtered_by_tags(client):
+    """should only return posts that have at least one of the requested tags."""
+
+    token = make_token(2)
+    query_params = {"authorIds": "2,3", "tags": "hotels,vacation"}
+    response = client.get(
+        "/api/posts", headers={"x-access-token": token}, query_string=query_params
+    )
+
+    assert [post["id"] for post in response.json["posts"]] == [2, 3, 4]
+
+
+def test_get_posts_filtered_by_updated_tags(client):
+    """should filter by the tags a post was updated to have."""
+
+    token = make_token(1)
+    client.patch(
+        "/api/posts/1",
+        headers={
+            "x-access-token": token,
+            "Content-Type": "application/json",
+        },
+        data=json.dumps({"tags": ["travel", "hotels"]}),
+    )
+    response = client.get(
+        "/api/posts",
+        headers={"x-access-token": token},
+        query_string={"authorIds": "1", "tags": "food"},
+    )
+
+    assert response.json["posts"] == []
+
+
+def test_search_posts(client):
+    """should find posts by words in their text, including text updated by PATCH."""
+
+    token = make_token(2)
+    client.patch(
+        "/api/posts/3",
+        headers={
+            "x-access-token": token,
+            "Content-Type": "application/json",
+        },
+        data=json.dumps({"text": "A quiet weekend at the lake"}),
+    )
+    response = client.get(
+        "/api/posts/search",
+        headers={"x-access-token": token},
+        query_string={"q": "WEEKEND lake", "authorIds": "2"},
+    )
+
+    assert response.status_code == 200
+    assert [post["id"] for post in response.json["posts"]] == [3]
+    assert response.json["posts"][0]["text"] == "A quiet weekend at the lake"
+    assert response.json["nextCursor"] is None
+
+
+def test_search_posts_paginated(client):
+    """should page through ranked search results using nextCursor."""
+
+    token = make_token(2)
+    query_params = {"q": "pariatur", "limit": 1}
+    post_ids = []
+    while True:
+        response = client.get(
+            "/api/posts/search", headers={"x-access-token": token}, query_string=query_params
+        )
+        post_ids.extend(post["id"] for post in response.json["posts"])
+        if response.json["nextCursor"] is None:
+            break
+        query_params["cursor"] = response.json["nextCursor"]
+
+    assert sorted(post_ids) == [1, 2, 3]
+
+
+def test_create_post(client):
+    """should create a post authored by the requesting user."""
+
+    token = make_token(4)
+    response = client.post(
+        "/api/posts",
+        headers={"x-access-token": token},
+        data=json.dumps({"text": "new post", "tags": ["travel"]}),
+    )
+    assert response.status_code == 200
+    assert response.json["id"] == 5
+
+    response = client.get(
+        "/api/posts", headers={"x-access-token": token}, query_string={"authorIds": "4"}
+    )
+    assert [post["id"] for post in response.json["posts"]] == [5]
+
+
+def test_create_posts_in_batch(client):
+    """should create every post of a batch with its authors and tags."""
+
+    token = make_token(4)
+    data = [
+        {"text": "first", "tags": ["travel", "food"]},
+        {"text": "second", "tags": ["food"], "authorIds": [5]},
+    ]
+    response = client.post(
+        "/api/posts/batch", headers={"x-access-token": token}, data=json.dumps(data)
+    )
+    assert response.status_code == 200
+    assert response.json["ids"] == [5, 6]
+
+    response = client.get(
+        "/api/posts",
+        headers={"x-access-token": token},
+        query_string={"authorIds": "4,5", "tags": "food"},
+    )
+    assert [(post["id"], post["text"], post["tags"]) for post in response.json["posts"]] == [
+        (5, "first", ["travel", "food"]),
+        (6, "second", ["food"]),
+    ]
+    response = client.get(
+        "/api/posts", headers={"x-access-token": token}, query_string={"authorIds": "5"}
+    )
+    assert [post["id"] for post in response.json["posts"]] == [6]
+
+
+def test_create_posts_in_batch_rejects_unknown_authors(client):
+    """should create nothing when a co-author does not exist."""
+
+    token = make_token(4)
+    data = [{"text": "first", "tags": []}, {"text": "second", "tags": [], "authorIds": [99]}]
+    response = client.post(
+        "/api/posts/batch", headers={"x-access-token": token}, data=json.dumps(data)
+    )
+    assert response.status_code == 400
+    assert response.json["unknownAuthorIds"] == [99]
+
+
+def test_update_post_by_non_author(client):
+    """should refuse to update a post for a user who is not one of its authors."""
+
+    token = make_token(4)
+    response = client.patch(
+        "/api/posts/1",
+        headers={
+            "x-access-token": token,
+            "Content-Type": "application/json",
+        },
+        data=json.dumps({"text": "not mine"}),
+    )
+
+    assert response.status_code == 401
+
+
+
+def test_get_posts_not_modified(client):
+    """should answer a revalidation with 304 until a post of one of the authors changes."""
+
+    token = make_token(2)
+    query_string = {"authorIds": "2", "sortBy": "likes"}
+    response = client.get("/api/posts", headers={"x-access-token": token}, query_string=query_string)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    response = client.get(
+        "/api/posts",
+        headers={"x-access-token": token, "If-None-Match": etag},
+        query_string=query_string,
+    )
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+    response = client.get(
+        "/api/posts",
+        headers={"x-access-token": token, "If-None-Match": etag},
+        query_string={**query_string, "direction": "desc"},
+    )
+    assert response.status_code == 200
+
+    client.patch(
+        "/api/posts/1",
+        headers={"x-access-token": token, "Content-Type": "application/json"},
+        data=json.dumps({"text": "changed"}),
+    )
+    response = client.get(
+        "/api/posts",
+        headers={"x-access-token": token, "If-None-Match": etag},
+        query_string=query_string,
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert "changed" in [post["text"] for post in response.json["posts"]]
+
+
+def test_get_posts_cached_feed_invalidated_by_new_post(client):
+    """should not serve a cached feed after a post of one of its authors is created."""
+
+    token = make_token(4)
+    query_string = {"authorIds": "5"}
+    assert client.get("/api/posts", headers={"x-access-token": token}, query_string=query_string).json == {"posts": []}
+    assert client.get("/api/posts", headers={"x-access-token": token}, query_string=query_string).json == {"posts": []}
+
+    client.post(
+        "/api/posts/batch",
+        headers={"x-access-token": token},
+        data=json.dumps([{"text": "co-authored", "tags": [], "authorIds": [5]}]),
+    )
+    response = client.get("/api/posts", headers={"x-access-token": token}, query_string=query_string)
+    assert [post["text"] for post in response.json["posts"]] == ["co-authored"]
+
+
+
+def test_export_posts(client):
+    """should stream the same posts as the feed, one JSON object per line."""
+
+    token = make_token(2)
+    query_string = {"authorIds": "2,3", "sortBy": "likes", "direction": "desc"}
+    feed = client.get("/api/posts", headers={"x-access-token": token}, query_string=query_string)
+    response = client.get("/api/posts/export", headers={"x-access-token": token}, query_string=query_string)
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    lines = response.get_data(as_text=True).splitlines()
+    assert [json.loads(line) for line in lines] == feed.json["posts"]
+
+
+def test_export_posts_unacceptable_parameters(client):
+    """should reject the same parameters as the feed."""
+
+    token = make_token(2)
+    response = client.get(
+        "/api/posts/export",
+        headers={"x-access-token": token},
+        query_string={"authorIds": "2", "sortBy": "text"},
+    )
+    assert response.status_code == 400
+
+
 # mock data
 posts_of_user_2 = {
     "posts": [
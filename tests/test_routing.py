@@ -0,0 +1,61 @@
+import json
+import sqlite3
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from db.shared import db
+from tests.utils import make_token
+
+
+@pytest.fixture
+def replica(client, tmp_path):
+    """A read-only copy of the seeded database whose post 1 reads differently."""
+
+    replica_path = tmp_path / "replica.db"
+    with client.application.app_context():
+        primary_path = db.engine.url.database
+    with sqlite3.connect(primary_path) as primary, sqlite3.connect(replica_path) as copy:
+        primary.backup(copy)
+        copy.execute("UPDATE post SET text = 'from replica' WHERE id = 1")
+    client.application.config["SQLALCHEMY_BINDS"] = {"replica_0": f"sqlite:///{replica_path}?read_only=1"}
+    client.application.config["READ_REPLICA_BINDS"] = ["replica_0"]
+    return replica_path
+
+
+def texts_of_feed(client, user_id):
+    response = client.get(
+        "/api/posts", headers={"x-access-token": make_token(user_id)}, query_string={"authorIds": "2"}
+    )
+    return {post["id"]: post["text"] for post in response.json["posts"]}
+
+
+def test_feed_reads_from_replica(client, replica):
+    """should serve feeds from the replica."""
+
+    assert texts_of_feed(client, 3)[1] == "from replica"
+
+
+def test_writer_reads_own_writes(client, replica):
+    """should keep a user who just wrote on the primary, and everyone else on the replica."""
+
+    response = client.patch(
+        "/api/posts/2",
+        headers={"x-access-token": make_token(2), "Content-Type": "application/json"},
+        data=json.dumps({"text": "patched"}),
+    )
+    assert response.status_code == 200
+
+    texts = texts_of_feed(client, 2)
+    assert texts[2] == "patched"
+    assert texts[1] != "from replica"
+    assert texts_of_feed(client, 3)[1] == "from replica"
+
+
+def test_replica_is_read_only(client, replica):
+    """should refuse writes on a replica opened with read_only=1."""
+
+    with client.application.app_context():
+        with db.get_engine(bind="replica_0").connect() as connection:
+            with pytest.raises(OperationalError):
+                connection.exec_driver_sql("UPDATE post SET likes = 0")
@@ -0,0 +1,78 @@
+import gzip
+import json
+
+import pytest
+
+import serialization
+from tests.utils import make_token
+
+
+def create_posts(client, token, count):
+    data = [{"text": f"post number {index} " * 5, "tags": ["travel", "food"]} for index in range(count)]
+    client.post("/api/posts/batch", headers={"x-access-token": token}, data=json.dumps(data))
+
+
+def test_json_serializers_agree(client):
+    """should write the same bytes, in the same key order, with and without orjson."""
+
+    pytest.importorskip("orjson")
+    data = {"posts": [{"id": 1, "likes": 2, "tags": ["a", "ü"]}], "nextCursor": None}
+    with client.application.app_context():
+        assert serialization.dumps_with_orjson(data) == serialization.dumps_with_json(data)
+        assert list(json.loads(serialization.dumps_with_orjson(data))) == ["posts", "nextCursor"]
+
+
+def test_large_feed_is_compressed(client):
+    """should gzip a large feed and give the compressed body its own ETag."""
+
+    token = make_token(4)
+    create_posts(client, token, 50)
+    plain = client.get("/api/posts", headers={"x-access-token": token}, query_string={"authorIds": "4"})
+    assert "Content-Encoding" not in plain.headers
+
+    headers = {"x-access-token": token, "Accept-Encoding": "gzip"}
+    response = client.get("/api/posts", headers=headers, query_string={"authorIds": "4"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert gzip.decompress(response.get_data()) == plain.get_data()
+    assert response.headers["ETag"] == plain.headers["ETag"][:-1] + '-gzip"'
+
+    response = client.get(
+        "/api/posts",
+        headers={**headers, "If-None-Match": response.headers["ETag"]},
+        query_string={"authorIds": "4"},
+    )
+    assert response.status_code == 304
+
+
+def test_small_response_is_not_compressed(client):
+    """should send small responses as they are."""
+
+    token = make_token(2)
+    response = client.get(
+        "/api/posts",
+        headers={"x-access-token": token, "Accept-Encoding": "gzip"},
+        query_string={"authorIds": "2", "limit": 1},
+    )
+    assert "Content-Encoding" not in response.headers
+
+
+def test_feed_as_msgpack(client):
+    """should answer in MessagePack when asked for it, with the same content and key order."""
+
+    msgpack = pytest.importorskip("msgpack")
+    token = make_token(2)
+    query_string = {"authorIds": "2", "limit": 2}
+    as_json = client.get("/api/posts", headers={"x-access-token": token}, query_string=query_string)
+    response = client.get(
+        "/api/posts",
+        headers={"x-access-token": token, "Accept": "application/msgpack"},
+        query_string=query_string,
+    )
+
+    assert response.mimetype == "application/msgpack"
+    assert response.headers["ETag"] != as_json.headers["ETag"]
+    unpacked = msgpack.unpackb(response.get_data())
+    assert unpacked == as_json.json
+    assert list(unpacked) == list(json.loads(as_json.get_data()))
+    assert list(unpacked["posts"][0]) == list(as_json.json["posts"][0])
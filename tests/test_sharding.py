@@ -0,0 +1,158 @@
+import json
+import sqlite3
+
+import pytest
+
+import counters
+import leaderboards
+from caching import feed_cache
+from db import migrations, sharding
+from db.shared import db
+from db.models.author_stats import AuthorStats
+from db.models.author_version import AuthorVersion
+from db.models.post import Post
+from instrumentation import record_queries
+from tests.utils import make_token
+
+FEED_QUERIES = [
+    {"authorIds": "1,2,3"},
+    {"authorIds": "2", "sortBy": "likes", "direction": "desc", "include": "authorIds"},
+    {"authorIds": "1,3", "sortBy": "popularity", "direction": "desc", "limit": 1},
+    {"authorIds": "2,3", "tags": "travel"},
+]
+
+
+def shard_posts(client, tmp_path, shard_count=2):
+    """Move the seeded posts to shard files in tmp_path.  Return the paths of the shards."""
+
+    shard_paths = [tmp_path / f"shard_{shard}.db" for shard in range(shard_count)]
+    client.application.config["SQLALCHEMY_BINDS"] = {f"shard_{shard}": f"sqlite:///{shard_path}"
+                                                      for shard, shard_path in enumerate(shard_paths)}
+    client.application.config["SHARD_BINDS"] = [f"shard_{shard}" for shard in range(shard_count)]
+    with client.application.app_context():
+        migrations.move_posts_to_shards(db)
+    feed_cache.clear()
+    leaderboards.clear()
+    return shard_paths
+
+
+def post_ids_in(path):
+    with sqlite3.connect(path) as connection:
+        return [post_id for post_id, in connection.execute("SELECT id FROM post ORDER BY id")]
+
+
+def get_feed(client, query_string, user_id=1):
+    response = client.get("/api/posts", headers={"x-access-token": make_token(user_id)}, query_string=query_string)
+    assert response.status_code == 200
+    return response.json
+
+
+def test_sharded_feeds_match(client, tmp_path):
+    """should spread posts by id and serve the same feeds, pages, top posts, searches and exports from the shards."""
+
+    headers = {"x-access-token": make_token(1)}
+    search_query = {"q": "culpa", "sortBy": "likes", "direction": "desc"}
+    export_query = {"authorIds": "2,3", "sortBy": "reads"}
+    feeds = [get_feed(client, query_string) for query_string in FEED_QUERIES]
+    top = client.get("/api/posts/top", headers=headers, query_string={"sortBy": "likes"}).json
+    search = client.get("/api/posts/search", headers=headers, query_string=search_query).json
+    export = client.get("/api/posts/export", headers=headers, query_string=export_query).get_data()
+
+    shard_paths = shard_posts(client, tmp_path)
+
+    assert post_ids_in(shard_paths[0]) == [1, 3]
+    assert post_ids_in(shard_paths[1]) == [2, 4]
+    assert post_ids_in("database.db") == []
+    assert [get_feed(client, query_string) for query_string in FEED_QUERIES] == feeds
+    second_page = get_feed(client, {**FEED_QUERIES[2], "cursor": feeds[2]["nextCursor"]})
+    assert second_page["posts"][0]["popularity"] <= feeds[2]["posts"][0]["popularity"]
+    assert client.get("/api/posts/top", headers=headers, query_string={"sortBy": "likes"}).json == top
+    assert client.get("/api/posts/search", headers=headers, query_string=search_query).json == search
+    assert client.get("/api/posts/export", headers=headers, query_string=export_query).get_data() == export
+
+
+def test_new_posts_go_to_home_shard(client, tmp_path):
+    """should write new posts to the home shard of their creator, with ids of that shard only."""
+
+    shard_paths = shard_posts(client, tmp_path)
+    response = client.post(
+        "/api/posts/batch",
+        headers={"x-access-token": make_token(4)},
+        data=json.dumps([{"text": "first", "tags": ["food"]}, {"text": "second", "tags": ["food"]}]),
+    )
+    assert response.json["ids"] == [5, 7]
+    response = client.post(
+        "/api/posts", headers={"x-access-token": make_token(5)}, data=json.dumps({"text": "third", "tags": ["spa"]})
+    )
+    assert response.json["id"] == 6
+
+    assert post_ids_in(shard_paths[0]) == [1, 3, 5, 7]
+    assert post_ids_in(shard_paths[1]) == [2, 4, 6]
+    assert [post["id"] for post in get_feed(client, {"authorIds": "4,5", "tags": "food,spa"})["posts"]] == [5, 6, 7]
+
+
+def test_co_authors_on_other_shards(client, tmp_path):
+    """should show a post in the feed of a co-author whose home shard is another one, and keep totals exact."""
+
+    client.application.config["COUNTER_FLUSH_INTERVAL_SECONDS"] = 0
+    shard_posts(client, tmp_path)
+    post_id = client.post(
+        "/api/posts/batch",
+        headers={"x-access-token": make_token(4)},
+        data=json.dumps([{"text": "together", "tags": ["food"], "authorIds": [5]}]),
+    ).json["ids"][0]
+    response = client.patch(
+        "/api/posts/4",
+        headers={"x-access-token": make_token(3), "Content-Type": "application/json"},
+        data=json.dumps({"authorIds": [3, 4], "text": "moved on"}),
+    )
+    assert response.status_code == 200
+    for action in ["read", "like"]:
+        client.post(f"/api/posts/{post_id}/{action}", headers={"x-access-token": make_token(5)})
+    with client.application.app_context():
+        counters.flush_counters()
+
+    assert [post["id"] for post in get_feed(client, {"authorIds": "5"})["posts"]] == [post_id]
+    assert [post["text"] for post in get_feed(client, {"authorIds": "4"})["posts"]] == ["moved on", "together"]
+    stats = client.get("/api/authors/5/stats", headers={"x-access-token": make_token(5)}).json
+    assert (stats["postCount"], stats["totalLikes"], stats["totalReads"]) == (1, 1, 1)
+    with client.application.app_context():
+        assert AuthorStats.find_drift() == []
+
+
+def test_sharded_tables_need_a_shard(client, tmp_path):
+    """should refuse session statements on sharded tables outside of a shard instead of reading the main database."""
+
+    shard_posts(client, tmp_path)
+    with client.application.app_context():
+        with pytest.raises(RuntimeError):
+            db.session.get(Post, 1)
+        with sharding.on_shard_of_post(1):
+            assert db.session.get(Post, 1).id == 1
+
+
+def test_writes_hold_one_shard_at_a_time(client, tmp_path):
+    """should commit the writes to a shard before writing another, so that writers never wait on each other's shards."""
+
+    shard_paths = shard_posts(client, tmp_path)
+    with client.application.app_context():
+        with sharding.on_shard(1, writing=True):
+            AuthorVersion.bump(user_ids={1})
+        with sharding.on_shard(0, writing=True):
+            AuthorVersion.bump(user_ids={2})
+            # The write lock of shard 1 is free, and its write is visible.
+            with sqlite3.connect(shard_paths[1], timeout=0) as other_writer:
+                other_writer.execute("BEGIN IMMEDIATE")
+                assert other_writer.execute("SELECT version FROM author_version WHERE user_id = 1").fetchone() is not None
+                other_writer.rollback()
+        db.session.commit()
+
+
+def test_fan_out_reads_are_recorded(client, tmp_path):
+    """should count the feed reads that run on the shards' worker threads in the request's query recorders."""
+
+    shard_posts(client, tmp_path)
+    with client.application.app_context(), record_queries() as recorder:
+        Post.get_sorted_post_rows_by_user_ids(user_ids={1, 2, 3}, sort_by="id", direction="asc")
+
+    assert sum(count for statement, count in recorder.fingerprints.items() if "FROM post WHERE" in statement) == 2
@@ -0,0 +1,30 @@
+from sqlalchemy.pool import QueuePool
+
+from db.shared import db
+
+
+def test_pragmas_apply_to_every_connection(client):
+    """should open pooled connections in WAL mode with the tuned pragmas."""
+
+    with client.application.app_context():
+        engine = db.get_engine()
+        assert isinstance(engine.pool, QueuePool)
+        with engine.connect() as connection:
+            assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+            assert connection.exec_driver_sql("PRAGMA synchronous").scalar() == 1
+            assert connection.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+            assert connection.exec_driver_sql("PRAGMA temp_store").scalar() == 2
+            assert connection.exec_driver_sql("PRAGMA cache_size").scalar() == -64000
+
+
+def test_reads_go_on_during_a_write(client):
+    """should let another connection read while a write transaction is open."""
+
+    with client.application.app_context():
+        engine = db.get_engine()
+        with engine.connect() as writer, engine.connect() as reader:
+            likes = reader.exec_driver_sql("SELECT likes FROM post WHERE id = 1").scalar()
+            transaction = writer.begin()
+            writer.exec_driver_sql("UPDATE post SET likes = likes + 1 WHERE id = 1")
+            assert reader.exec_driver_sql("SELECT likes FROM post WHERE id = 1").scalar() == likes
+            transaction.rollback()
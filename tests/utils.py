@@ -1,6 +1,19 @@
 import os
+from contextlib import contextmanager
 import jwt
 
+from instrumentation import record_queries
+
 
 def make_token(user_id):
     return jwt.encode({"id": user_id}, os.environ.get("SESSION_SECRET"), algorithm="HS256")
+
+
+@contextmanager
+def assert_max_queries(budget):
+    """Fail when the code in this context runs more SQL statements than the budget."""
+    with record_queries() as recorder:
+        yield recorder
+    assert recorder.count <= budget, (
+        f"{recorder.count} queries run, budget is {budget}.  Repeated: {recorder.repeated_statements()}"
+    )